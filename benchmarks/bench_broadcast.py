@@ -0,0 +1,70 @@
+# benchmarks/bench_broadcast.py
+#
+# Bulk broadcast throughput and memory against the fake Graph API. For each
+# list size it reports sends per second, then reruns the list with
+# tracemalloc to show that peak memory stays flat as the list grows.
+#
+#   python -m benchmarks.bench_broadcast --sizes 10000,100000,1000000 --latency 0.05
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from whakit.config.settings import settings
+from whakit.services.broadcast import Broadcast, MessageTemplate
+from whakit.services.whatsapp import WhatsAppService
+from whakit.testing.fake_graph import FakeGraphAPI
+
+
+def write_recipients(path: str, count: int):
+    with open(path, "w") as file:
+        for i in range(count):
+            file.write(json.dumps({"to": f"1555{i:07d}", "name": f"Customer {i}", "date": "2026-11-03"}) + "\n")
+
+
+async def run(path: str, args) -> dict:
+    graph = FakeGraphAPI(latency=args.latency, error_rate=args.error_rate, record=False)
+    service = WhatsAppService(client=graph.client())
+    template = MessageTemplate(service.template_message("", "appointment_reminder", "en_US", ["{name}", "{date}"]))
+    broadcast = Broadcast(service, template, concurrency=args.concurrency)
+    stats = await broadcast.run(path)
+    await service.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk broadcast throughput and memory")
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated recipient counts")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds per fake Graph API request")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    # The fake API is not rate limited; measure the pipeline itself
+    settings.OUTBOUND_RATE = 1_000_000.0
+    settings.OUTBOUND_BURST = 1_000_000
+    settings.OUTBOUND_MAX_RETRIES = 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in (int(s) for s in args.sizes.split(",")):
+            path = os.path.join(directory, f"recipients-{size}.jsonl")
+            write_recipients(path, size)
+            start = time.perf_counter()
+            stats = asyncio.run(run(path, args))
+            elapsed = time.perf_counter() - start
+
+            tracemalloc.start()
+            asyncio.run(run(path, args))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"{size:>9} recipients: {elapsed:7.2f}s {size / elapsed:>8.0f} sends/s, "
+                f"{stats['failed']} failed, peak {peak / 1024:8.0f} KiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
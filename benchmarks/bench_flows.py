@@ -0,0 +1,80 @@
+# benchmarks/bench_flows.py
+#
+# Measures flow compilation time and routing throughput of the flow engine
+# with many flows and steps loaded.
+#
+#   python -m benchmarks.bench_flows --flows 300 --steps 20 --users 2000
+
+import argparse
+import asyncio
+import random
+import time
+
+from whakit.services.flow_engine import FlowEngine
+
+
+async def noop(to, message, session, state):
+    return None
+
+
+def build_definition(flows: int, steps: int, routes: int) -> dict:
+    definition = {"menu": {}, "flows": {}}
+    for f in range(flows):
+        name = f"flow_{f}"
+        flow_steps = {}
+        for s in range(steps):
+            nxt = f"step_{s + 1}" if s + 1 < steps else None
+            step = {"prompt": f"{name} step {s}?", "save": f"field_{s}"}
+            step["on"] = [
+                {"match": [f"choice {r}", f"c{r}"], "reply": f"picked {r}", **({"next": nxt} if nxt else {"end": True})}
+                for r in range(routes)
+            ]
+            step["otherwise"] = {"next": nxt} if nxt else {"action": "noop", "end": True}
+            flow_steps[f"step_{s}"] = step
+        definition["flows"][name] = {"start": "step_0", "steps": flow_steps}
+        definition["menu"][f"option_{f}"] = {"flow": name}
+    return definition
+
+
+async def bench(flows: int, steps: int, routes: int, users: int, messages: int):
+    definition = build_definition(flows, steps, routes)
+    start = time.perf_counter()
+    engine = FlowEngine(definition, {"noop": noop})
+    compile_ms = (time.perf_counter() - start) * 1000
+    print(f"compiled {flows} flows x {steps} steps x {routes} routes in {compile_ms:.1f}ms")
+
+    rng = random.Random(0)
+    states = [{} for _ in range(users)]
+    inputs = [rng.choice(["some free text", "choice 0", f"c{routes - 1}", "hello"]) for _ in range(1024)]
+    options = [f"option_{rng.randrange(flows)}" for _ in range(1024)]
+
+    started = ended = 0
+    start = time.perf_counter()
+    for i in range(messages):
+        state = states[i % users]
+        replies = await engine.handle("user", inputs[i & 1023], state)
+        if replies is None:
+            await engine.select("user", options[i & 1023], state)
+            started += 1
+        elif "flow" not in state:
+            ended += 1
+    elapsed = time.perf_counter() - start
+    print(
+        f"routed {messages} messages in {elapsed:.3f}s ({messages / elapsed:.0f} msg/s, "
+        f"{elapsed / messages * 1e6:.2f} us/msg); {started} flows started, {ended} finished"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flow engine compile time and routing throughput")
+    parser.add_argument("--flows", type=int, default=300)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--routes", type=int, default=4, help="Routed choices per step")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=200000)
+    args = parser.parse_args()
+    asyncio.run(bench(args.flows, args.steps, args.routes, args.users, args.messages))
+
+
+if __name__ == "__main__":
+    main()
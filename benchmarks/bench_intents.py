@@ -0,0 +1,68 @@
+# benchmarks/bench_intents.py
+#
+# Measures intent matcher throughput per layer, next to the old exact list
+# lookup, and how many sample replies each approach recognizes.
+#
+#   python -m benchmarks.bench_intents --rounds 20000
+
+import argparse
+import time
+
+from whakit.config.settings import settings
+from whakit.services.flow_engine import load_flow_definition
+from whakit.services.intents import IntentMatcher, normalize
+
+SAMPLES = {
+    "phrase": ["hi", "Hello", "yes", "No", "1", "Schedule Appointment"],
+    "pattern": ["hi!", "Hola 👋", "HELLO there", "Yes!", "Nope.", "I'd like to book an appointment"],
+    "classifier": ["hellp", "nop", "apointment", "locaton", "helllo thre"],
+    "open-ended": ["what are your opening hours on sunday?", "my dog has been coughing since yesterday"],
+}
+
+SCOPES = frozenset({"greeting", "yes", "no", "option_1", "option_2", "option_3"})
+
+
+def legacy_match(text: str):
+    message = text.lower().strip()
+    if message in settings.GREETINGS:
+        return "greeting"
+    if message in ["yes", "y"]:
+        return "yes"
+    if message in ["no", "n"]:
+        return "no"
+    return None
+
+
+def timed(fn, texts, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            fn(text)
+    return rounds * len(texts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intent matcher throughput and coverage")
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    matcher = IntentMatcher.from_definition(load_flow_definition())
+    print(f"built matcher in {(time.perf_counter() - start) * 1000:.2f}ms")
+
+    for layer, texts in SAMPLES.items():
+        legacy_found = sum(legacy_match(text) is not None for text in texts)
+        found = sum(matcher.match(text, SCOPES) is not None for text in texts)
+        legacy_rate = timed(legacy_match, texts, args.rounds)
+        rate = timed(lambda text: matcher.match(text, SCOPES), texts, args.rounds)
+        # Without the normalization cache every message is normalized afresh
+        cold = timed(lambda text: (normalize.cache_clear(), matcher.match(text, SCOPES)), texts, args.rounds // 10)
+        print(
+            f"{layer:>10}: matched {found}/{len(texts)} (legacy {legacy_found}/{len(texts)}), "
+            f"{rate:>9.0f} msg/s ({cold:>8.0f} uncached), legacy {legacy_rate:>9.0f} msg/s"
+        )
+    print(f"hits by layer: {matcher.stats()}")
+
+
+if __name__ == "__main__":
+    main()
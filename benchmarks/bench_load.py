@@ -0,0 +1,259 @@
+# benchmarks/bench_load.py
+#
+# End-to-end load test, fully offline. Realistic webhook traffic is posted
+# to the app's /webhook route. Replies are delivered to a fake Graph API,
+# and AI answers come from the fake chat model. For each turn, the time is
+# measured from the webhook post until the last reply for that turn
+# arrives at the fake Graph API.
+#
+#   python -m benchmarks.bench_load --conversations 500 --rate 50 --graph-latency 0.05 --llm-latency 0.3
+#
+# Scenarios (--mix): greeting, appointment, assistant, location, media.
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import httpx
+
+from whakit.config.settings import settings
+
+# A turn is (message type, text or button id, replies expected)
+Turn = Tuple[str, str, int]
+
+SCENARIOS: Dict[str, List[Turn]] = {
+    "greeting": [("text", "hi", 2)],
+    "appointment": [
+        ("interactive", "option_1", 1),
+        ("text", "Alex", 1),
+        ("text", "Rex", 1),
+        ("text", "dog", 1),
+        ("text", "annual checkup", 1),
+    ],
+    "assistant": [
+        ("interactive", "option_2", 1),
+        ("text", "What are your opening hours on Saturday?", 2),
+        ("text", "yes", 1),
+    ],
+    "location": [("interactive", "option_3", 2)],
+    # Acknowledged without a reply; the default handler does not download media
+    "media": [("image", "", 0)],
+}
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class LoadGenerator:
+    def __init__(self, args):
+        # Settings are read when services are built, so apply overrides first
+        settings.OUTBOUND_RATE = args.outbound_rate
+        settings.OUTBOUND_BURST = int(args.outbound_rate)
+        settings.AI_STREAMING = args.streaming
+        settings.AI_CACHE_ENABLED = args.cache
+        # Keep anything the run writes out of whakit/data
+        self.data_dir = tempfile.TemporaryDirectory()
+        settings.MEDIA_CACHE_DIR = os.path.join(self.data_dir.name, "media")
+
+        import whakit.controllers.webhook as webhook
+        from whakit.main import app
+        from whakit.services.ai import AIService
+        from whakit.services.message_handler import DefaultMessageHandler
+        from whakit.services.queue import MessageQueue
+        from whakit.services.storage import StorageService
+        from whakit.services.whatsapp import WhatsAppService
+        from whakit.testing.fake_graph import FakeGraphAPI
+        from whakit.testing.fake_llm import FakeChatModel
+
+        logging.getLogger().setLevel(logging.WARNING)
+        logging.getLogger("whakit").setLevel(logging.WARNING)
+
+        self.args = args
+        self.graph = FakeGraphAPI(
+            latency=args.graph_latency,
+            jitter=args.graph_jitter,
+            throttle_rate=args.throttle_rate,
+            error_rate=args.error_rate,
+        )
+        self.handler = DefaultMessageHandler(
+            whatsapp_service=WhatsAppService(client=self.graph.client()),
+            ai_service=AIService(llm=FakeChatModel(latency=args.llm_latency)),
+            # Booked appointments are not stored
+            storage_service=StorageService(None),
+        )
+        # Route the app's webhook to this handler
+        webhook.message_handler = self.handler
+        webhook.message_queue = MessageQueue(self.handler)
+        self.webhook = webhook
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://whakit")
+        self.rng = random.Random(args.seed)
+        self.sequence = 0
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.webhooks = 0
+        self.timeouts = 0
+
+    def payload(self, user: str, kind: str, content: str) -> dict:
+        self.sequence += 1
+        message = {"from": user, "id": f"wamid.load.{self.sequence}", "timestamp": str(int(time.time())), "type": kind}
+        if kind == "text":
+            message["text"] = {"body": content}
+        elif kind == "interactive":
+            message["interactive"] = {"type": "button_reply", "button_reply": {"id": content, "title": content}}
+        else:
+            message[kind] = {"id": f"media.{self.sequence}", "mime_type": "image/jpeg"}
+        return {
+            "object": "whatsapp_business_account",
+            "entry": [{"id": "waba", "changes": [{"field": "messages", "value": {
+                "messaging_product": "whatsapp",
+                "contacts": [{"wa_id": user, "profile": {"name": f"User {user[-4:]}"}}],
+                "messages": [message],
+            }}]}],
+        }
+
+    async def post(self, body: dict):
+        raw = json.dumps(body).encode()
+        headers = {"Content-Type": "application/json"}
+        if self.webhook.signature_verifier is not None:
+            digest = hmac.new(settings.APP_SECRET.encode(), raw, hashlib.sha256).hexdigest()
+            headers["X-Hub-Signature-256"] = f"sha256={digest}"
+        response = await self.client.post("/webhook", content=raw, headers=headers)
+        self.webhooks += 1
+        return response
+
+    async def conversation(self, user: str, turns: List[Tuple[str, Turn]]):
+        delivered = 0
+        for scenario, (kind, content, replies) in turns:
+            started = time.perf_counter()
+            response = await self.post(self.payload(user, kind, content))
+            if response.status_code != 200:
+                self.timeouts += 1
+                return
+            if replies:
+                delivered += replies
+                try:
+                    await self.graph.wait_for(user, delivered, timeout=self.args.turn_timeout)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    return
+                finished = self.graph.received[user][delivered - 1][0]
+            else:
+                finished = time.perf_counter()
+            self.latencies[scenario].append(finished - started)
+            if self.args.think:
+                await asyncio.sleep(self.rng.expovariate(1 / self.args.think))
+
+    def script(self) -> List[Tuple[str, Turn]]:
+        names, weights = zip(*self.args.mix.items())
+        scenario = self.rng.choices(names, weights)[0]
+        turns = [("greeting", turn) for turn in SCENARIOS["greeting"]]
+        if scenario != "greeting":
+            turns += [(scenario, turn) for turn in SCENARIOS[scenario]]
+        return turns
+
+    async def run(self):
+        await self.handler.startup()
+        self.webhook.message_queue.start()
+        limit = asyncio.Semaphore(self.args.concurrency)
+
+        async def start(index: int):
+            async with limit:
+                await self.conversation(f"1555{index:07d}", self.script())
+
+        started = time.perf_counter()
+        tasks = []
+        for index in range(self.args.conversations):
+            tasks.append(asyncio.create_task(start(index)))
+            if self.args.rate:
+                await asyncio.sleep(self.rng.expovariate(self.args.rate))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        self.report(elapsed)
+
+        await self.measure_memory()
+        await self.webhook.message_queue.stop()
+        await self.handler.shutdown()
+        await self.client.aclose()
+        self.data_dir.cleanup()
+
+    async def measure_memory(self):
+        """Traced memory per conversation held open mid-flow."""
+        count = self.args.memory_conversations
+        if not count:
+            return
+        base = 9_000_000
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        scripts = [[("appointment", turn) for turn in SCENARIOS["appointment"][:3]] for _ in range(count)]
+        await asyncio.gather(*(self.conversation(f"1555{base + i:07d}", script) for i, script in enumerate(scripts)))
+        await asyncio.sleep(settings.READ_RECEIPT_DELAY * 2)
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"memory: {(after - before) / count / 1024:.1f} KiB per open conversation ({count} open)")
+
+    def report(self, elapsed: float):
+        def pct(values: List[float], q: float) -> float:
+            ordered = sorted(values)
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+        everything = [value for values in self.latencies.values() for value in values]
+        replies = self.graph.stats()["delivered"]
+        print(
+            f"{self.args.conversations} conversations, {len(everything)} turns in {elapsed:.2f}s: "
+            f"{len(everything) / elapsed:.1f} turns/s, {self.webhooks / elapsed:.1f} webhooks/s, "
+            f"{replies / elapsed:.1f} replies/s, {self.timeouts} failed"
+        )
+        print(f"{'scenario':>12} {'turns':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'mean ms':>9}")
+        for scenario, values in sorted(self.latencies.items()) + [("all", everything)]:
+            if values:
+                print(
+                    f"{scenario:>12} {len(values):>7} {pct(values, 0.5):>9.1f} {pct(values, 0.9):>9.1f} "
+                    f"{pct(values, 0.99):>9.1f} {statistics.fmean(values) * 1000:>9.1f}"
+                )
+        print(f"graph: {self.graph.stats()}")
+        outbound = self.handler.whatsapp_service.stats()
+        print(f"outbound: sent {outbound['sent']}, failed {outbound['failed']}, retries {outbound['retries']}, "
+              f"rate limited {outbound['rate_limited']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end load test")
+    parser.add_argument("--conversations", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=100.0, help="New conversations per second (0: all at once)")
+    parser.add_argument("--concurrency", type=int, default=1000, help="Maximum conversations in progress")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("greeting=2,appointment=3,assistant=3,location=1,media=1"))
+    parser.add_argument("--think", type=float, default=0.0, help="Mean seconds a user waits between turns")
+    parser.add_argument("--graph-latency", type=float, default=0.02)
+    parser.add_argument("--graph-jitter", type=float, default=0.01)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of sends answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of sends answered with 500")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--outbound-rate", type=float, default=1000.0, help="Outbound messages per second allowed")
+    parser.add_argument("--streaming", action="store_true", help="Stream AI answers in parts")
+    parser.add_argument("--cache", action="store_true", help="Enable the AI answer cache")
+    parser.add_argument("--turn-timeout", type=float, default=30.0)
+    parser.add_argument("--memory-conversations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(LoadGenerator(args).run())
+
+
+if __name__ == "__main__":
+    main()
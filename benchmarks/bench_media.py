@@ -0,0 +1,72 @@
+# benchmarks/bench_media.py
+#
+# Media downloads and uploads against the fake Graph API. For each file
+# size it reports download throughput and peak traced memory, which should
+# stay near MEDIA_CHUNK_SIZE however large the file is. It also reports
+# repeated reads from the disk cache, and the cost of a repeated upload
+# that reuses the cached media id.
+#
+#   python -m benchmarks.bench_media --sizes 65536,1048576,16777216
+
+import argparse
+import asyncio
+import tempfile
+import time
+import tracemalloc
+
+from whakit.services.media import MediaService
+from whakit.testing.fake_graph import FakeGraphAPI
+
+
+async def bench_size(size: int, files: int):
+    graph = FakeGraphAPI(media_size=size)
+    with tempfile.TemporaryDirectory() as directory:
+        media = MediaService(client=graph.client(), cache_dir=directory)
+        tracemalloc.start()
+        start = time.perf_counter()
+        for i in range(files):
+            await media.download(f"{size}{i}")
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        for i in range(files):
+            async for _ in media.iter_media(f"{size}{i}"):
+                pass
+        cached = time.perf_counter() - start
+
+    mb = size * files / 1e6
+    print(
+        f"{size:>10} B x {files}: download {mb / elapsed:8.1f} MB/s, peak {peak / 1024:8.0f} KiB | "
+        f"from cache {mb / cached:8.1f} MB/s"
+    )
+
+
+async def bench_uploads(size: int, sends: int):
+    graph = FakeGraphAPI()
+    media = MediaService(client=graph.client())
+    content = bytes(size)
+    start = time.perf_counter()
+    for _ in range(sends):
+        await media.upload(content, "image/jpeg")
+    elapsed = time.perf_counter() - start
+    print(
+        f"upload {size} B x {sends}: {graph.media_uploads} uploaded, "
+        f"{elapsed / sends * 1e6:.0f} us per send with the media id cache"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Media download and upload benchmark")
+    parser.add_argument("--sizes", default="65536,1048576,16777216", help="Comma-separated file sizes in bytes")
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--sends", type=int, default=1000)
+    args = parser.parse_args()
+    for size in (int(s) for s in args.sizes.split(",")):
+        asyncio.run(bench_size(size, args.files))
+    asyncio.run(bench_uploads(1024 * 1024, args.sends))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/bench_outbox.py
+#
+# Measures outbound sends per second through the outbox with the durable
+# journal off and on, against a simulated Graph API latency.
+#
+#   python -m benchmarks.bench_outbox --messages 20000 --recipients 1000
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from whakit.services.journal import OutboxJournal
+from whakit.services.outbox import Outbox
+
+
+async def run(messages: int, recipients: int, latency: float, journal_path: str = None) -> Outbox:
+    async def deliver(data: dict) -> bool:
+        await asyncio.sleep(latency)
+        return True
+
+    journal = OutboxJournal(journal_path) if journal_path else None
+    outbox = Outbox(deliver, max_pending=messages, journal=journal)
+    await outbox.recover()
+
+    sends = []
+    for i in range(messages):
+        to = f"1555{i % recipients:07d}"
+        sends.append((to, {"messaging_product": "whatsapp", "to": to, "text": {"body": f"reply {i}"}}))
+
+    # Every reply is submitted by its own task, as concurrent handlers would
+    start = time.perf_counter()
+    await asyncio.gather(*(outbox.submit(to, data) for to, data in sends))
+    elapsed = time.perf_counter() - start
+    await outbox.close()
+
+    label = "durable" if journal else "memory"
+    line = f"{label:>8}: {messages} sends in {elapsed:.3f}s ({messages / elapsed:>8.0f} sends/s)"
+    if journal:
+        stats = journal.stats()
+        line += f", {stats['commits']} commits, {stats['records_per_commit']:.1f} records/commit"
+    print(line)
+    return outbox
+
+
+async def bench(messages: int, recipients: int, latency: float):
+    await run(messages, recipients, latency)
+    with tempfile.TemporaryDirectory() as directory:
+        await run(messages, recipients, latency, os.path.join(directory, "outbox.db"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Outbox throughput with and without the durable journal")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--recipients", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.005, help="Simulated send latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(bench(args.messages, args.recipients, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/bench_ratelimit.py
+#
+# Outbound pacing with one recipient over its per-recipient limit. One
+# recipient gets more messages than its burst allows while others each
+# get one. It reports how long each waits. The others should only wait for
+# the global bucket, never for the throttled recipient's schedule. Exits
+# with status 1 if they do.
+#
+#   python -m benchmarks.bench_ratelimit --throttled-sends 47 --others 20
+
+import argparse
+import asyncio
+import sys
+import time
+
+from whakit.config.settings import settings
+from whakit.services.ratelimit import RateLimiter
+
+
+async def timed(limiter: RateLimiter, key: str) -> float:
+    start = time.perf_counter()
+    await limiter.acquire(key)
+    return time.perf_counter() - start
+
+
+async def run(args) -> bool:
+    limiter = RateLimiter(
+        settings.OUTBOUND_RATE,
+        settings.OUTBOUND_BURST,
+        key_rate=settings.OUTBOUND_RECIPIENT_RATE,
+        key_burst=settings.OUTBOUND_RECIPIENT_BURST,
+    )
+    throttled = [asyncio.create_task(timed(limiter, "throttled")) for _ in range(args.throttled_sends)]
+    # Let the throttled sends take their reservations first
+    await asyncio.sleep(0)
+    others = await asyncio.gather(*(timed(limiter, f"other-{i}") for i in range(args.others)))
+    for task in throttled:
+        task.cancel()
+    await asyncio.gather(*throttled, return_exceptions=True)
+
+    # Every send fits in the global burst, so nothing else should hold the others up
+    allowed = (args.throttled_sends + args.others) / settings.OUTBOUND_RATE + 0.05
+    print(
+        f"{args.throttled_sends} sends to one recipient (burst {settings.OUTBOUND_RECIPIENT_BURST}), "
+        f"{args.others} to others: others waited max {max(others) * 1000:.1f} ms "
+        f"(allowed {allowed * 1000:.1f} ms)"
+    )
+    return max(others) <= allowed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-recipient throttling must not delay other recipients")
+    parser.add_argument("--throttled-sends", type=int, default=47)
+    parser.add_argument("--others", type=int, default=20)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# benchmarks/bench_scaling.py
+#
+# Message throughput with 1 to N handler processes behind the sender-affinity
+# router. Each worker runs the default handler against an in-process fake
+# Graph API. Conversations are greetings followed by appointment booking,
+# which is all local CPU work. The time is measured from the first routed
+# message until every worker has drained its queue and delivered its replies.
+#
+#   python -m benchmarks.bench_scaling --processes 1,2,4,8 --messages 40000
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+from whakit.config.settings import settings
+from whakit.models.message import Message
+from whakit.services.workers import WorkerPool
+
+TURNS = [
+    ("text", "hi"),
+    ("interactive", "option_1"),
+    ("text", "Alex"),
+    ("text", "Rex"),
+    ("text", "dog"),
+    ("text", "annual checkup"),
+]
+
+
+def make_handler():
+    """Handler factory run inside each worker process."""
+    from whakit.services.message_handler import DefaultMessageHandler
+    from whakit.services.whatsapp import WhatsAppService
+    from whakit.testing.fake_graph import FakeGraphAPI
+
+    # Only the handler's own work is measured, not the Graph API limits
+    settings.OUTBOUND_RATE = 1_000_000.0
+    settings.OUTBOUND_BURST = 1_000_000
+    settings.OUTBOUND_RECIPIENT_RATE = 1_000_000.0
+    settings.OUTBOUND_RECIPIENT_BURST = 1_000_000
+    graph = FakeGraphAPI(latency=float(os.environ.get("BENCH_GRAPH_LATENCY", "0")))
+    return DefaultMessageHandler(whatsapp_service=WhatsAppService(client=graph.client()))
+
+
+def build_messages(count: int, senders: int) -> list:
+    messages = []
+    for i in range(count):
+        sender = f"1555{i % senders:07d}"
+        kind, content = TURNS[(i // senders) % len(TURNS)]
+        if kind == "text":
+            payload = {"from": sender, "id": f"wamid.{i}", "type": "text", "text": {"body": content}}
+        else:
+            payload = {"from": sender, "id": f"wamid.{i}", "type": "interactive",
+                       "interactive": {"type": "button_reply", "button_reply": {"id": content, "title": content}}}
+        messages.append(Message.from_payload(payload))
+    return messages
+
+
+async def run(processes: int, messages: list) -> float:
+    pool = WorkerPool(processes, handler_factory="benchmarks.bench_scaling:make_handler")
+    pool.start()
+    await pool.ready(timeout=120)
+
+    sender_info = {"profile": {"name": "Load Test"}}
+    start = time.perf_counter()
+    for message in messages:
+        # Backpressure: wait for the worker to take some of its backlog
+        while not await pool.enqueue(message, sender_info):
+            await asyncio.sleep(0.001)
+    await pool.stop(timeout=600)
+    elapsed = time.perf_counter() - start
+
+    processed = sum(report["queue"]["processed"] for report in pool.reports.values())
+    if processed != len(messages):
+        print(f"  warning: {processed} of {len(messages)} messages processed")
+    return elapsed
+
+
+async def bench(process_counts: list, count: int, senders: int):
+    messages = build_messages(count, senders)
+    print(f"{count} messages from {senders} senders, {os.cpu_count()} CPUs")
+    baseline = None
+    for processes in process_counts:
+        elapsed = await run(processes, messages)
+        rate = count / elapsed
+        baseline = baseline or rate
+        print(
+            f"{processes:>3} processes: {elapsed:7.2f}s {rate:>9.0f} msg/s "
+            f"speedup {rate / baseline:5.2f}x efficiency {rate / baseline / processes:5.0%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput from 1 to N handler processes")
+    parser.add_argument("--processes", default="1,2,4", help="Comma-separated process counts")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--senders", type=int, default=2000)
+    parser.add_argument("--graph-latency", type=float, default=0.0, help="Seconds per fake Graph API request")
+    args = parser.parse_args()
+    # Inherited by the spawned workers, which read their settings from the environment
+    os.environ["BENCH_GRAPH_LATENCY"] = str(args.graph_latency)
+    os.environ["LOG_LEVEL"] = "WARNING"
+    # Rejections while a worker is full are expected here, so only errors are shown
+    logging.basicConfig(level=logging.ERROR)
+    asyncio.run(bench([int(n) for n in args.processes.split(",")], args.messages, args.senders))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_startup.py
+#
+# Measures cold-start cost: importing the app, serving the first request and
+# answering the first AI question (with a fake model, so no network is used).
+#
+#   python -m benchmarks.bench_startup --runs 5
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import asyncio, json, time
+
+started = time.perf_counter()
+import whakit.main
+imported = time.perf_counter() - started
+
+import httpx
+from whakit.main import app
+from whakit.services.ai import AIService
+from whakit.testing.fake_llm import FakeChatModel
+
+
+async def probe():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://whakit") as client:
+        started = time.perf_counter()
+        await client.get("/")
+        first_request = time.perf_counter() - started
+
+    ai = AIService(llm=FakeChatModel())
+    started = time.perf_counter()
+    await ai.generate_response("What are your opening hours?")
+    first_answer = time.perf_counter() - started
+    return first_request, first_answer
+
+
+first_request, first_answer = asyncio.run(probe())
+print(json.dumps({"import": imported, "first_request": first_request, "first_ai_answer": first_answer}))
+"""
+
+
+def run_once() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [run_once() for _ in range(args.runs)]
+    for metric in ("import", "first_request", "first_ai_answer"):
+        values = [sample[metric] * 1000 for sample in samples]
+        print(
+            f"{metric:<16} median {statistics.median(values):8.1f}ms"
+            f"  min {min(values):8.1f}ms  max {max(values):8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# benchmarks/bench_storage.py
+#
+# Appointment persistence, one write per appointment vs batched. For each
+# backend it completes a number of appointments concurrently and reports
+# how long `complete_appointment` is held up per row, and the end-to-end
+# rows per second until everything is on disk. --latency adds a delay per
+# write call to stand in for a remote backend such as Google Sheets.
+#
+#   python -m benchmarks.bench_storage --rows 10000 --latency 0.05
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from whakit.services.storage import CSVSink, SQLiteSink, StorageService
+
+
+class SlowSink:
+    """Wraps a sink with a fixed delay per write call."""
+
+    def __init__(self, sink, latency: float):
+        self.sink = sink
+        self.latency = latency
+
+    def write_rows(self, rows):
+        time.sleep(self.latency)
+        self.sink.write_rows(rows)
+
+    def close(self):
+        self.sink.close()
+
+
+def make_row(i: int) -> list:
+    return [f"1555{i:07d}", f"Customer {i}", "Rex", "dog", "checkup", datetime.utcnow().isoformat()]
+
+
+async def per_row(sink, rows: int, concurrency: int):
+    """The previous approach: each appointment awaits its own write."""
+    loop = asyncio.get_running_loop()
+    # Files and SQLite connections take one writer at a time
+    executor = ThreadPoolExecutor(max_workers=1)
+    waits = []
+
+    async def complete(i: int):
+        start = time.perf_counter()
+        await loop.run_in_executor(executor, sink.write_rows, [make_row(i)])
+        waits.append(time.perf_counter() - start)
+
+    for offset in range(0, rows, concurrency):
+        await asyncio.gather(*(complete(i) for i in range(offset, min(rows, offset + concurrency))))
+    sink.close()
+    executor.shutdown()
+    return waits
+
+
+async def batched(sink, rows: int, batch_size: int):
+    storage = StorageService(sink, batch_size=batch_size, flush_interval=0.5)
+    waits = []
+    for i in range(rows):
+        start = time.perf_counter()
+        storage.add(make_row(i))
+        waits.append(time.perf_counter() - start)
+        if i % 100 == 0:
+            # Let the event loop run, as it would between messages
+            await asyncio.sleep(0)
+    await storage.close()
+    return waits, storage.stats()
+
+
+def report(label: str, rows: int, elapsed: float, waits: list, extra: str = ""):
+    waits = sorted(waits)
+    p99 = waits[int(len(waits) * 0.99) - 1] if len(waits) >= 100 else waits[-1]
+    print(
+        f"{label:<18} {rows / elapsed:>9.0f} rows/s | wait per row p50 {statistics.median(waits) * 1e6:>9.1f} us, "
+        f"p99 {p99 * 1e6:>9.1f} us{extra}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Appointment persistence, per-row vs batched writes")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8, help="Appointments completed at once in per-row mode")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every write call")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        backends = {
+            "sqlite": lambda name: SQLiteSink(os.path.join(directory, f"{name}.db")),
+            "csv": lambda name: CSVSink(os.path.join(directory, f"{name}.csv")),
+        }
+        for backend, make_sink in backends.items():
+            sink = SlowSink(make_sink("per-row"), args.latency)
+            start = time.perf_counter()
+            waits = asyncio.run(per_row(sink, args.rows, args.concurrency))
+            report(f"{backend} per-row", args.rows, time.perf_counter() - start, waits)
+
+            sink = SlowSink(make_sink("batched"), args.latency)
+            start = time.perf_counter()
+            waits, stats = asyncio.run(batched(sink, args.rows, args.batch_size))
+            report(
+                f"{backend} batched", args.rows, time.perf_counter() - start, waits,
+                f" | {stats['batches']} writes",
+            )
+
+
+if __name__ == "__main__":
+    main()
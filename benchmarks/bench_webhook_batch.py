@@ -0,0 +1,119 @@
+# benchmarks/bench_webhook_batch.py
+#
+# Measures extraction and concurrent dispatch of large batched webhook payloads.
+#
+#   python -m benchmarks.bench_webhook_batch --entries 50 --changes 4 --messages 25
+
+import argparse
+import asyncio
+import time
+
+from whakit.models.message import Message
+from whakit.services.message_handler import BaseMessageHandler
+from whakit.services.queue import MessageQueue
+from whakit.utils import iter_webhook_events
+
+
+def build_payload(entries: int, changes: int, messages: int, statuses: int, senders: int) -> dict:
+    seq = 0
+    payload = {"object": "whatsapp_business_account", "entry": []}
+    for e in range(entries):
+        entry = {"id": f"waba-{e}", "changes": []}
+        for _ in range(changes):
+            msgs, contacts = [], {}
+            for _ in range(messages):
+                number = f"1555{seq % senders:07d}"
+                contacts[number] = {"wa_id": number, "profile": {"name": f"User {number}"}}
+                msgs.append({
+                    "from": number,
+                    "id": f"wamid.{seq}",
+                    "timestamp": str(1700000000 + seq),
+                    "type": "text",
+                    "text": {"body": "hello"},
+                })
+                seq += 1
+            sts = [
+                {"id": f"wamid.out.{seq}.{i}", "status": "delivered", "recipient_id": f"1555{i % senders:07d}"}
+                for i in range(statuses)
+            ]
+            entry["changes"].append({
+                "field": "messages",
+                "value": {
+                    "messaging_product": "whatsapp",
+                    "contacts": list(contacts.values()),
+                    "messages": msgs,
+                    "statuses": sts,
+                },
+            })
+        payload["entry"].append(entry)
+    return payload
+
+
+class SleepHandler(BaseMessageHandler):
+    """Handler that only simulates per-message I/O latency."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def handle_incoming_message(self, message: Message, sender_info: dict):
+        await asyncio.sleep(self.latency)
+
+    def is_greeting(self, message: str) -> bool:
+        return False
+
+    async def send_welcome_message(self, to: str, sender_info: dict):
+        pass
+
+    async def send_main_menu(self, to: str):
+        pass
+
+
+def bench_extract(payload: dict, rounds: int):
+    start = time.perf_counter()
+    events = 0
+    for _ in range(rounds):
+        for _ in iter_webhook_events(payload):
+            events += 1
+    elapsed = time.perf_counter() - start
+    print(f"extract:  {events / rounds:>8.0f} events/payload  {events / elapsed:>12.0f} events/s")
+
+
+async def bench_dispatch(payload: dict, workers: int, latency: float):
+    queue = MessageQueue(SleepHandler(latency), workers=workers, maxsize=1_000_000)
+    queue.start()
+    start = time.perf_counter()
+    events = 0
+    for kind, item, sender_info in iter_webhook_events(payload):
+        if kind == "message":
+            await queue.enqueue(item, sender_info)
+        else:
+            await queue.enqueue_status(item)
+        events += 1
+    await queue.stop(timeout=600)
+    elapsed = time.perf_counter() - start
+    serial = events * latency
+    print(
+        f"dispatch: {events} events in {elapsed:.3f}s ({events / elapsed:.0f} events/s), "
+        f"serial estimate {serial:.3f}s, max wait {queue.max_wait * 1000:.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched webhook extraction and dispatch benchmark")
+    parser.add_argument("--entries", type=int, default=50)
+    parser.add_argument("--changes", type=int, default=4)
+    parser.add_argument("--messages", type=int, default=25)
+    parser.add_argument("--statuses", type=int, default=10)
+    parser.add_argument("--senders", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.005, help="Simulated handler latency in seconds")
+    args = parser.parse_args()
+
+    payload = build_payload(args.entries, args.changes, args.messages, args.statuses, args.senders)
+    bench_extract(payload, args.rounds)
+    asyncio.run(bench_dispatch(payload, args.workers, args.latency))
+
+
+if __name__ == "__main__":
+    main()
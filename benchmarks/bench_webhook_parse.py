@@ -0,0 +1,70 @@
+# benchmarks/bench_webhook_parse.py
+#
+# Compares webhook parsing before and after typed decoding: request.json()
+# (stdlib json) plus the old nested .get(...)[0] walks, against
+# decode_webhook (orjson when installed) plus iter_webhook_events building
+# Message objects in one pass. Reports time per webhook and the memory
+# blocks each parsed webhook keeps alive.
+#
+#   python -m benchmarks.bench_webhook_parse --rounds 20000
+
+import argparse
+import json
+import time
+import tracemalloc
+
+from benchmarks.bench_webhook_batch import build_payload
+from whakit.utils import decode_webhook, iter_webhook_events, orjson
+
+
+def legacy_parse(raw: bytes):
+    """The original path: stdlib decode, then one walk for messages and one for contacts."""
+    body = json.loads(raw)
+    messages = body.get("entry", [{}])[0].get("changes", [{}])[0].get("value", {}).get("messages", [])
+    contacts = body.get("entry", [{}])[0].get("changes", [{}])[0].get("value", {}).get("contacts", [])
+    message = messages[0] if messages else {}
+    sender_info = contacts[0] if contacts else {}
+    return message, sender_info
+
+
+def typed_parse(raw: bytes):
+    return list(iter_webhook_events(decode_webhook(raw)))
+
+
+def measure(name: str, parse, raw: bytes, rounds: int):
+    parse(raw)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        parse(raw)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = [parse(raw) for _ in range(100)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats) / len(kept)
+    size = sum(stat.size_diff for stat in stats) / len(kept)
+
+    print(f"{name:>8}: {elapsed / rounds * 1e6:>8.2f} us/webhook  {blocks:>7.0f} live blocks  {size / 1024:>7.1f} KiB live")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Webhook parse time and memory, legacy vs typed")
+    parser.add_argument("--rounds", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=25, help="Messages in the batched payload")
+    args = parser.parse_args()
+
+    print(f"decoder: {'orjson' if orjson is not None else 'json (orjson not installed)'}")
+    single = json.dumps(build_payload(1, 1, 1, 0, 1)).encode()
+    batched = json.dumps(build_payload(1, 1, args.batch, 0, args.batch)).encode()
+    for label, raw in (("single message", single), (f"{args.batch} messages", batched)):
+        print(f"{label} ({len(raw)} bytes):")
+        # The legacy path only ever sees the first message of a batch
+        measure("legacy", legacy_parse, raw, args.rounds)
+        measure("typed", typed_parse, raw, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
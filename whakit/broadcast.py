@@ -0,0 +1,105 @@
+# whakit/broadcast.py
+#
+# Send one message to every recipient in a CSV or JSONL file. Any string
+# in the message can use {column} placeholders from the recipient's row.
+#
+#   python -m whakit.broadcast customers.csv --text "Hi {name}, see you on {date}"
+#   python -m whakit.broadcast customers.jsonl --template appointment_reminder --param "{name}" --param "{date}"
+#   python -m whakit.broadcast customers.csv --payload message.json
+#
+# Progress is checkpointed next to the recipients file, and rerunning the
+# same command resumes an interrupted campaign. With OUTBOX_DURABLE, sends
+# are journaled to <checkpoint>.outbox.db, separate from the bot's journal. Failed rows are appended to
+# <recipients>.failed.jsonl.
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+from whakit.config.log import setup_logging
+from whakit.config.settings import settings
+from whakit.services.broadcast import Broadcast, MessageTemplate
+from whakit.services.http import close_http_client
+from whakit.services.whatsapp import WhatsAppService
+
+logger = logging.getLogger(__name__)
+
+
+def print_progress(stats: dict):
+    print(
+        f"{stats['read']:6.1%} read | {stats['sent']} sent, {stats['failed']} failed | "
+        f"{stats['sends_per_second']:.1f} sends/s | {stats['elapsed_seconds']:.0f}s",
+        flush=True,
+    )
+
+
+async def run(args) -> dict:
+    root, _ = os.path.splitext(args.recipients)
+    checkpoint = args.checkpoint or f"{root}.checkpoint.json"
+    # The campaign keeps its own outbox journal next to its checkpoint; the
+    # running bot's journal must not be replayed or written by this process
+    settings.OUTBOX_JOURNAL_PATH = f"{os.path.splitext(checkpoint)[0]}.outbox.db"
+    service = WhatsAppService()
+    if args.payload:
+        with open(args.payload) as file:
+            payload = json.load(file)
+    elif args.template:
+        payload = service.template_message("", args.template, args.language, args.param)
+    else:
+        payload = service.text_message("", args.text)
+
+    broadcast = Broadcast(
+        service,
+        MessageTemplate(payload),
+        checkpoint_path=checkpoint,
+        failures_path=args.failures or f"{root}.failed.jsonl",
+        concurrency=args.concurrency,
+        to_column=args.to_column,
+        checkpoint_interval=args.progress,
+    )
+    try:
+        # Opens the outbox journal and replays sends left by an interrupted run
+        await service.startup()
+        return await broadcast.run(args.recipients, on_progress=print_progress)
+    finally:
+        # Let sends already handed to the outbox finish
+        await service.close()
+        await close_http_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send a message to every recipient in a CSV or JSONL file")
+    parser.add_argument("recipients", help="CSV with a header row, or JSONL with one object per line")
+    message = parser.add_mutually_exclusive_group(required=True)
+    message.add_argument("--text", help="Text message body")
+    message.add_argument("--template", help="Name of an approved message template")
+    message.add_argument("--payload", help="JSON file with a complete message payload")
+    parser.add_argument("--language", default="en_US", help="Template language code")
+    parser.add_argument("--param", action="append", help="Template body parameter, in order")
+    parser.add_argument("--to-column", default="to", help="Column holding the recipient's number")
+    parser.add_argument("--concurrency", type=int, default=50, help="Sends in flight at once")
+    parser.add_argument("--rate", type=float, help="Messages per second for this campaign, default OUTBOUND_RATE")
+    parser.add_argument("--checkpoint", help="Progress file, default <recipients>.checkpoint.json")
+    parser.add_argument("--failures", help="File for failed rows, default <recipients>.failed.jsonl")
+    parser.add_argument("--progress", type=float, default=5.0, help="Seconds between progress lines")
+    args = parser.parse_args()
+
+    if args.rate:
+        # Leave room for the running bot's replies, which share the phone number's limit
+        settings.OUTBOUND_RATE = args.rate
+        settings.OUTBOUND_BURST = max(1, int(args.rate))
+    setup_logging()
+    try:
+        stats = asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume.", file=sys.stderr)
+        sys.exit(130)
+    print_progress(stats)
+    sys.exit(1 if stats["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
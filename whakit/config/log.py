@@ -0,0 +1,107 @@
+# whakit/config/log.py
+
+import atexit
+import json
+import logging
+import logging.config
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Tuple
+
+from whakit.config.settings import settings
+
+# Attributes every LogRecord has; anything else was passed with `extra=`
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listeners: List[QueueListener] = []
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any `extra=` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def _queue_handlers(logger_names: List[Optional[str]]):
+    """Move each logger's handlers behind a queue drained by a listener thread.
+
+    Loggers sharing the same handlers share one queue and listener, so every
+    record is written once and the event loop only pays for a queue put.
+    """
+    by_handlers: Dict[Tuple[logging.Handler, ...], QueueHandler] = {}
+    for name in logger_names:
+        logger = logging.getLogger(name)
+        handlers = tuple(logger.handlers)
+        if not handlers:
+            continue
+        if handlers not in by_handlers:
+            records = queue.SimpleQueue()
+            listener = QueueListener(records, *handlers, respect_handler_level=True)
+            listener.start()
+            _listeners.append(listener)
+            by_handlers[handlers] = QueueHandler(records)
+        logger.handlers = [by_handlers[handlers]]
+
+
+class _Relay(logging.Handler):
+    """Hands a record from another process to the logger it was emitted on."""
+
+    def emit(self, record: logging.LogRecord):
+        logging.getLogger(record.name).handle(record)
+
+
+def receive_logging(records) -> QueueListener:
+    """Write records forwarded by worker processes through this process's handlers."""
+    listener = QueueListener(records, _Relay())
+    listener.start()
+    _listeners.append(listener)
+    return listener
+
+
+def forward_logging(records):
+    """In a worker process, send every record to the parent through `records`.
+
+    The parent owns the log file, so worker processes never race on
+    writing or rotating it.
+    """
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(records)]
+    for name in (None, "whakit"):
+        logging.getLogger(name).setLevel(settings.LOG_LEVEL)
+
+
+def stop_logging():
+    """Flush queued records and stop the listener threads."""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def setup_logging(config: Optional[dict] = None):
+    config = config or settings.LOGGING_CONFIG
+    stop_logging()
+    # File handlers fail if their directory is missing
+    for handler in config.get("handlers", {}).values():
+        directory = os.path.dirname(handler.get("filename") or "")
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    logging.config.dictConfig(config)
+    for name in (None, "whakit"):
+        logging.getLogger(name).setLevel(settings.LOG_LEVEL)
+    if settings.LOG_ASYNC:
+        _queue_handlers([None, *config.get("loggers", {})])
+
+
+atexit.register(stop_logging)
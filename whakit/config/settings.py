@@ -16,6 +16,7 @@ class Settings(BaseSettings):
     PORT: int = Field(default=os.environ.get("PORT", 8000), description="Port number")
     BASE_URL: str = Field(default=os.environ.get("BASE_URL", "https://graph.facebook.com"), description="Base URL")
     OPENAI_API_KEY: str = Field(default=os.environ.get("OPENAI_API_KEY", ""), description="OpenAI API key")
+    APP_SECRET: str = Field(default=os.environ.get("APP_SECRET", ""), description="Meta app secret used to verify webhook signatures")
 
     # Customizable settings
     GREETINGS: List[str] = Field(default=["hello", "hi", "hola"], description="List of greetings")
@@ -35,10 +36,97 @@ class Settings(BaseSettings):
             "reply": {"id": "option_3", "title": "Send Location"}
         }
     ])
+    FLOWS_PATH: str = Field(default="", description="JSON or YAML file with menu options and conversation flows; defaults to the bundled flows")
+    INTENT_CLASSIFIER: bool = Field(default=True, description="Match short replies with typos to known phrases by trigram similarity")
+    INTENT_CLASSIFIER_THRESHOLD: float = Field(default=0.4, description="Minimum trigram similarity for the intent classifier")
+    # Outbound HTTP client configuration (shared, pooled client)
+    HTTP_TIMEOUT: float = Field(default=10.0, description="Timeout in seconds for outbound HTTP requests")
+    HTTP_CONNECT_TIMEOUT: float = Field(default=5.0, description="Connect timeout in seconds for outbound HTTP requests")
+    HTTP_MAX_CONNECTIONS: int = Field(default=100, description="Maximum number of pooled connections")
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = Field(default=20, description="Maximum number of idle keep-alive connections")
+    HTTP_KEEPALIVE_EXPIRY: float = Field(default=30.0, description="Seconds an idle keep-alive connection is kept open")
+    HTTP2_ENABLED: bool = Field(default=False, description="Use HTTP/2 for outbound requests (requires the h2 package)")
+
+    # Outbound pacing and retries for the WhatsApp Cloud API
+    OUTBOUND_RATE: float = Field(default=80.0, description="Messages per second allowed for the business phone number")
+    OUTBOUND_BURST: int = Field(default=80, description="Burst size for the business phone number")
+    OUTBOUND_RECIPIENT_RATE: float = Field(default=1 / 6, description="Messages per second allowed to a single recipient")
+    OUTBOUND_RECIPIENT_BURST: int = Field(default=45, description="Burst size to a single recipient")
+    OUTBOUND_MAX_RETRIES: int = Field(default=5, description="Retries for throttled (429), 5xx or network failures")
+    OUTBOUND_BACKOFF_BASE: float = Field(default=0.5, description="Base delay in seconds for exponential backoff")
+    OUTBOUND_BACKOFF_MAX: float = Field(default=30.0, description="Maximum backoff delay in seconds")
+    READ_RECEIPT_DELAY: float = Field(default=0.5, description="Seconds to collapse read receipts from one sender into one")
+    OUTBOX_MAX_PENDING: int = Field(default=10000, description="Maximum outbound sends buffered before senders wait")
+    OUTBOX_DURABLE: bool = Field(default=False, description="Journal outbound sends to disk and replay unfinished ones on startup")
+    OUTBOX_JOURNAL_PATH: str = Field(default="whakit/data/outbox.db", description="Journal file used when OUTBOX_DURABLE is set")
+    OUTBOX_FAILED_RETENTION_SECONDS: float = Field(default=7 * 86400.0, description="Seconds failed sends are kept in the journal for inspection")
+    OUTBOX_FAILED_MAX_ROWS: int = Field(default=10000, description="Most recent failed sends kept in the journal")
+
+    # Media downloads and uploads
+    MEDIA_DOWNLOAD_INBOUND: bool = Field(default=False, description="Have the default handler download received media into the cache")
+    MEDIA_CACHE_DIR: str = Field(default="whakit/data/media", description="Directory where downloaded media is cached")
+    MEDIA_CACHE_MAX_BYTES: int = Field(default=1 << 30, description="Size of the media cache before the least recently used files are removed")
+    MEDIA_CHUNK_SIZE: int = Field(default=64 * 1024, description="Bytes read or written per chunk when streaming media")
+    MEDIA_ID_CACHE_SIZE: int = Field(default=1000, description="Uploaded media ids remembered by content hash")
+    MEDIA_ID_TTL_SECONDS: float = Field(default=29 * 86400.0, description="Seconds an uploaded media id is reused; Meta keeps media for 30 days")
+
+    # Completed appointments
+    APPOINTMENTS_BACKEND: str = Field(default="none", description="Where appointments are stored: none, sqlite, csv, parquet or sheets")
+    APPOINTMENTS_PATH: str = Field(default="", description="File (sqlite, csv) or directory (parquet); empty for whakit/data/appointments.*")
+    APPOINTMENTS_BATCH_SIZE: int = Field(default=100, description="Buffered appointments that trigger a write")
+    APPOINTMENTS_FLUSH_INTERVAL: float = Field(default=5.0, description="Seconds a buffered appointment waits at most before it is written")
+    APPOINTMENTS_MAX_BUFFERED: int = Field(default=10000, description="Appointments kept in memory while the backend is failing")
+    SHEETS_SPREADSHEET_ID: str = Field(default="", description="Spreadsheet for the sheets backend")
+    SHEETS_RANGE: str = Field(default="Sheet1", description="Sheet or range that rows are appended to")
+    SHEETS_CREDENTIALS_PATH: str = Field(default="whakit/credentials/credentials.json", description="Service account key for the sheets backend")
+
+    # Background message workers
+    WORKER_COUNT: int = Field(default=8, description="Number of async workers processing incoming messages")
+    WORKER_QUEUE_SIZE: int = Field(default=1000, description="Maximum number of messages waiting for a worker")
+    WORKER_ENQUEUE_TIMEOUT: float = Field(default=1.0, description="Seconds to wait for a free queue slot before rejecting a webhook")
+    WORKER_SHUTDOWN_TIMEOUT: float = Field(default=10.0, description="Seconds to drain queued messages on shutdown")
+    WORKER_PROCESSES: int = Field(default=1, description="Handler processes; above 1, each sender's messages are routed to one of them")
+
+    # Conversation state store
+    STATE_BACKEND: str = Field(default="memory", description="State store backend: memory, sqlite or redis")
+    STATE_TTL_SECONDS: float = Field(default=86400.0, description="Seconds of inactivity before a user's state expires")
+    STATE_SQLITE_PATH: str = Field(default="whakit/data/state.db", description="Database file for the sqlite backend")
+    STATE_REDIS_URL: str = Field(default="redis://localhost:6379/0", description="Server URL for the redis backend")
+
+    # Chat history window sent to the AI assistant
+    HISTORY_MAX_MESSAGES: int = Field(default=20, description="Maximum chat turns kept verbatim")
+    HISTORY_MAX_TOKENS: int = Field(default=1500, description="Maximum estimated tokens of verbatim chat turns")
+    HISTORY_SUMMARY_MAX_TOKENS: int = Field(default=300, description="Maximum estimated tokens of the summary of older turns")
+    HISTORY_SUMMARY_TURN_CHARS: int = Field(default=160, description="Characters kept per turn when folding it into the summary")
+    HISTORY_CACHE_SIZE: int = Field(default=10000, description="Chat histories kept in memory between turns, by sender")
+
+    # Webhook redelivery deduplication
+    DEDUP_BACKEND: str = Field(default="memory", description="Backend for seen message ids: memory, or store to share them through the state store")
+    DEDUP_TTL_SECONDS: float = Field(default=86400.0, description="Seconds a message id is remembered")
+    DEDUP_MAX_ENTRIES: int = Field(default=100_000, description="Maximum message ids kept by the in-memory backend")
+
     # AI Assistant Configuration
     AI_SYSTEM_PROMPT: str = Field(default="You are a helpful assistant.", description="System prompt for the AI assistant")
+    AI_PROMPT_PATH: str = Field(default="", description="ReAct prompt template file; defaults to the bundled react-chat prompt")
+    AI_WARM_ON_STARTUP: bool = Field(default=True, description="Build the AI agent in the background when the app starts")
+    AI_MAX_CONCURRENCY: int = Field(default=16, description="Maximum concurrent AI generations")
+    AI_TIMEOUT: float = Field(default=30.0, description="Seconds before an AI generation is abandoned")
+    AI_SYNC_FALLBACK: bool = Field(default=False, description="Run the agent synchronously on a dedicated thread pool instead of its async API")
+    AI_EXECUTOR_WORKERS: int = Field(default=4, description="Threads in the dedicated pool used by AI_SYNC_FALLBACK")
+    AI_STREAMING: bool = Field(default=False, description="Send AI answers in parts as they are generated")
+    AI_STREAM_MIN_CHARS: int = Field(default=120, description="Minimum characters buffered before a streamed part is sent")
+    AI_CACHE_ENABLED: bool = Field(default=False, description="Cache answers to repeated, self-contained questions and share them between users")
+    AI_CACHE_MAX_ENTRIES: int = Field(default=1000, description="Maximum cached answers per cache layer")
+    AI_CACHE_TTL_SECONDS: float = Field(default=3600.0, description="Seconds a cached answer stays valid")
+    AI_CACHE_SEMANTIC: bool = Field(default=False, description="Also match similar questions by embedding (requires numpy)")
+    AI_CACHE_SIMILARITY_THRESHOLD: float = Field(default=0.92, description="Minimum cosine similarity for a semantic cache hit")
+    AI_CACHE_EMBEDDING_MODEL: str = Field(default="text-embedding-3-small", description="Embedding model for the semantic cache")
 
     # Logging Configuration
+    LOG_LEVEL: str = Field(default="INFO", description="Level for the root and whakit loggers; DEBUG also traces the AI agent")
+    LOG_ASYNC: bool = Field(default=True, description="Write log records from a background thread instead of the event loop")
+    OTEL_ENABLED: bool = Field(default=False, description="Emit OpenTelemetry spans per pipeline stage (requires opentelemetry-api and an SDK)")
+
     LOGGING_CONFIG: Dict = Field(default_factory=lambda: {
         "version": 1,
         "disable_existing_loggers": False,
@@ -48,6 +136,9 @@ class Settings(BaseSettings):
                 "style": "{",
                 "datefmt": "%Y-%m-%d %H:%M:%S",
             },
+            "json": {
+                "()": "whakit.config.log.JsonFormatter",
+            },
         },
         "handlers": {
             "console": {
@@ -56,19 +147,22 @@ class Settings(BaseSettings):
                 "level": "DEBUG",
             },
             "file": {
-                "class": "logging.FileHandler",
-                "formatter": "default",
+                "class": "logging.handlers.RotatingFileHandler",
+                "formatter": "json",
                 "level": "DEBUG",
                 "filename": "whakit/logs/app.log",
+                "maxBytes": 10 * 1024 * 1024,
+                "backupCount": 5,
+                "encoding": "utf-8",
             },
         },
         "root": {
             "handlers": ["console", "file"],
-            "level": "DEBUG",
+            "level": "INFO",
         },
         "loggers": {
             "whakit": {
-                "level": "DEBUG",
+                "level": "INFO",
                 "propagate": True,
             },
             "uvicorn": {
@@ -1,45 +1,98 @@
 # whakit/controllers/webhook_controller.py
 
 import logging
+import time
+from typing import Optional
 
 from fastapi import APIRouter, HTTPException, Request, Response
 
 from whakit.config.settings import settings
+from whakit.services.dedup import MessageDeduplicator
 from whakit.services.message_handler import BaseMessageHandler, DefaultMessageHandler
+from whakit.services.metrics import WEBHOOK_EVENTS, WEBHOOK_PARSE_SECONDS, span
+from whakit.services.queue import MessageQueue
+from whakit.services.workers import WorkerPool
+from whakit.utils import SignatureVerifier, decode_webhook, iter_webhook_events
 
 logger = logging.getLogger(__name__)
 
-logger.info(f"Logger {logger.name} effective level: {logging.getLevelName(logger.getEffectiveLevel())}")
+logger.debug("Logger %s effective level: %s", logger.name, logging.getLevelName(logger.getEffectiveLevel()))
 
 router = APIRouter()
 
-# Instantiate the default message handler
-message_handler: BaseMessageHandler = DefaultMessageHandler()
+# Messages are processed by background workers so the webhook can ack at once;
+# with several worker processes, this process only routes them by sender and
+# each worker builds its own handler
+message_handler: Optional[BaseMessageHandler] = None
+if settings.WORKER_PROCESSES > 1:
+    message_queue = WorkerPool(settings.WORKER_PROCESSES)
+else:
+    # Instantiate the default message handler
+    message_handler = DefaultMessageHandler()
+    message_queue = MessageQueue(message_handler)
+
+# Meta retries deliveries; drop messages whose id was already accepted
+deduplicator = MessageDeduplicator()
+
+# Deliveries must be signed with the app secret when one is configured
+signature_verifier = SignatureVerifier(settings.APP_SECRET) if settings.APP_SECRET else None
+if signature_verifier is None:
+    logger.warning("APP_SECRET is not set; webhook signatures will not be verified.")
 
 
 @router.post("/webhook")
 async def handle_incoming(request: Request):
-    body = await request.json()
-    # Extract message and sender_info from the webhook payload
-    message = (
-        body.get("entry", [{}])[0]
-        .get("changes", [{}])[0]
-        .get("value", {})
-        .get("messages", [{}])[0]
-    )
-    sender_info = (
-        body.get("entry", [{}])[0]
-        .get("changes", [{}])[0]
-        .get("value", {})
-        .get("contacts", [{}])[0]
-    )
-    if message:
-        await message_handler.handle_incoming_message(message, sender_info)
-    else:
-        logger.warning("Received webhook without message.")
+    # Queued messages carry this span's context, so their handling joins the trace
+    with span("webhook"):
+        return await _receive(request)
+
+
+async def _receive(request: Request) -> Response:
+    # The raw body is read once, checked, and the same bytes are decoded
+    raw = await request.body()
+    parse_started = time.perf_counter()
+    if signature_verifier is not None and not signature_verifier.verify(
+        raw, request.headers.get("X-Hub-Signature-256")
+    ):
+        logger.warning("Rejected webhook with a missing or invalid signature.")
+        raise HTTPException(status_code=401)
+    try:
+        body = decode_webhook(raw)
+    except ValueError:
+        logger.warning("Received webhook with an invalid JSON body.")
+        raise HTTPException(status_code=400)
+    WEBHOOK_PARSE_SECONDS.observe(time.perf_counter() - parse_started)
+    # A single delivery may batch several entries, changes, messages and statuses
+    received = 0
+    for kind, item, sender_info in iter_webhook_events(body):
+        received += 1
+        WEBHOOK_EVENTS.labels(kind).inc()
+        if kind == "message":
+            if await deduplicator.is_duplicate(item.message_id):
+                continue
+            accepted = await message_queue.enqueue(item, sender_info)
+            if not accepted:
+                # Let the redelivery through once there is room again
+                await deduplicator.forget(item.message_id)
+        else:
+            accepted = await message_queue.enqueue_status(item)
+        if not accepted:
+            # Queue is saturated; ask Meta to redeliver later
+            return Response(status_code=503)
+    if not received:
+        logger.warning("Received webhook without messages or statuses.")
     return Response(status_code=200)
 
 
+@router.get("/webhook/stats")
+async def webhook_stats():
+    stats = {"queue": message_queue.stats(), "dedup": deduplicator.stats()}
+    # Worker processes report their handler's stats under queue.workers
+    if settings.WORKER_PROCESSES <= 1:
+        stats["handler"] = message_handler.stats()
+    return stats
+
+
 @router.get("/webhook")
 async def verify_webhook(request: Request):
     params = request.query_params
@@ -1,26 +1,47 @@
 # whakit/main.py
 
 import logging
-import logging.config
+from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 
+from whakit.config.log import setup_logging
 from whakit.config.settings import settings
+from whakit.controllers.webhook import deduplicator, message_handler, message_queue
 from whakit.routes.webhook import router as webhook_router
+from whakit.services.http import close_http_client, get_http_client
+from whakit.services.metrics import REGISTRY
 
 
-def setup_logging():
-    # Configure logging
-    logging.config.dictConfig(settings.LOGGING_CONFIG)
-
-# Call the setup_logging function before creating the app
+# Call the setup_logging function before creating the app; records are
+# written by a background thread so handlers never block the event loop
 setup_logging()
 
 logger = logging.getLogger(__name__)
 logger.info("Starting WhaKit application.")
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the shared, pooled HTTP client once for the lifetime of the app
+    get_http_client()
+    # With WORKER_PROCESSES > 1 the handler runs in the worker processes
+    local = settings.WORKER_PROCESSES <= 1
+    if local:
+        await message_handler.startup()
+    message_queue.start()
+    yield
+    # Drain in-flight messages before the HTTP client and stores go away
+    await message_queue.stop()
+    if local:
+        await message_handler.shutdown()
+    await deduplicator.close()
+    await close_http_client()
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(webhook_router)
 
 
@@ -29,5 +50,13 @@ async def root():
     return {"message": "Nothing to see here. Checkout README.md to start."}
 
 
+@app.get("/metrics")
+async def metrics():
+    # Prometheus text exposition format; worker processes' metrics are summed in
+    snapshots = message_queue.metric_snapshots() if settings.WORKER_PROCESSES > 1 else ()
+    return PlainTextResponse(REGISTRY.render(snapshots), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
+    # Development server with auto-reload; use `python -m whakit.serve` in production
     uvicorn.run("whakit.main:app", host="0.0.0.0", port=settings.PORT, reload=True)
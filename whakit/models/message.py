@@ -1,12 +1,58 @@
 # whakit/models/message_models.py
 
+from dataclasses import dataclass, field
 from typing import Any, Dict, Optional
 
-from pydantic import BaseModel
+# Message types whose content refers to a file by media id
+MEDIA_TYPES = frozenset({"image", "audio", "video", "document", "sticker"})
 
 
-class Message(BaseModel):
+@dataclass(slots=True)
+class Message:
+    """An incoming WhatsApp message, decoded from a Cloud API webhook.
+
+    `content` is the object under the message's type key, e.g.
+    {"body": "hi"} for a text message or {"type": "button_reply", ...}
+    for an interactive reply.
+    """
+
     from_number: str
     message_type: str
     content: Dict[str, Any]
     message_id: str
+    timestamp: Optional[str] = None
+    context: Optional[Dict[str, Any]] = field(default=None, repr=False)
+
+    @classmethod
+    def from_payload(cls, message: dict) -> "Message":
+        message_type = message.get("type") or ""
+        return cls(
+            message.get("from") or "",
+            message_type,
+            message.get(message_type) or {},
+            message.get("id") or "",
+            message.get("timestamp"),
+            message.get("context"),
+        )
+
+    @property
+    def text(self) -> str:
+        """Body of a text message, or "" for other types."""
+        if self.message_type == "text":
+            return self.content.get("body") or ""
+        return ""
+
+    @property
+    def reply_id(self) -> Optional[str]:
+        """Id of the button or list row chosen in an interactive reply."""
+        if self.message_type != "interactive":
+            return None
+        reply = self.content.get("button_reply") or self.content.get("list_reply") or {}
+        return reply.get("id")
+
+    @property
+    def media_id(self) -> Optional[str]:
+        """Graph API id of the attached file for media messages."""
+        if self.message_type not in MEDIA_TYPES:
+            return None
+        return self.content.get("id")
@@ -0,0 +1,34 @@
+# whakit/serve.py
+#
+# Production entry point: no auto-reload, and optionally several handler
+# processes with each sender's messages routed to the same one.
+#
+#   python -m whakit.serve --workers 4
+
+import argparse
+import os
+
+import uvicorn
+
+from whakit.config.settings import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run WhaKit in production")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.WORKER_PROCESSES,
+        help="Handler processes, default WORKER_PROCESSES; 0 uses one per CPU",
+    )
+    parser.add_argument("--access-log", action="store_true", help="Log every request")
+    args = parser.parse_args()
+    # Read when the app is imported, which uvicorn does below
+    settings.WORKER_PROCESSES = args.workers or os.cpu_count() or 1
+    uvicorn.run("whakit.main:app", host=args.host, port=args.port, access_log=args.access_log)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,55 +2,204 @@
 
 import asyncio
 import logging
-
-from langchain import hub
-from langchain.agents import AgentExecutor, create_react_agent
-from langchain_openai import ChatOpenAI
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncIterator, Optional
 
 from whakit.config.settings import settings
+from whakit.services.cache import ResponseCache
+from whakit.services.metrics import AI_IN_FLIGHT, AI_SECONDS, span
+
+if TYPE_CHECKING:
+    from langchain.agents import AgentExecutor
+    from langchain_core.language_models import BaseChatModel
 
 logger = logging.getLogger(__name__)
 
+FALLBACK_RESPONSE = "I'm sorry, I couldn't process your request at this time."
+
+# ReAct prompt with chat history (hwchase17/react-chat), bundled so that no
+# network access is needed to start the agent
+BUNDLED_PROMPT_PATH = Path(__file__).resolve().parent.parent / "prompts" / "react_chat.txt"
+
+
+def load_prompt_template() -> str:
+    path = Path(settings.AI_PROMPT_PATH) if settings.AI_PROMPT_PATH else BUNDLED_PROMPT_PATH
+    return path.read_text(encoding="utf-8")
+
 
 class AIService:
-    def __init__(self):
-        # Initialize the LLM
-        self.llm = ChatOpenAI(
-            openai_api_key=settings.OPENAI_API_KEY,
-            model_name="gpt-4o-mini",
-            temperature=0  # Set temperature for deterministic output
-        )
+    def __init__(self, llm: Optional["BaseChatModel"] = None, cache: Optional[ResponseCache] = None):
+        # Any chat model can be injected, e.g. a fake for tests. The default
+        # model and the agent are built on first use (or by warm_up), so
+        # constructing the service is cheap and never touches the network.
+        self._llm = llm
+        self._agent_executor: Optional["AgentExecutor"] = None
+        self._build_lock = asyncio.Lock()
 
         # Initialize tools (you can add more tools as needed)
         self.tools = []  # List of tools the agent can use
 
-        # Load the ReAct prompt that supports chat history
-        self.prompt = hub.pull("hwchase17/react-chat")
+        # Bounds concurrent model calls so a slow model cannot pile up work
+        self._semaphore = asyncio.Semaphore(settings.AI_MAX_CONCURRENCY)
+        # Answers to repeated, self-contained questions are served from cache
+        self.cache = cache
+        if self.cache is None and settings.AI_CACHE_ENABLED:
+            self.cache = ResponseCache()
+
+        # Only used when AI_SYNC_FALLBACK is set; never the loop's default pool
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if settings.AI_SYNC_FALLBACK:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.AI_EXECUTOR_WORKERS, thread_name_prefix="whakit-ai"
+            )
+
+    def _build_llm(self) -> "BaseChatModel":
+        if self._llm is None:
+            from langchain_openai import ChatOpenAI
+
+            self._llm = ChatOpenAI(
+                openai_api_key=settings.OPENAI_API_KEY,
+                model_name="gpt-4o-mini",
+                temperature=0,  # Set temperature for deterministic output
+                timeout=settings.AI_TIMEOUT,
+            )
+        return self._llm
+
+    def _build_agent_executor(self) -> "AgentExecutor":
+        from langchain.agents import AgentExecutor, create_react_agent
+        from langchain_core.prompts import PromptTemplate
 
         # Create the ReAct agent
-        self.agent = create_react_agent(
-            llm=self.llm,
+        agent = create_react_agent(
+            llm=self._build_llm(),
             tools=self.tools,
-            prompt=self.prompt,
+            prompt=PromptTemplate.from_template(load_prompt_template()),
         )
 
         # Create the agent executor
-        self.agent_executor = AgentExecutor(
-            agent=self.agent,
+        return AgentExecutor(
+            agent=agent,
             tools=self.tools,
-            verbose=True  # Set to True for debugging
+            # Trace the agent's reasoning only when debug logging is on
+            verbose=logger.isEnabledFor(logging.DEBUG),
         )
 
+    async def get_llm(self) -> "BaseChatModel":
+        if self._llm is None:
+            async with self._build_lock:
+                # Importing langchain is slow and CPU bound; keep it off the event loop
+                await asyncio.to_thread(self._build_llm)
+        return self._llm
+
+    async def get_agent_executor(self) -> "AgentExecutor":
+        if self._agent_executor is None:
+            async with self._build_lock:
+                if self._agent_executor is None:
+                    self._agent_executor = await asyncio.to_thread(self._build_agent_executor)
+        return self._agent_executor
+
+    async def warm_up(self):
+        """Build the model and agent ahead of the first question."""
+        started = time.perf_counter()
+        try:
+            await self.get_agent_executor()
+            logger.info("AI agent ready in %.2fs", time.perf_counter() - started)
+        except Exception as e:
+            logger.error("AI warm-up failed; will retry on first use: %s", e)
+
     async def generate_response(self, user_message: str, chat_history: str = "") -> str:
-        # Since the agent executor might not support async, use run_in_executor
-        loop = asyncio.get_event_loop()
+        started = time.perf_counter()
+        outcome = "ok"
         try:
-            response = await loop.run_in_executor(
-                None,
-                self.agent_executor.invoke,
-                {"input": user_message, "chat_history": chat_history}
-            )
-            return response.strip()
+            with span("ai.generate_response"), AI_IN_FLIGHT.track():
+                if self.cache is not None:
+                    return await self.cache.get_or_generate(user_message, chat_history, self._generate)
+                return await self._generate(user_message, chat_history)
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            logger.error("AI response timed out after %ss", settings.AI_TIMEOUT)
+            return FALLBACK_RESPONSE
         except Exception as e:
-            logger.error(f"Error generating AI response: {e}")
-            return "I'm sorry, I couldn't process your request at this time."
\ No newline at end of file
+            outcome = "error"
+            logger.error("Error generating AI response: %s", e)
+            return FALLBACK_RESPONSE
+        finally:
+            AI_SECONDS.labels(outcome).observe(time.perf_counter() - started)
+
+    async def _generate(self, user_message: str, chat_history: str) -> str:
+        response = await self._invoke({"input": user_message, "chat_history": chat_history})
+        output = response.get("output", "") if isinstance(response, dict) else response
+        return str(output).strip()
+
+    async def stream_response(self, user_message: str, chat_history: str = "") -> AsyncIterator[str]:
+        """Yield the answer as the model produces it.
+
+        Streams the chat model directly rather than the ReAct agent, whose
+        intermediate "Thought:" text must not reach the user.
+        """
+        lookup = None
+        if self.cache is not None:
+            lookup = await self.cache.lookup(user_message, chat_history)
+            if lookup.response is not None:
+                yield lookup.response
+                return
+
+        from langchain_core.messages import HumanMessage, SystemMessage
+
+        messages = [SystemMessage(content=settings.AI_SYSTEM_PROMPT)]
+        if chat_history:
+            messages.append(SystemMessage(content=f"Previous conversation history:\n{chat_history}"))
+        messages.append(HumanMessage(content=user_message))
+
+        llm = await self.get_llm()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.AI_TIMEOUT
+        produced = []
+        failed = False
+        started = time.perf_counter()
+        async with self._semaphore:
+            stream = llm.astream(messages).__aiter__()
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(
+                            stream.__anext__(), timeout=max(deadline - loop.time(), 0)
+                        )
+                    except StopAsyncIteration:
+                        break
+                    if chunk.content:
+                        produced.append(chunk.content)
+                        yield chunk.content
+            except asyncio.TimeoutError:
+                failed = True
+                logger.error("AI stream timed out after %ss", settings.AI_TIMEOUT)
+            except Exception as e:
+                failed = True
+                logger.error("Error streaming AI response: %s", e)
+            finally:
+                await stream.aclose()
+        if not produced:
+            yield FALLBACK_RESPONSE
+        elif lookup is not None and not failed:
+            self.cache.store(lookup, "".join(produced).strip(), time.perf_counter() - started)
+
+    async def _invoke(self, inputs: dict):
+        agent_executor = await self.get_agent_executor()
+        await self._semaphore.acquire()
+        if self._executor is not None:
+            # A thread cannot be cancelled, so its slot is held until it really finishes
+            future = asyncio.get_running_loop().run_in_executor(
+                self._executor, agent_executor.invoke, inputs
+            )
+            future.add_done_callback(lambda _: self._semaphore.release())
+            return await asyncio.wait_for(asyncio.shield(future), timeout=settings.AI_TIMEOUT)
+        try:
+            return await asyncio.wait_for(agent_executor.ainvoke(inputs), timeout=settings.AI_TIMEOUT)
+        finally:
+            self._semaphore.release()
+
+    async def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
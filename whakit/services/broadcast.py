@@ -0,0 +1,266 @@
+# whakit/services/broadcast.py
+
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from string import Formatter
+from typing import Any, Callable, Iterator, Optional, Set, Tuple
+
+from whakit.services.whatsapp import WhatsAppService
+
+logger = logging.getLogger(__name__)
+
+_FORMATTER = Formatter()
+
+
+def _compile(node: Any) -> Optional[Callable[[dict], Any]]:
+    """A function filling `node`'s {column} placeholders from a row, or None if it has none."""
+    if isinstance(node, str):
+        if any(field is not None for _, field, _, _ in _FORMATTER.parse(node)):
+            return node.format_map
+        return None
+    if isinstance(node, dict):
+        dynamic = {key: render for key, value in node.items() if (render := _compile(value)) is not None}
+        if not dynamic:
+            return None
+        return lambda row: {
+            key: dynamic[key](row) if key in dynamic else value for key, value in node.items()
+        }
+    if isinstance(node, list):
+        dynamic = {i: render for i, value in enumerate(node) if (render := _compile(value)) is not None}
+        if not dynamic:
+            return None
+        return lambda row: [dynamic[i](row) if i in dynamic else value for i, value in enumerate(node)]
+    return None
+
+
+class MessageTemplate:
+    """An outbound payload whose strings may contain {column} placeholders.
+
+    The payload is compiled once per campaign. Rendering a row only rebuilds
+    the objects that contain placeholders; every static part is shared
+    between all the payloads.
+    """
+
+    def __init__(self, payload: dict):
+        self.payload = {key: value for key, value in payload.items() if key != "to"}
+        static = self.payload
+        self._render = _compile(self.payload) or (lambda row: static)
+        self.fingerprint = hashlib.sha256(json.dumps(self.payload, sort_keys=True).encode()).hexdigest()
+
+    def render(self, to: str, row: dict) -> dict:
+        """The payload for one recipient; raises KeyError for a missing column."""
+        return {**self._render(row), "to": to}
+
+
+class InvalidRow:
+    """Stands in for a line of the recipients file that could not be parsed."""
+
+    __slots__ = ("line", "reason")
+
+    def __init__(self, line: str, reason: str):
+        self.line = line
+        self.reason = reason
+
+
+def read_recipients(path: str) -> Tuple[Iterator[Any], Callable[[], float]]:
+    """Rows of a CSV or JSONL file, read lazily, and a function giving the fraction read.
+
+    A JSONL line that is not valid JSON is yielded as an InvalidRow, so one
+    bad line does not end the file.
+    """
+    file = open(path, "rb")
+    size = os.fstat(file.fileno()).st_size
+
+    def progress() -> float:
+        return file.tell() / size if size and not file.closed else 1.0
+
+    def rows() -> Iterator[dict]:
+        with file:
+            if path.endswith((".jsonl", ".ndjson")):
+                for line in file:
+                    if line.strip():
+                        try:
+                            yield json.loads(line)
+                        except ValueError as e:
+                            yield InvalidRow(line.decode("utf-8", errors="replace").rstrip("\r\n"), f"parse: {e}")
+            else:
+                for row in csv.DictReader(io.TextIOWrapper(file, encoding="utf-8-sig", newline="")):
+                    # Short rows leave columns as None; treat them as missing, not as "None"
+                    yield {key: value for key, value in row.items() if key is not None and value is not None}
+
+    return rows(), progress
+
+
+class Broadcast:
+    """Sends one message template to a stream of recipients.
+
+    A fixed number of tasks pull rows from the stream and send them. Only
+    `concurrency` rows are in flight at once, so memory does not grow with
+    the recipient list. Sends go through the WhatsApp service's outbox and
+    rate limiter like any other reply.
+
+    Progress is saved to a checkpoint file: every row below a watermark is
+    finished, plus the finished rows above it. A rerun with the same
+    checkpoint skips those rows. Sends in flight when a run is interrupted
+    are not recorded, so those few recipients may get the message twice.
+    Rows whose send fails, or that cannot be rendered, are appended to a
+    failures file for a later retry.
+    """
+
+    def __init__(
+        self,
+        whatsapp_service: WhatsAppService,
+        template: MessageTemplate,
+        checkpoint_path: Optional[str] = None,
+        failures_path: Optional[str] = None,
+        concurrency: int = 50,
+        to_column: str = "to",
+        checkpoint_interval: float = 1.0,
+    ):
+        self.whatsapp_service = whatsapp_service
+        self.template = template
+        self.checkpoint_path = checkpoint_path
+        self.failures_path = failures_path
+        self.concurrency = concurrency
+        self.to_column = to_column
+        self.checkpoint_interval = checkpoint_interval
+        self._watermark = 0
+        self._done: Set[int] = set()
+        self._failures = None
+        self._progress: Callable[[], float] = lambda: 0.0
+        self._started = 0.0
+
+        # Counters exposed through stats()
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0
+        self.finished = 0
+
+    def _load_checkpoint(self, source: str):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path) as file:
+            checkpoint = json.load(file)
+        if checkpoint.get("source") != source or checkpoint.get("template") != self.template.fingerprint:
+            raise ValueError(
+                f"Checkpoint {self.checkpoint_path} belongs to another campaign; remove it to start over"
+            )
+        self._watermark = checkpoint["watermark"]
+        self._done = set(checkpoint["done"])
+        self.sent = checkpoint["sent"]
+        self.failed = checkpoint["failed"]
+        logger.info("Resuming broadcast at row %d (%d sent, %d failed).", self._watermark, self.sent, self.failed)
+
+    def save_checkpoint(self, source: str):
+        if not self.checkpoint_path:
+            return
+        checkpoint = {
+            "source": source,
+            "template": self.template.fingerprint,
+            "watermark": self._watermark,
+            "done": sorted(self._done),
+            "sent": self.sent,
+            "failed": self.failed,
+        }
+        partial = self.checkpoint_path + ".tmp"
+        with open(partial, "w") as file:
+            json.dump(checkpoint, file)
+        os.replace(partial, self.checkpoint_path)
+
+    def _finish(self, index: int):
+        self.finished += 1
+        self._done.add(index)
+        # Advance the watermark over the contiguous run of finished rows
+        while self._watermark in self._done:
+            self._done.remove(self._watermark)
+            self._watermark += 1
+
+    def _record_failure(self, index: int, row: Any, reason: str):
+        self.failed += 1
+        if self.failures_path:
+            if self._failures is None:
+                self._failures = open(self.failures_path, "a")
+            if isinstance(row, InvalidRow):
+                row = {"_line": row.line}
+            elif not isinstance(row, dict):
+                row = {"_value": row}
+            self._failures.write(json.dumps({**row, "_row": index, "_reason": reason}) + "\n")
+
+    async def _worker(self, rows: Iterator[Tuple[int, Any]]):
+        # Tasks share one iterator; rows are taken between awaits, so each goes to one task
+        for index, row in rows:
+            if index < self._watermark or index in self._done:
+                self.skipped += 1
+                continue
+            if isinstance(row, InvalidRow):
+                self._record_failure(index, row, row.reason)
+                self._finish(index)
+                continue
+            if not isinstance(row, dict):
+                self._record_failure(index, row, f"row is a {type(row).__name__}, not an object")
+                self._finish(index)
+                continue
+            try:
+                data = self.template.render(str(row[self.to_column]), row)
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                self._record_failure(index, row, f"render: {e!r}")
+                self._finish(index)
+                continue
+            future = await self.whatsapp_service.enqueue(data)
+            if await future:
+                self.sent += 1
+            else:
+                self._record_failure(index, row, "send failed")
+            self._finish(index)
+
+    async def run(
+        self,
+        source: str,
+        on_progress: Optional[Callable[[dict], None]] = None,
+    ) -> dict:
+        """Send to every row of the CSV or JSONL file at `source` and return the final stats."""
+        self._load_checkpoint(source)
+        rows, self._progress = read_recipients(source)
+        numbered = enumerate(rows)
+        self._started = time.perf_counter()
+        workers = [asyncio.create_task(self._worker(numbered)) for _ in range(self.concurrency)]
+        try:
+            while True:
+                done, _ = await asyncio.wait(workers, timeout=self.checkpoint_interval)
+                for task in done:
+                    # Surface unexpected errors instead of silently losing a worker
+                    task.result()
+                workers = [task for task in workers if not task.done()]
+                self.save_checkpoint(source)
+                if on_progress is not None:
+                    on_progress(self.stats())
+                if not workers:
+                    break
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.save_checkpoint(source)
+            if self._failures is not None:
+                self._failures.close()
+                self._failures = None
+        return self.stats()
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "next_row": self._watermark,
+            "read": self._progress(),
+            "elapsed_seconds": elapsed,
+            # Rows finished by this run, not counting those from a resumed checkpoint
+            "sends_per_second": self.finished / elapsed if elapsed else 0.0,
+        }
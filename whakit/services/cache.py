@@ -0,0 +1,244 @@
+# whakit/services/cache.py
+
+import logging
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional, Sequence, Tuple
+
+from whakit.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+Embedder = Callable[[str], Awaitable[Sequence[float]]]
+Generator = Callable[[str, str], Awaitable[str]]
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+# Words that usually refer back to earlier turns ("what about that one?")
+_CONTEXT_WORDS = frozenset({
+    "it", "its", "that", "this", "those", "these", "they", "them", "their",
+    "he", "she", "him", "her", "there", "again", "also", "else", "another",
+    "same", "other", "previous", "above", "and",
+})
+
+# Words about the user or the conversation itself ("what is my pet's name?",
+# "what did i just ask?"); the answer comes from this user's history
+_PERSONAL_WORDS = frozenset({
+    "i", "me", "my", "mine", "myself", "we", "us", "our", "ours", "you", "your",
+    "last", "before", "earlier", "ask", "asked", "said", "told", "conversation", "chat",
+})
+
+
+def normalize_question(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text)).strip()
+
+
+def is_context_dependent(normalized: str, chat_history: str) -> bool:
+    """Whether the answer likely depends on earlier turns, making it unsafe to share."""
+    if not chat_history:
+        return False
+    words = normalized.split()
+    if len(words) <= 2:
+        return True
+    return (
+        any(word in _CONTEXT_WORDS or word in _PERSONAL_WORDS for word in words)
+        or normalized.startswith(("what about", "how about"))
+    )
+
+
+class ExactCache:
+    """LRU of normalized question -> answer with a TTL per entry."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[str, float, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        response, expires_at, latency = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response, latency
+
+    def put(self, key: str, response: str, latency: float):
+        self._entries[key] = (response, time.monotonic() + self.ttl, latency)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SemanticIndex:
+    """Brute-force cosine-similarity index over question embeddings (NumPy)."""
+
+    def __init__(self, max_entries: int, ttl: float, threshold: float):
+        import numpy as np
+
+        self._np = np
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._vectors = None  # allocated on first insert, once the dimension is known
+        self._expires = np.zeros(max_entries)
+        self._last_used = np.zeros(max_entries)
+        self._responses: List[Optional[Tuple[str, float]]] = [None] * max_entries
+        self._size = 0
+
+    def _unit(self, vector: Sequence[float]):
+        vector = self._np.asarray(vector, dtype=self._np.float32)
+        norm = self._np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def search(self, vector: Sequence[float]) -> Optional[Tuple[str, float]]:
+        if not self._size:
+            return None
+        now = time.monotonic()
+        scores = self._vectors[:self._size] @ self._unit(vector)
+        scores[self._expires[:self._size] <= now] = -1.0
+        best = int(scores.argmax())
+        if scores[best] < self.threshold:
+            return None
+        self._last_used[best] = now
+        return self._responses[best]
+
+    def add(self, vector: Sequence[float], response: str, latency: float):
+        vector = self._unit(vector)
+        if self._vectors is None:
+            self._vectors = self._np.zeros((self.max_entries, vector.shape[0]), dtype=self._np.float32)
+        now = time.monotonic()
+        if self._size < self.max_entries:
+            slot = self._size
+            self._size += 1
+        else:
+            # Reuse an expired slot if there is one, otherwise the least recently used
+            recency = self._np.where(self._expires <= now, -1.0, self._last_used)
+            slot = int(recency.argmin())
+        self._vectors[slot] = vector
+        self._expires[slot] = now + self.ttl
+        self._last_used[slot] = now
+        self._responses[slot] = (response, latency)
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class CacheLookup:
+    __slots__ = ("key", "cacheable", "embedding", "response")
+
+    def __init__(self, key: str, cacheable: bool):
+        self.key = key
+        self.cacheable = cacheable
+        self.embedding: Optional[Sequence[float]] = None
+        self.response: Optional[str] = None
+
+
+def _openai_embedder() -> Embedder:
+    from langchain_openai import OpenAIEmbeddings
+
+    embeddings = OpenAIEmbeddings(
+        model=settings.AI_CACHE_EMBEDDING_MODEL, openai_api_key=settings.OPENAI_API_KEY
+    )
+    return embeddings.aembed_query
+
+
+class ResponseCache:
+    """Two-layer cache for assistant answers.
+
+    The exact layer matches normalized question text. The optional semantic
+    layer matches questions whose embedding is within a similarity threshold.
+    Questions that look like follow-ups to the conversation bypass both layers.
+    """
+
+    def __init__(self, embedder: Optional[Embedder] = None, semantic: Optional[bool] = None):
+        self.exact = ExactCache(settings.AI_CACHE_MAX_ENTRIES, settings.AI_CACHE_TTL_SECONDS)
+        self.semantic: Optional[SemanticIndex] = None
+        self.embedder = embedder
+        if settings.AI_CACHE_SEMANTIC if semantic is None else semantic:
+            try:
+                self.semantic = SemanticIndex(
+                    settings.AI_CACHE_MAX_ENTRIES,
+                    settings.AI_CACHE_TTL_SECONDS,
+                    settings.AI_CACHE_SIMILARITY_THRESHOLD,
+                )
+            except ImportError:
+                logger.warning("Semantic AI cache requires numpy; using the exact cache only.")
+                self.semantic = None
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.saved_seconds = 0.0
+
+    async def lookup(self, question: str, chat_history: str = "") -> CacheLookup:
+        key = normalize_question(question)
+        result = CacheLookup(key, bool(key) and not is_context_dependent(key, chat_history))
+        if not result.cacheable:
+            self.skipped += 1
+            return result
+
+        hit = self.exact.get(key)
+        if hit is not None:
+            self.exact_hits += 1
+        elif self.semantic is not None:
+            try:
+                if self.embedder is None:
+                    # Built on first use to keep langchain imports out of startup
+                    self.embedder = _openai_embedder()
+                result.embedding = await self.embedder(key)
+                hit = self.semantic.search(result.embedding)
+            except Exception as e:
+                logger.warning("Semantic cache lookup failed: %s", e)
+            if hit is not None:
+                self.semantic_hits += 1
+                # Promote to the exact layer so the next identical question skips embedding
+                self.exact.put(key, *hit)
+
+        if hit is None:
+            self.misses += 1
+        else:
+            result.response = hit[0]
+            self.saved_seconds += hit[1]
+        return result
+
+    def store(self, lookup: CacheLookup, response: str, latency: float):
+        if not lookup.cacheable or not response:
+            return
+        self.exact.put(lookup.key, response, latency)
+        if self.semantic is not None and lookup.embedding is not None:
+            self.semantic.add(lookup.embedding, response, latency)
+
+    async def get_or_generate(self, question: str, chat_history: str, generate: Generator) -> str:
+        lookup = await self.lookup(question, chat_history)
+        if lookup.response is not None:
+            return lookup.response
+        started = time.perf_counter()
+        response = await generate(question, chat_history)
+        self.store(lookup, response, time.perf_counter() - started)
+        return response
+
+    def stats(self) -> dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        hits = self.exact_hits + self.semantic_hits
+        return {
+            "exact_entries": len(self.exact),
+            "semantic_entries": len(self.semantic) if self.semantic is not None else 0,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "saved_seconds": self.saved_seconds,
+        }
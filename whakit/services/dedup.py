@@ -0,0 +1,122 @@
+# whakit/services/dedup.py
+
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+from whakit.config.settings import settings
+from whakit.state.store import StateStore, create_state_store
+
+logger = logging.getLogger(__name__)
+
+
+class DedupBackend(ABC):
+    @abstractmethod
+    async def add(self, key: str, ttl: float) -> bool:
+        """Record a key. Return True if it was new, False if seen within the TTL."""
+        pass
+
+    @abstractmethod
+    async def discard(self, key: str):
+        """Forget a key so a later delivery is processed again."""
+        pass
+
+    async def close(self):
+        pass
+
+
+class MemoryDedupBackend(DedupBackend):
+    """Process-local TTL set bounded by size, evicting the oldest keys first."""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.DEDUP_MAX_ENTRIES
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+
+    async def add(self, key: str, ttl: float) -> bool:
+        now = time.monotonic()
+        expires_at = self._entries.get(key)
+        if expires_at is not None and expires_at > now:
+            return False
+        self._entries[key] = now + ttl
+        self._entries.move_to_end(key)
+        self._evict(now)
+        return True
+
+    async def discard(self, key: str):
+        self._entries.pop(key, None)
+
+    def _evict(self, now: float):
+        # Keys are kept in insertion order, so expired and excess keys sit at the front
+        entries = self._entries
+        while entries:
+            key, expires_at = next(iter(entries.items()))
+            if expires_at > now and len(entries) <= self.max_entries:
+                break
+            entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class StoreDedupBackend(DedupBackend):
+    """Keeps seen ids in a StateStore so several worker processes share them."""
+
+    def __init__(self, store: StateStore, prefix: str = "dedup:"):
+        self.store = store
+        self.prefix = prefix
+
+    async def add(self, key: str, ttl: float) -> bool:
+        return await self.store.add(self.prefix + key, 1, ttl)
+
+    async def discard(self, key: str):
+        await self.store.delete(self.prefix + key)
+
+    async def close(self):
+        await self.store.close()
+
+
+def create_dedup_backend() -> DedupBackend:
+    backend = settings.DEDUP_BACKEND
+    if backend == "memory":
+        return MemoryDedupBackend()
+    if backend == "store":
+        return StoreDedupBackend(create_state_store())
+    raise ValueError(f"Unsupported dedup backend: {backend}")
+
+
+class MessageDeduplicator:
+    """Drops webhook redeliveries by WhatsApp message id before any handler work runs."""
+
+    def __init__(self, backend: Optional[DedupBackend] = None, ttl: Optional[float] = None):
+        self.backend = backend if backend is not None else create_dedup_backend()
+        self.ttl = ttl or settings.DEDUP_TTL_SECONDS
+        self.hits = 0
+        self.misses = 0
+
+    async def is_duplicate(self, message_id: Optional[str]) -> bool:
+        if not message_id:
+            return False
+        if await self.backend.add(message_id, self.ttl):
+            self.misses += 1
+            return False
+        self.hits += 1
+        logger.info("Dropping duplicate delivery of message %s.", message_id)
+        return True
+
+    async def forget(self, message_id: Optional[str]):
+        if message_id:
+            await self.backend.discard(message_id)
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,60 @@
+# whakit/services/dispatcher.py
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class KeyedDispatcher:
+    """Runs items with the same key one at a time, in arrival order.
+
+    Different keys run concurrently. While a key is busy, new items for it
+    are parked in a per-key deque and drained by the task already working on
+    that key, so callers never block on each other. The deque is dropped as
+    soon as the key goes idle, which keeps memory proportional to the number
+    of *active* keys rather than every key ever seen.
+    """
+
+    def __init__(self, handler: Callable[[Any], Awaitable[Any]]):
+        self._handler = handler
+        self._pending: Dict[Hashable, Deque[Any]] = {}
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.backlog = 0
+
+    @property
+    def active_keys(self) -> int:
+        return len(self._pending)
+
+    async def dispatch(self, key: Hashable, item: Any):
+        pending = self._pending.get(key)
+        if pending is not None:
+            # Another task owns this key and will pick the item up in order
+            pending.append(item)
+            self.backlog += 1
+            return
+
+        pending = self._pending[key] = deque()
+        self._idle.clear()
+        try:
+            while True:
+                try:
+                    await self._handler(item)
+                except Exception:
+                    logger.exception("Error handling item for key %s.", key)
+                if not pending:
+                    break
+                item = pending.popleft()
+                self.backlog -= 1
+        finally:
+            self.backlog -= len(pending)
+            del self._pending[key]
+            if not self._pending:
+                self._idle.set()
+
+    async def join(self):
+        """Wait until every key has been drained."""
+        await self._idle.wait()
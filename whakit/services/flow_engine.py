@@ -0,0 +1,251 @@
+# whakit/services/flow_engine.py
+
+import json
+import logging
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Mapping, Optional, Tuple, Union
+
+from whakit.config.settings import settings
+from whakit.services.intents import IntentMatcher
+from whakit.services.metrics import FLOW_STEPS
+
+logger = logging.getLogger(__name__)
+
+# Conversation flows shipped with the package
+BUNDLED_FLOWS_PATH = Path(__file__).resolve().parent.parent / "flows" / "default.json"
+
+# Key of the active flow session in a user's state document
+SESSION_KEY = "flow"
+
+# A reply is either plain text or a ready-made message payload
+Reply = Union[str, dict]
+Action = Callable[[str, str, "FlowSession", dict], Awaitable[Optional[List[Reply]]]]
+
+
+def load_flow_definition(path: Optional[str] = None) -> dict:
+    path = Path(path or settings.FLOWS_PATH or BUNDLED_FLOWS_PATH)
+    text = path.read_text(encoding="utf-8")
+    if path.suffix in (".yaml", ".yml"):
+        import yaml
+
+        return yaml.safe_load(text)
+    return json.loads(text)
+
+
+class FlowSession:
+    """Where one user is in a flow, plus the answers collected so far."""
+
+    __slots__ = ("flow", "step", "data")
+
+    def __init__(self, flow: str, step: str, data: Optional[Dict[str, Any]] = None):
+        self.flow = flow
+        self.step = step
+        self.data = data if data is not None else {}
+
+    def to_dict(self) -> dict:
+        return {"flow": self.flow, "step": self.step, "data": self.data}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FlowSession":
+        return cls(data["flow"], data["step"], data.get("data"))
+
+
+class Transition:
+    __slots__ = ("action", "flow", "next", "end", "reply")
+
+    def __init__(self, action=None, flow=None, next=None, end=False, reply=None):
+        self.action = action
+        self.flow = flow
+        self.next = next
+        self.end = end
+        self.reply = reply
+
+
+class Step:
+    __slots__ = ("name", "prompt", "save", "routes", "intents", "scope", "otherwise")
+
+    def __init__(self, name: str, prompt: Optional[str], save: Optional[str]):
+        self.name = name
+        self.prompt = prompt
+        self.save = save
+        self.routes: Dict[str, Transition] = {}
+        self.intents: Dict[str, Transition] = {}
+        self.scope: FrozenSet[str] = frozenset()
+        self.otherwise = Transition()
+
+
+class Flow:
+    __slots__ = ("name", "start", "owns", "steps")
+
+    def __init__(self, name: str, start: str, owns: Tuple[str, ...]):
+        self.name = name
+        self.start = start
+        self.owns = owns
+        self.steps: Dict[str, Step] = {}
+
+
+class FlowEngine:
+    """Runs conversation flows defined as data.
+
+    The definition is compiled once into dicts of slotted objects, so every
+    message costs a few dict lookups: flow by name, step by name, then the
+    transition for the normalized reply (or the step's `otherwise`).
+
+    Each step may `prompt` when entered, `save` the reply under a field,
+    route replies with `on` ([{"match": [...], ...}] for literal replies or
+    [{"intent": "yes", ...}] for the intent matcher) and otherwise follow
+    its own `next` / `end` / `reply` / `action`. A transition's `reply`
+    replaces the prompt of the step it leads to. `menu` maps menu options to
+    transitions that start a `flow` or run an `action`; free text is matched
+    against the options as intents.
+    """
+
+    def __init__(
+        self,
+        definition: dict,
+        actions: Mapping[str, Action],
+        intents: Optional[IntentMatcher] = None,
+    ):
+        self.actions = dict(actions)
+        self.intents = intents if intents is not None else IntentMatcher.from_definition(definition)
+        self.error_reply = definition.get("error_reply", "An error occurred. Let's start over.")
+        self.flows: Dict[str, Flow] = {}
+        flow_specs = definition.get("flows") or {}
+        for name, spec in flow_specs.items():
+            self.flows[name] = Flow(name, spec["start"], tuple(spec.get("owns") or ()))
+        for name, spec in flow_specs.items():
+            self._compile_flow(self.flows[name], spec)
+
+        menu = dict(definition.get("menu") or {})
+        otherwise = menu.pop("otherwise", None)
+        self.menu = {option: self._transition(spec, None, f"menu.{option}") for option, spec in menu.items()}
+        self.menu_otherwise = self._transition(otherwise or {}, None, "menu.otherwise")
+        self.menu_scope = frozenset(self.menu)
+
+    @classmethod
+    def from_file(cls, actions: Mapping[str, Action], path: Optional[str] = None) -> "FlowEngine":
+        return cls(load_flow_definition(path), actions)
+
+    def _compile_flow(self, flow: Flow, spec: dict):
+        for step_name, step_spec in spec["steps"].items():
+            flow.steps[step_name] = Step(step_name, step_spec.get("prompt"), step_spec.get("save"))
+        if flow.start not in flow.steps:
+            raise ValueError(f"Flow {flow.name!r} starts at unknown step {flow.start!r}")
+        for step_name, step_spec in spec["steps"].items():
+            step = flow.steps[step_name]
+            where = f"{flow.name}.{step_name}"
+            for route in step_spec.get("on") or ():
+                transition = self._transition(route, flow, where)
+                for word in route.get("match") or ():
+                    step.routes[word.lower().strip()] = transition
+                if route.get("intent"):
+                    step.intents[route["intent"]] = transition
+            step.scope = frozenset(step.intents)
+            step.otherwise = self._transition(step_spec.get("otherwise", step_spec), flow, where)
+
+    def _transition(self, spec: dict, flow: Optional[Flow], where: str) -> Transition:
+        transition = Transition(
+            action=spec.get("action"),
+            flow=spec.get("flow"),
+            next=spec.get("next"),
+            end=bool(spec.get("end")),
+            reply=spec.get("reply"),
+        )
+        if transition.action is not None and transition.action not in self.actions:
+            raise ValueError(f"{where}: unknown action {transition.action!r}")
+        if transition.flow is not None and transition.flow not in self.flows:
+            raise ValueError(f"{where}: unknown flow {transition.flow!r}")
+        if transition.next is not None and (flow is None or transition.next not in flow.steps):
+            raise ValueError(f"{where}: unknown step {transition.next!r}")
+        return transition
+
+    def session(self, state: dict) -> Optional[FlowSession]:
+        """The user's active session, if any."""
+        data = state.get(SESSION_KEY)
+        if data is not None:
+            return FlowSession.from_dict(data)
+        # Documents written before flows were data kept one key per flow
+        for name in self.flows:
+            legacy = state.get(name)
+            if isinstance(legacy, dict) and "step" in legacy:
+                legacy = dict(state.pop(name))
+                return FlowSession(name, legacy.pop("step"), legacy)
+        return None
+
+    @staticmethod
+    def _save(session: Optional[FlowSession], state: dict):
+        if session is None:
+            state.pop(SESSION_KEY, None)
+        else:
+            state[SESSION_KEY] = session.to_dict()
+
+    def _end(self, flow: Flow, state: dict):
+        for key in flow.owns:
+            state.pop(key, None)
+
+    async def select(self, to: str, option: str, state: dict) -> List[Reply]:
+        """Handle a menu option, which may start a flow."""
+        transition = self.menu.get(option)
+        if transition is None:
+            transition = self.menu.get(self.intents.match(option, self.menu_scope), self.menu_otherwise)
+        return await self._apply(to, option, transition, self.session(state), None, state)
+
+    async def handle(self, to: str, text: str, state: dict) -> Optional[List[Reply]]:
+        """Feed a reply to the active flow. Returns None when no flow is active."""
+        session = self.session(state)
+        if session is None:
+            return None
+        flow = self.flows.get(session.flow)
+        step = flow.steps.get(session.step) if flow is not None else None
+        if step is None:
+            logger.warning("Unknown flow step %s.%s; resetting session", session.flow, session.step)
+            if flow is not None:
+                self._end(flow, state)
+            self._save(None, state)
+            return [self.error_reply]
+        FLOW_STEPS.labels(flow.name, step.name).inc()
+        if step.save:
+            session.data[step.save] = text
+        transition = step.routes.get(text.lower().strip()) if step.routes else None
+        if transition is None and step.scope:
+            transition = step.intents.get(self.intents.match(text, step.scope))
+        if transition is None:
+            transition = step.otherwise
+        return await self._apply(to, text, transition, session, flow, state)
+
+    async def _apply(
+        self,
+        to: str,
+        text: str,
+        transition: Transition,
+        session: Optional[FlowSession],
+        flow: Optional[Flow],
+        state: dict,
+    ) -> List[Reply]:
+        replies: List[Reply] = []
+        if transition.action is not None:
+            replies.extend(await self.actions[transition.action](to, text, session, state) or ())
+
+        entered = None
+        moved = False
+        if transition.flow is not None:
+            flow = self.flows[transition.flow]
+            session = FlowSession(flow.name, flow.start)
+            entered, moved = flow.steps[flow.start], True
+        elif transition.end:
+            if flow is not None:
+                self._end(flow, state)
+            session = None
+        elif transition.next is not None:
+            session.step = transition.next
+            entered, moved = flow.steps[transition.next], True
+        elif flow is not None:
+            entered = flow.steps[session.step]
+
+        if transition.reply is not None:
+            replies.append(transition.reply)
+        elif entered is not None and entered.prompt and (moved or not replies):
+            # Prompt for the step just entered, or ask the current one again
+            replies.append(entered.prompt)
+        self._save(session, state)
+        return replies
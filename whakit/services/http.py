@@ -1,24 +1,72 @@
 # whakit/services/http_client.py
 
 import logging
+from typing import Optional
 
 import httpx
 
+from whakit.config.settings import settings
+
 logger = logging.getLogger(__name__)
 
+# Process-wide client shared by every outbound service. It is created in the
+# app lifespan (or lazily on first use) and keeps connections alive between
+# sends so we do not pay a TCP/TLS handshake per message.
+_client: Optional[httpx.AsyncClient] = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    http2 = settings.HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP/2 requested but the h2 package is not installed; using HTTP/1.1.")
+            http2 = False
+
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
 
 class HttpClient:
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        self._client = client
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_http_client()
+
     async def post(self, url: str, data: dict, headers: dict):
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=data, headers=headers)
-                response.raise_for_status()
-                return response.json()
+            response = await self.client.post(url, json=data, headers=headers)
+            response.raise_for_status()
+            return response.json()
         except httpx.HTTPStatusError as exc:
             logger.error(
-                f"HTTP error: {exc.response.status_code} - {exc.response.text}"
+                "HTTP error: %s - %s", exc.response.status_code, exc.response.text
             )
             raise
         except Exception as e:
-            logger.error(f"Unexpected error: {e}")
+            logger.error("Unexpected error: %s", e)
             raise
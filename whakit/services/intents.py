@@ -0,0 +1,164 @@
+# whakit/services/intents.py
+
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Collection, Dict, FrozenSet, Iterable, List, Optional, Pattern, Tuple
+
+from whakit.config.settings import settings
+from whakit.services.cache import normalize_question
+
+# Longer messages are treated as open-ended rather than guessed at
+CLASSIFIER_MAX_WORDS = 4
+
+# A reply with one of these words is only ever matched to NEGATIVE_INTENTS:
+# "not sure" or "i dont need an appointment" must not read as yes or option_1
+# The "t" of a contraction like "don't" is left as a word of its own by normalize
+NEGATIONS = frozenset({"no", "not", "never", "nothing", "dont", "didnt", "isnt", "cant", "wont", "t"})
+NEGATIVE_INTENTS = frozenset({"no"})
+
+
+@lru_cache(maxsize=4096)
+def normalize(text: str) -> str:
+    """Lowercase, strip accents, punctuation and emoji: "Hola 👋!" -> "hola"."""
+    return normalize_question(text)
+
+
+def _trigrams(text: str) -> FrozenSet[str]:
+    padded = f" {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TrigramClassifier:
+    """Nearest known phrase by character-trigram Jaccard similarity.
+
+    A lightweight local fallback for typos and elongations ("helo",
+    "yess") that the exact and pattern layers miss. Only phrases with the
+    same number of words are compared, so extra content ("hello kitty")
+    is never matched.
+    """
+
+    def __init__(self, phrases: Dict[str, Iterable[str]], threshold: float):
+        self.threshold = threshold
+        self._examples: List[Tuple[str, int, int]] = []
+        self._index: Dict[str, List[int]] = defaultdict(list)
+        for intent, texts in phrases.items():
+            for text in texts:
+                grams = _trigrams(text)
+                example_id = len(self._examples)
+                self._examples.append((intent, len(grams), text.count(" ")))
+                for gram in grams:
+                    self._index[gram].append(example_id)
+
+    def classify(self, text: str, allowed: Optional[Collection[str]] = None) -> Optional[str]:
+        grams = _trigrams(text)
+        words = text.count(" ")
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._index.get(gram, ()))
+        best, best_score = None, self.threshold
+        for example_id, count in shared.items():
+            intent, size, example_words = self._examples[example_id]
+            if example_words != words or (allowed is not None and intent not in allowed):
+                continue
+            score = count / (len(grams) + size - count)
+            if score >= best_score:
+                best, best_score = intent, score
+        return best
+
+
+class IntentMatcher:
+    """Maps short replies to intents, cheapest check first.
+
+    1. Normalized phrase lookup (one dict access).
+    2. Compiled regular expressions, one alternation per set of allowed
+       intents. A pattern must match the whole reply.
+    3. Optionally, a trigram classifier for short messages.
+
+    Replies containing a negation skip the classifier and only match
+    NEGATIVE_INTENTS through the pattern layer.
+
+    Anything that falls through all three is left to the caller, e.g. the AI
+    assistant. `allowed` restricts matching to the intents that make sense
+    at that point of the conversation.
+    """
+
+    def __init__(
+        self,
+        phrases: Dict[str, Iterable[str]],
+        patterns: Optional[Dict[str, Iterable[str]]] = None,
+        classifier: Optional[TrigramClassifier] = None,
+    ):
+        self.phrases: Dict[str, str] = {}
+        normalized: Dict[str, List[str]] = {}
+        for intent, texts in phrases.items():
+            for text in texts:
+                key = normalize(text)
+                if key:
+                    self.phrases.setdefault(key, intent)
+                    normalized.setdefault(intent, []).append(key)
+        self.patterns: Dict[str, List[str]] = {intent: list(sources) for intent, sources in (patterns or {}).items()}
+        for intent, sources in self.patterns.items():
+            for source in sources:
+                re.compile(source)  # fail on bad patterns at startup, not per message
+        self._regexes: Dict[Optional[FrozenSet[str]], Tuple[Optional[Pattern], List[str]]] = {}
+        self.classifier = classifier
+        if classifier is None and settings.INTENT_CLASSIFIER:
+            self.classifier = TrigramClassifier(normalized, settings.INTENT_CLASSIFIER_THRESHOLD)
+        self.hits = Counter()
+
+    @classmethod
+    def from_definition(cls, definition: dict) -> "IntentMatcher":
+        """Build the matcher from a flow definition's `intents` and `patterns`."""
+        phrases = {intent: list(texts) for intent, texts in (definition.get("intents") or {}).items()}
+        phrases.setdefault("greeting", []).extend(settings.GREETINGS)
+        # Typing a menu button's title selects it too
+        for button in settings.MENU_BUTTONS:
+            reply = button.get("reply") or {}
+            if reply.get("id") and reply.get("title"):
+                phrases.setdefault(reply["id"], []).append(reply["title"])
+        return cls(phrases, definition.get("patterns"))
+
+    def _regex(self, allowed: Optional[FrozenSet[str]]) -> Tuple[Optional[Pattern], List[str]]:
+        compiled = self._regexes.get(allowed)
+        if compiled is None:
+            groups, intents = [], []
+            for intent, sources in self.patterns.items():
+                if allowed is None or intent in allowed:
+                    for source in sources:
+                        groups.append(f"(?P<i{len(intents)}>{source})")
+                        intents.append(intent)
+            pattern = re.compile("|".join(groups)) if groups else None
+            compiled = self._regexes[allowed] = (pattern, intents)
+        return compiled
+
+    def match(self, text: str, allowed: Optional[FrozenSet[str]] = None) -> Optional[str]:
+        key = normalize(text)
+        if not key:
+            return None
+        intent = self.phrases.get(key)
+        if intent is not None and (allowed is None or intent in allowed):
+            self.hits["phrase"] += 1
+            return intent
+
+        negated = not NEGATIONS.isdisjoint(key.split())
+        if negated:
+            allowed = NEGATIVE_INTENTS if allowed is None else allowed & NEGATIVE_INTENTS
+        pattern, intents = self._regex(allowed)
+        if pattern is not None:
+            found = pattern.fullmatch(key)
+            if found is not None:
+                self.hits["pattern"] += 1
+                return intents[int(found.lastgroup[1:])]
+
+        if self.classifier is not None and not negated and key.count(" ") < CLASSIFIER_MAX_WORDS:
+            intent = self.classifier.classify(key, allowed)
+            if intent is not None:
+                self.hits["classifier"] += 1
+                return intent
+
+        self.hits["unmatched"] += 1
+        return None
+
+    def stats(self) -> dict:
+        return dict(self.hits)
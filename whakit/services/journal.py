@@ -0,0 +1,217 @@
+# whakit/services/journal.py
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from whakit.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PENDING = 0
+FAILED = 1
+
+# Failed rows are pruned on open and after every this many failures
+PRUNE_INTERVAL = 1000
+
+
+class OutboxJournal:
+    """Write-ahead journal of outbound sends on a SQLite file.
+
+    A send is appended before it goes out and removed once it is delivered;
+    sends that fail for good are kept and marked failed rather than dropped,
+    up to OUTBOX_FAILED_MAX_ROWS and OUTBOX_FAILED_RETENTION_SECONDS.
+    Anything still pending when the process stops is replayed by
+    `Outbox.recover` on the next start, so delivery is at-least-once.
+
+    Writes are group committed: everything appended or acknowledged while a
+    commit is on disk goes into the next transaction, so one fsync covers
+    many sends under load.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # One thread owns the connection and serializes all writes
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whakit-outbox")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._next_id: Optional[int] = None
+        self._appends: List[Tuple[int, Optional[str], str, asyncio.Future]] = []
+        self._done: List[int] = []
+        self._failed: List[int] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        # Concurrent first appends must not each read MAX(id) and reuse ids
+        self._open_lock = asyncio.Lock()
+        self._failures_since_prune = 0
+        self.commits = 0
+        self.records = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Every commit reaches the disk before the send is attempted
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                " id INTEGER PRIMARY KEY,"
+                " key TEXT,"
+                " payload TEXT NOT NULL,"
+                " status INTEGER NOT NULL DEFAULT 0,"
+                " created_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _open(self) -> Tuple[int, List[Tuple[int, Optional[str], dict]]]:
+        conn = self._connect()
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM outbox").fetchone()[0]
+        self._prune(conn)
+        rows = conn.execute(
+            "SELECT id, key, payload FROM outbox WHERE status = ? ORDER BY id", (PENDING,)
+        ).fetchall()
+        return last_id, [(row_id, key, json.loads(payload)) for row_id, key, payload in rows]
+
+    def _prune(self, conn: sqlite3.Connection):
+        """Drop failed sends past their retention age, then the oldest beyond the row cap."""
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute(
+                "DELETE FROM outbox WHERE status = ? AND created_at < ?",
+                (FAILED, time.time() - settings.OUTBOX_FAILED_RETENTION_SECONDS),
+            )
+            conn.execute(
+                "DELETE FROM outbox WHERE status = ? AND id <= ("
+                " SELECT id FROM outbox WHERE status = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (FAILED, FAILED, settings.OUTBOX_FAILED_MAX_ROWS),
+            )
+        self._failures_since_prune = 0
+
+    async def open(self) -> List[Tuple[int, Optional[str], dict]]:
+        """Open the journal and return the sends left pending, oldest first."""
+        async with self._open_lock:
+            last_id, pending = await self._run(self._open)
+            # Never hand out an id again if appends started before this call
+            self._next_id = max(self._next_id or 0, last_id + 1)
+        return pending
+
+    def _write(self, appends: list, done: List[int], failed: List[int]):
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN")
+            if appends:
+                conn.executemany(
+                    "INSERT INTO outbox (id, key, payload, created_at) VALUES (?, ?, ?, ?)",
+                    [(row_id, key, payload, now) for row_id, key, payload, _ in appends],
+                )
+            if done:
+                conn.executemany("DELETE FROM outbox WHERE id = ?", [(row_id,) for row_id in done])
+            if failed:
+                conn.executemany(
+                    "UPDATE outbox SET status = ? WHERE id = ?", [(FAILED, row_id) for row_id in failed]
+                )
+        self._failures_since_prune += len(failed)
+        if self._failures_since_prune >= PRUNE_INTERVAL:
+            self._prune(conn)
+
+    async def _flush(self):
+        while self._appends or self._done or self._failed:
+            appends, self._appends = self._appends, []
+            done, self._done = self._done, []
+            failed, self._failed = self._failed, []
+            acks_lost = False
+            try:
+                await self._run(self._write, appends, done, failed)
+                self.commits += 1
+                self.records += len(appends) + len(done) + len(failed)
+                error = None
+            except Exception as e:
+                logger.error("Error writing outbox journal: %s", e)
+                error = e
+                if done or failed:
+                    # The rollback also undid the acks; a lost ack resends a delivered message
+                    try:
+                        await self._run(self._write, [], done, failed)
+                        self.commits += 1
+                        self.records += len(done) + len(failed)
+                    except Exception as ack_error:
+                        logger.error("Error writing outbox acknowledgements: %s", ack_error)
+                        self._done[:0] = done
+                        self._failed[:0] = failed
+                        acks_lost = True
+            for _, _, _, future in appends:
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(error)
+            if acks_lost:
+                # Retried with the next append or ack rather than in a tight loop
+                break
+        self._flush_task = None
+
+    def _schedule(self):
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush())
+
+    async def append(self, key: Optional[str], data: dict) -> int:
+        """Record a send and return its id once it is on disk."""
+        if self._next_id is None:
+            await self.open()
+        row_id = self._next_id
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._appends.append((row_id, key, json.dumps(data), future))
+        self._schedule()
+        await future
+        return row_id
+
+    def ack(self, row_id: int, delivered: bool):
+        """Mark a send as delivered or failed.
+
+        Not awaited: an acknowledgement lost in a crash only means the send
+        is replayed once more.
+        """
+        (self._done if delivered else self._failed).append(row_id)
+        self._schedule()
+
+    def _counts(self) -> Tuple[int, int]:
+        conn = self._connect()
+        rows = dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+        return rows.get(PENDING, 0), rows.get(FAILED, 0)
+
+    async def counts(self) -> Tuple[int, int]:
+        """Number of pending and failed sends on disk."""
+        return await self._run(self._counts)
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def close(self):
+        """Commit outstanding writes and close the file."""
+        while self._flush_task is not None:
+            await self._flush_task
+        await self._run(self._close)
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {
+            "commits": self.commits,
+            "records": self.records,
+            "records_per_commit": self.records / self.commits if self.commits else 0.0,
+        }
@@ -0,0 +1,279 @@
+# whakit/services/media.py
+
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Optional, Tuple, Union
+
+import httpx
+
+from whakit.config.settings import settings
+from whakit.services.http import get_http_client
+
+logger = logging.getLogger(__name__)
+
+_UNSAFE = re.compile(r"[^\w-]")
+
+
+class MediaIdCache:
+    """LRU of content hash -> uploaded media id, with a TTL per entry.
+
+    Meta deletes uploaded media after 30 days, so ids expire a little sooner.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        media_id, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return media_id
+
+    def put(self, key: str, media_id: str):
+        self._entries[key] = (media_id, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _hash_file(path: str, chunk_size: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MediaService:
+    """Inbound media downloads and outbound uploads through the Graph API.
+
+    Downloads are streamed to a file cache in MEDIA_CHUNK_SIZE chunks, never
+    held whole in memory, and checked against the sha256 Meta reports. The
+    cache is bounded by MEDIA_CACHE_MAX_BYTES and evicts the least recently
+    used files. Uploads are keyed by the sha256 of their content, so each
+    asset is uploaded once and later sends reuse its media id.
+    """
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, cache_dir: Optional[str] = None):
+        self._client = client
+        self.graph_url = f"{settings.BASE_URL}/{settings.API_VERSION}"
+        self.headers = {"Authorization": f"Bearer {settings.API_TOKEN}"}
+        self.cache_dir = cache_dir or settings.MEDIA_CACHE_DIR
+        self.chunk_size = settings.MEDIA_CHUNK_SIZE
+        self.max_bytes = settings.MEDIA_CACHE_MAX_BYTES
+        # Cached files by media id, least recently used first
+        self._files: Optional["OrderedDict[str, Tuple[str, int]]"] = None
+        self._cached_bytes = 0
+        self.ids = MediaIdCache(settings.MEDIA_ID_CACHE_SIZE, settings.MEDIA_ID_TTL_SECONDS)
+        # Uploads in progress by content hash, shared by concurrent senders
+        self._uploads: Dict[str, asyncio.Future] = {}
+
+        # Counters exposed through stats()
+        self.downloads = 0
+        self.downloaded_bytes = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.uploads = 0
+        self.upload_hits = 0
+        self.upload_failures = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_http_client()
+
+    def _scan(self) -> "OrderedDict[str, Tuple[str, int]]":
+        # Seed the index from files left by earlier runs, oldest first
+        os.makedirs(self.cache_dir, exist_ok=True)
+        files = []
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.endswith(".part"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, entry.name.split(".", 1)[0], entry.path, stat.st_size))
+        index = OrderedDict()
+        for _, key, path, size in sorted(files):
+            index[key] = (path, size)
+        return index
+
+    async def _index(self) -> "OrderedDict[str, Tuple[str, int]]":
+        if self._files is None:
+            files = await asyncio.to_thread(self._scan)
+            if self._files is None:
+                self._files = files
+                self._cached_bytes = sum(size for _, size in files.values())
+        return self._files
+
+    def _evict(self, files: "OrderedDict[str, Tuple[str, int]]"):
+        while self._cached_bytes > self.max_bytes and len(files) > 1:
+            _, (path, size) = files.popitem(last=False)
+            self._cached_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    async def media_info(self, media_id: str) -> dict:
+        """Download URL, mime type, size and sha256 of an uploaded or received media id."""
+        response = await self.client.get(f"{self.graph_url}/{media_id}", headers=self.headers)
+        response.raise_for_status()
+        return response.json()
+
+    async def iter_media(self, media_id: str) -> AsyncIterator[bytes]:
+        """Yield the bytes of a media id in chunks, from the cache or the Graph API.
+
+        A download is written to the cache as it is consumed. It is kept only
+        if it completes, and raises ValueError at the end if its sha256 does
+        not match.
+        """
+        files = await self._index()
+        cached = files.get(media_id)
+        if cached is not None:
+            try:
+                file = await asyncio.to_thread(open, cached[0], "rb")
+            except FileNotFoundError:
+                # Evicted by another process sharing the directory
+                self._cached_bytes -= files.pop(media_id)[1]
+            else:
+                files.move_to_end(media_id)
+                self.disk_hits += 1
+                try:
+                    while chunk := await asyncio.to_thread(file.read, self.chunk_size):
+                        yield chunk
+                finally:
+                    file.close()
+                return
+
+        info = await self.media_info(media_id)
+        mime_type = (info.get("mime_type") or "").split(";")[0].strip()
+        extension = mimetypes.guess_extension(mime_type) or ""
+        path = os.path.join(self.cache_dir, _UNSAFE.sub("_", media_id) + extension)
+        # Unique per download, so concurrent reads of one id do not share a file
+        partial = f"{path}.{uuid.uuid4().hex}.part"
+        digest = hashlib.sha256()
+        size = 0
+        complete = False
+        file = await asyncio.to_thread(open, partial, "wb")
+        try:
+            async with self.client.stream("GET", info["url"], headers=self.headers) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(self.chunk_size):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    await asyncio.to_thread(file.write, chunk)
+                    yield chunk
+            expected = info.get("sha256")
+            if expected and digest.hexdigest() != expected:
+                raise ValueError(f"Media {media_id} does not match its sha256")
+            complete = True
+        finally:
+            file.close()
+            if complete:
+                os.replace(partial, path)
+                previous = files.pop(media_id, None)
+                if previous is not None:
+                    self._cached_bytes -= previous[1]
+                files[media_id] = (path, size)
+                self._cached_bytes += size
+                self.downloads += 1
+                self.downloaded_bytes += size
+                self._evict(files)
+            else:
+                try:
+                    os.remove(partial)
+                except FileNotFoundError:
+                    pass
+
+    async def download(self, media_id: str) -> str:
+        """Make sure a media id is in the cache and return its file path."""
+        async for _ in self.iter_media(media_id):
+            pass
+        files = await self._index()
+        return files[media_id][0]
+
+    async def upload(self, source: Union[str, bytes], mime_type: str, filename: Optional[str] = None) -> Optional[str]:
+        """Upload a file path or bytes once and return its media id, or None on failure."""
+        if isinstance(source, bytes):
+            key = hashlib.sha256(source).hexdigest()
+        else:
+            key = await asyncio.to_thread(_hash_file, source, self.chunk_size)
+        key = f"{key}:{mime_type}"
+        media_id = self.ids.get(key)
+        if media_id is not None:
+            self.upload_hits += 1
+            return media_id
+        pending = self._uploads.get(key)
+        if pending is not None:
+            self.upload_hits += 1
+            return await asyncio.shield(pending)
+
+        future = self._uploads[key] = asyncio.get_running_loop().create_future()
+        try:
+            media_id = await self._upload(source, mime_type, filename)
+            if media_id is not None:
+                self.ids.put(key, media_id)
+            future.set_result(media_id)
+            return media_id
+        except BaseException:
+            future.set_result(None)
+            raise
+        finally:
+            del self._uploads[key]
+
+    async def _upload(self, source: Union[str, bytes], mime_type: str, filename: Optional[str]) -> Optional[str]:
+        if filename is None:
+            filename = "upload" if isinstance(source, bytes) else os.path.basename(source)
+        data = {"messaging_product": "whatsapp", "type": mime_type}
+        file = source if isinstance(source, bytes) else await asyncio.to_thread(open, source, "rb")
+        try:
+            # A file object is streamed by httpx in chunks rather than read whole
+            response = await self.client.post(
+                f"{self.graph_url}/{settings.BUSINESS_PHONE}/media",
+                headers=self.headers,
+                data=data,
+                files={"file": (filename, file, mime_type)},
+            )
+            response.raise_for_status()
+            self.uploads += 1
+            return response.json().get("id")
+        except httpx.HTTPStatusError as exc:
+            self.upload_failures += 1
+            logger.error("Error uploading media: %s - %s", exc.response.status_code, exc.response.text)
+        except httpx.TransportError as e:
+            self.upload_failures += 1
+            logger.error("Error uploading media: %s", e)
+        finally:
+            if not isinstance(file, bytes):
+                file.close()
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "downloads": self.downloads,
+            "downloaded_bytes": self.downloaded_bytes,
+            "disk_hits": self.disk_hits,
+            "cached_files": len(self._files or ()),
+            "cached_bytes": self._cached_bytes,
+            "evictions": self.evictions,
+            "uploads": self.uploads,
+            "upload_hits": self.upload_hits,
+            "upload_failures": self.upload_failures,
+            "cached_ids": len(self.ids),
+        }
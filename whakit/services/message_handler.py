@@ -1,20 +1,27 @@
 # whakit/services/message_handler.py
 
+import asyncio
 import logging
 from abc import ABC, abstractmethod
 from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
 
 from whakit.config.settings import settings
+from whakit.models.message import Message
 from whakit.services.ai import AIService
-
-# from whakit.services.storage import StorageService
+from whakit.services.flow_engine import Action, FlowEngine, FlowSession, Reply
+from whakit.services.storage import StorageService, create_appointment_sink
+from whakit.services.streaming import chunk_stream
 from whakit.services.whatsapp import WhatsAppService
+from whakit.state.history import ChatHistoryCache
 from whakit.state.manager import StateManager
 
 
 class BaseMessageHandler(ABC):
     @abstractmethod
-    async def handle_incoming_message(self, message: dict, sender_info: dict):
+    async def handle_incoming_message(self, message: Message, sender_info: dict):
         """Process an incoming message."""
         pass
 
@@ -33,7 +40,27 @@ class BaseMessageHandler(ABC):
         """Send the main menu to the user."""
         pass
 
-    async def pre_process_message(self, message: dict):
+    def stats(self) -> dict:
+        """Handler-specific counters reported on the stats endpoint."""
+        return {}
+
+    async def handle_status(self, status: dict):
+        """Process a sent/delivered/read status callback for an outbound message."""
+        pass
+
+    async def handle_media(self, message: Message, media: AsyncIterator[bytes]):
+        """Process an image, audio, video, document or sticker; `media` yields the file in chunks."""
+        pass
+
+    async def startup(self):
+        """Hook called when the application starts."""
+        pass
+
+    async def shutdown(self):
+        """Hook called when the application stops, after queued messages are drained."""
+        pass
+
+    async def pre_process_message(self, message: Message):
         """Hook called before processing a message."""
         pass
 
@@ -44,99 +71,156 @@ class BaseMessageHandler(ABC):
 
 logger = logging.getLogger(__name__)
 
+GREETING = frozenset({"greeting"})
+
 
 class DefaultMessageHandler(BaseMessageHandler):
-    def __init__(self):
-        self.whatsapp_service = WhatsAppService()
-        self.ai_service = AIService()
-        # self.storage_service = StorageService()
-        self.state_manager = StateManager()
-        self.appointment_state = {}
-        self.assistant_state = {}
-
-    async def handle_incoming_message(self, message: dict, sender_info: dict):
+    def __init__(
+        self,
+        whatsapp_service: Optional[WhatsAppService] = None,
+        ai_service: Optional[AIService] = None,
+        state_manager: Optional[StateManager] = None,
+        storage_service: Optional[StorageService] = None,
+    ):
+        # Services can be injected, e.g. fakes for tests and load runs
+        self.whatsapp_service = whatsapp_service or WhatsAppService()
+        self.ai_service = ai_service or AIService()
+        # Completed appointments are buffered and written in batches
+        self.storage_service = storage_service or StorageService(create_appointment_sink())
+        # All per-conversation state (flow steps and chat history) lives in
+        # one document per user in the configured state store
+        self.state_manager = state_manager or StateManager()
+        # Histories stay in memory between turns so the prompt text is
+        # extended rather than rebuilt from the state document each time
+        self.chat_histories = ChatHistoryCache()
+        # Menu options and multi-step conversations are defined as data
+        self.flows = FlowEngine.from_file(self.flow_actions())
+        self._warm_up_task: Optional[asyncio.Task] = None
+
+    async def startup(self):
+        await self.whatsapp_service.startup()
+        if settings.AI_WARM_ON_STARTUP:
+            # Build the agent in the background; requests do not wait for it
+            self._warm_up_task = asyncio.create_task(self.ai_service.warm_up())
+
+    async def shutdown(self):
+        if self._warm_up_task is not None and not self._warm_up_task.done():
+            self._warm_up_task.cancel()
+        await self.whatsapp_service.close()
+        await self.ai_service.close()
+        await self.state_manager.close()
+        # Write appointments still buffered
+        await self.storage_service.close()
+
+    async def handle_incoming_message(self, message: Message, sender_info: dict):
         await self.pre_process_message(message)
-        from_number = message.get("from")
-        message_type = message.get("type")
+        from_number = message.from_number
+        message_type = message.message_type
+        state = await self.state_manager.get_state(from_number)
+        had_state = bool(state)
 
         if message_type == "text":
-            incoming_message = message["text"]["body"].lower().strip()
-            print(f"Received message: {incoming_message}")
-
-            if self.is_greeting(incoming_message):
-                await self.send_welcome_message(from_number, sender_info)
-                await self.send_main_menu(from_number)
-            elif from_number in self.appointment_state:
-                await self.handle_appointment_flow(from_number, incoming_message)
-            elif from_number in self.assistant_state:
-                await self.handle_assistant_flow(from_number, incoming_message)
+            incoming_message = message.text.lower().strip()
+            logger.debug("Received text message from %s", from_number)
+            # Read receipts go out in the background, off the reply path
+            self.whatsapp_service.schedule_read_receipt(from_number, message.message_id)
+
+            # Inside a flow every reply belongs to the current step, e.g. a pet named "Hiya"
+            if self.flows.session(state) is None and self.is_greeting(incoming_message):
+                await self.whatsapp_service.send_many([
+                    self.welcome_message(from_number, sender_info),
+                    self.main_menu(from_number),
+                ])
             else:
-                await self.handle_menu_option(from_number, incoming_message)
-            await self.whatsapp_service.mark_as_read(message["id"])
+                await self.handle_flow_input(from_number, incoming_message, state)
         elif message_type == "interactive":
-            option = message["interactive"]["button_reply"]["id"]
-            await self.handle_menu_option(from_number, option)
-            await self.whatsapp_service.mark_as_read(message["id"])
+            self.whatsapp_service.schedule_read_receipt(from_number, message.message_id)
+            option = message.reply_id
+            await self.handle_menu_option(from_number, option, state)
+        elif message.media_id:
+            self.whatsapp_service.schedule_read_receipt(from_number, message.message_id)
+            await self.handle_media(message, self.whatsapp_service.media.iter_media(message.media_id))
         else:
-            logger.info(f"Unhandled message type: {message_type}")
+            logger.info("Unhandled message type: %s", message_type)
+        if state or had_state:
+            await self.state_manager.set_state(from_number, state)
         await self.post_process_message({"status": "success"})
 
+    def stats(self) -> dict:
+        stats = {
+            "outbound": self.whatsapp_service.stats(),
+            "intents": self.flows.intents.stats(),
+            "appointments": self.storage_service.stats(),
+            "chat_histories": self.chat_histories.stats(),
+        }
+        if self.ai_service.cache is not None:
+            stats["ai_cache"] = self.ai_service.cache.stats()
+        return stats
+
+    async def handle_media(self, message: Message, media: AsyncIterator[bytes]):
+        # `media` is lazy: nothing is downloaded unless it is iterated
+        if not settings.MEDIA_DOWNLOAD_INBOUND:
+            logger.info("Received %s from %s", message.message_type, message.from_number)
+            return
+        # Streaming the file through stores it in the media cache
+        size = 0
+        try:
+            async for chunk in media:
+                size += len(chunk)
+        except (httpx.HTTPError, ValueError, OSError) as e:
+            logger.error("Error downloading %s %s: %s", message.message_type, message.media_id, e)
+            return
+        logger.info("Received %s from %s (%d bytes)", message.message_type, message.from_number, size)
+
+    async def handle_status(self, status: dict):
+        logger.debug("Status update: %s -> %s", status.get("id"), status.get("status"))
+
     def is_greeting(self, message: str) -> bool:
-        greetings = settings.GREETINGS
-        return message in greetings
+        return self.flows.intents.match(message, GREETING) == "greeting"
 
-    async def send_welcome_message(self, to: str, sender_info: dict):
+    def welcome_message(self, to: str, sender_info: dict) -> dict:
         name = sender_info.get("profile", {}).get("name", to)
         welcome_message = settings.WELCOME_MESSAGE.format(name=name)
-        await self.whatsapp_service.send_message(to, welcome_message)
+        return self.whatsapp_service.text_message(to, welcome_message)
 
-    async def send_main_menu(self, to: str):
+    def main_menu(self, to: str) -> dict:
         menu_message = settings.MENU_MESSAGE
         buttons = settings.MENU_BUTTONS
-        await self.whatsapp_service.send_interactive_message(to, menu_message, buttons)
-
-    async def handle_menu_option(self, to: str, option: str):
-        if option == "option_1":
-            self.appointment_state[to] = {"step": "name"}
-            response = "Please enter your name:"
-            await self.whatsapp_service.send_message(to, response)
-        elif option == "option_2":
-            self.assistant_state[to] = {"step": "question"}
-            response = "Please ask your question:"
-            await self.whatsapp_service.send_message(to, response)
-        elif option == "option_3":
-            response = "Here is our location:"
-            await self.whatsapp_service.send_message(to, response)
-            await self.send_location(to)
-        else:
-            response = "Sorry, I didn't understand your selection. Please choose an option from the menu."
-            await self.whatsapp_service.send_message(to, response)
-
-    async def handle_appointment_flow(self, to: str, message: str):
-        state = self.appointment_state[to]
-        if state["step"] == "name":
-            state["name"] = message
-            state["step"] = "pet_name"
-            response = "Thank you. What is your pet's name?"
-        elif state["step"] == "pet_name":
-            state["pet_name"] = message
-            state["step"] = "pet_type"
-            response = "What type of pet is it? (e.g., dog, cat, etc.)"
-        elif state["step"] == "pet_type":
-            state["pet_type"] = message
-            state["step"] = "reason"
-            response = "What is the reason for the appointment?"
-        elif state["step"] == "reason":
-            state["reason"] = message
-            response = await self.complete_appointment(to)
-        else:
-            response = "An error occurred. Let's start over."
-            del self.appointment_state[to]
-        await self.whatsapp_service.send_message(to, response)
+        return self.whatsapp_service.interactive_message(to, menu_message, buttons)
+
+    async def send_welcome_message(self, to: str, sender_info: dict):
+        await self.whatsapp_service.send_many([self.welcome_message(to, sender_info)])
 
-    async def complete_appointment(self, to: str) -> str:
-        appointment = self.appointment_state[to]
-        del self.appointment_state[to]
+    async def send_main_menu(self, to: str):
+        await self.whatsapp_service.send_many([self.main_menu(to)])
+
+    def flow_actions(self) -> Dict[str, Action]:
+        """Actions that flow definitions can call by name."""
+        return {
+            "complete_appointment": self.complete_appointment,
+            "ask_assistant": self.ask_assistant,
+            "share_location": self.share_location,
+        }
+
+    async def send_replies(self, to: str, replies: List[Reply]):
+        if replies:
+            await self.whatsapp_service.send_many([
+                self.whatsapp_service.text_message(to, reply) if isinstance(reply, str) else reply
+                for reply in replies
+            ])
+
+    async def handle_menu_option(self, to: str, option: str, state: dict):
+        await self.send_replies(to, await self.flows.select(to, option, state))
+
+    async def handle_flow_input(self, to: str, message: str, state: dict):
+        replies = await self.flows.handle(to, message, state)
+        if replies is None:
+            # No active flow: treat the text as a menu option
+            replies = await self.flows.select(to, message, state)
+        await self.send_replies(to, replies)
+
+    async def complete_appointment(self, to: str, message: str, session: FlowSession, state: dict) -> List[Reply]:
+        appointment = session.data
 
         user_data = [
             to,
@@ -146,13 +230,10 @@ class DefaultMessageHandler(BaseMessageHandler):
             appointment["reason"],
             datetime.utcnow().isoformat(),
         ]
-        # Append data to Google Sheets
-        # spreadsheet_id = (
-        #     "your_spreadsheet_id_here"  # Replace with your actual spreadsheet ID
-        # )
-        # await self.storage_service.append_to_sheet(spreadsheet_id, user_data)
+        # Buffered only; the row is written with its batch, off the reply path
+        self.storage_service.add(user_data)
 
-        return f"""Thank you for scheduling an appointment.
+        return [f"""Thank you for scheduling an appointment.
         Here is a summary:
 
         Name: {appointment['name']}
@@ -160,64 +241,47 @@ class DefaultMessageHandler(BaseMessageHandler):
         Pet Type: {appointment['pet_type']}
         Reason: {appointment['reason']}
 
-        We will contact you soon to confirm the date and time."""
-
-    async def handle_assistant_flow(self, to: str, message: str):
-        state = self.assistant_state.get(to, {})
-        step = state.get('step', 'question')
-
-        if step == 'question':
-            # Retrieve the existing chat history
-            chat_history = self.state_manager.get_chat_history(to)
-            # Append the user's message to the chat history
-            self.state_manager.append_chat_history(to, f"Human: {message}")
-
-            # Combine the chat history into a single string
-            chat_history_str = "\n".join(chat_history)
-
-            # Generate response using AI service with chat history
+        We will contact you soon to confirm the date and time."""]
+
+    async def ask_assistant(self, to: str, message: str, session: FlowSession, state: dict) -> List[Reply]:
+        # Bounded history; older turns are already folded into a summary
+        chat_history = self.chat_histories.load(to, state.get('chat_history'))
+        chat_history_str = chat_history.render()
+        # Append the user's message to the chat history
+        chat_history.append(f"Human: {message}")
+
+        replies: List[Reply] = []
+        if settings.AI_STREAMING:
+            # Queue each part as soon as it is complete; the flow's follow-up
+            # prompt is queued after them and delivered in order
+            parts = []
+            tokens = self.ai_service.stream_response(message, chat_history=chat_history_str)
+            async for part in chunk_stream(tokens):
+                await self.whatsapp_service.enqueue(self.whatsapp_service.text_message(to, part))
+                parts.append(part)
+            response = "\n".join(parts)
+        else:
+            # Generate response using AI service with chat history; it is
+            # sent together with the flow's follow-up prompt
             response = await self.ai_service.generate_response(message, chat_history=chat_history_str)
+            replies.append(response)
 
-            # Send the AI's response
-            await self.whatsapp_service.send_message(to, response)
-
-            # Append the AI's response to the chat history
-            self.state_manager.append_chat_history(to, f"AI: {response}")
-
-            # Ask if the question was answered
-            confirmation_message = "Did that answer your question? (Yes/No)"
-            await self.whatsapp_service.send_message(to, confirmation_message)
-
-            # Update the assistant state
-            self.assistant_state[to]['step'] = 'confirmation'
-
-        elif step == 'confirmation':
-            # Check the user's response
-            if message.lower() in ['yes', 'y']:
-                # End the assistant flow
-                await self.whatsapp_service.send_message(to, "Glad I could help!")
-                del self.assistant_state[to]
-                # Clear chat history if desired
-                self.state_manager.clear_chat_history(to)
-            elif message.lower() in ['no', 'n']:
-                # Continue to wait for user input
-                await self.whatsapp_service.send_message(to, "I'm sorry to hear that. Please provide more details or ask another question.")
-                # Reset the step to 'question' to process the next input
-                self.assistant_state[to]['step'] = 'question'
-            else:
-                # If the input is not clear, ask again
-                await self.whatsapp_service.send_message(to, "Please reply with 'Yes' or 'No'.")
-        else:
-            # Handle unexpected state
-            await self.whatsapp_service.send_message(to, "An error occurred. Let's start over.")
-            del self.assistant_state[to]
-            self.state_manager.clear_chat_history(to)
+        # Append the AI's response to the chat history
+        chat_history.append(f"AI: {response}")
+        state['chat_history'] = chat_history.to_dict()
+        return replies
 
-    async def send_location(self, to: str):
+    async def share_location(self, to: str, message: str, session: Optional[FlowSession], state: dict) -> List[Reply]:
+        return ["Here is our location:", self.location_message(to)]
+
+    def location_message(self, to: str) -> dict:
         latitude = 40.712776
         longitude = -74.005974
         name = "Our Location"
         address = "123 Main St, New York, NY"
-        await self.whatsapp_service.send_location_message(
+        return self.whatsapp_service.location_message(
             to, latitude, longitude, name, address
         )
+
+    async def send_location(self, to: str):
+        await self.whatsapp_service.send_many([self.location_message(to)])
@@ -0,0 +1,314 @@
+# whakit/services/metrics.py
+
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from whakit.config.settings import settings
+
+# Seconds; spans a cached answer (sub-millisecond) to a slow model call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        """The child for one combination of label values, created on first use."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        pass
+
+    @abstractmethod
+    def snapshot(self) -> dict:
+        """Current values by label values, as plain data that can be pickled."""
+        pass
+
+    @abstractmethod
+    def _samples(self, snapshot: dict) -> Iterator[str]:
+        """Text-format sample lines for merged snapshot values."""
+        pass
+
+    def render(self, snapshots: Iterable[dict] = ()) -> str:
+        """Samples of this process, added to those of `snapshots` from other processes."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples(self._merge(self.snapshot(), snapshots)))
+        return "\n".join(lines)
+
+    def _merge(self, merged: dict, snapshots: Iterable[dict]) -> dict:
+        for snapshot in snapshots:
+            for values, value in snapshot.items():
+                merged[values] = self._add(merged[values], value) if values in merged else value
+        return merged
+
+    @staticmethod
+    def _add(a, b):
+        return a + b
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    @contextmanager
+    def track(self):
+        """Count the enclosed block as in flight."""
+        self.value += 1
+        try:
+            yield
+        finally:
+            self.value -= 1
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def snapshot(self) -> dict:
+        return {values: child.value for values, child in self._children.items()}
+
+    def _samples(self, snapshot: dict) -> Iterator[str]:
+        for values, value in snapshot.items():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {value}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._function: Optional[Callable[[], float]] = None
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the value from `function` at scrape time instead."""
+        self._function = function
+
+    def track(self):
+        return self.labels().track()
+
+    def snapshot(self) -> dict:
+        if self._function is not None:
+            return {(): self._function()}
+        return super().snapshot()
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def snapshot(self) -> dict:
+        return {values: (list(child.counts), child.sum, child.count) for values, child in self._children.items()}
+
+    @staticmethod
+    def _add(a, b):
+        return [x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2]
+
+    def _samples(self, snapshot: dict) -> Iterator[str]:
+        for values, (counts, total, count) in snapshot.items():
+            cumulative = 0
+            for bound, bucket in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {total}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Registry:
+    """Metrics in the Prometheus text format.
+
+    Everything is updated from the event loop thread, so observations are
+    plain attribute and list updates: no locks and no allocation once a
+    label combination has been seen.
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def _add(self, metric: _Metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Every metric's values, for another process to merge into its own."""
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def render(self, snapshots: Iterable[Dict[str, dict]] = ()) -> str:
+        """The text format; `snapshots` from other processes are summed into the samples."""
+        snapshots = list(snapshots)
+        return "\n".join(
+            metric.render([snapshot.get(metric.name, {}) for snapshot in snapshots])
+            for metric in self._metrics
+        ) + "\n"
+
+
+REGISTRY = Registry()
+
+WEBHOOK_PARSE_SECONDS = REGISTRY.histogram(
+    "whakit_webhook_parse_seconds", "Time to verify and decode a webhook body")
+WEBHOOK_EVENTS = REGISTRY.counter(
+    "whakit_webhook_events_total", "Webhook events received", ["kind"])
+MESSAGES = REGISTRY.counter(
+    "whakit_messages_total", "Incoming messages processed", ["type"])
+MESSAGE_ERRORS = REGISTRY.counter(
+    "whakit_message_errors_total", "Incoming messages whose handler raised", ["type"])
+MESSAGE_SECONDS = REGISTRY.histogram(
+    "whakit_handle_incoming_message_seconds", "Time spent in handle_incoming_message", ["type"])
+MESSAGE_WAIT_SECONDS = REGISTRY.histogram(
+    "whakit_message_queue_wait_seconds", "Time a message waited for a worker")
+MESSAGES_IN_FLIGHT = REGISTRY.gauge(
+    "whakit_messages_in_flight", "Messages being handled")
+FLOW_STEPS = REGISTRY.counter(
+    "whakit_flow_steps_total", "Replies handled by flow and step", ["flow", "step"])
+STATE_LOAD_SECONDS = REGISTRY.histogram(
+    "whakit_state_load_seconds", "Time to load a user's state document")
+AI_SECONDS = REGISTRY.histogram(
+    "whakit_ai_generate_response_seconds", "Time spent in generate_response", ["outcome"])
+AI_IN_FLIGHT = REGISTRY.gauge(
+    "whakit_ai_in_flight", "AI answers being generated")
+SEND_SECONDS = REGISTRY.histogram(
+    "whakit_send_request_seconds", "Time from queuing an outbound send to its delivery", ["outcome"])
+SENDS_IN_FLIGHT = REGISTRY.gauge(
+    "whakit_sends_in_flight", "Outbound sends queued or being delivered")
+GRAPH_REQUEST_SECONDS = REGISTRY.histogram(
+    "whakit_graph_request_seconds", "Duration of single Graph API requests")
+GRAPH_ERRORS = REGISTRY.counter(
+    "whakit_graph_errors_total", "Failed Graph API requests by HTTP status", ["status"])
+
+
+# Optional OpenTelemetry tracing; spans are no-ops unless enabled and installed
+_tracer = None
+_NO_SPAN = nullcontext()
+
+
+def _get_tracer():
+    global _tracer
+    if _tracer is None:
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            _tracer = False
+        else:
+            _tracer = trace.get_tracer("whakit")
+    return _tracer
+
+
+def span(name: str, **attributes):
+    """A tracing span around one pipeline stage, or a no-op."""
+    if not settings.OTEL_ENABLED:
+        return _NO_SPAN
+    tracer = _get_tracer()
+    if not tracer:
+        return _NO_SPAN
+    return tracer.start_as_current_span(name, attributes=attributes)
+
+
+def capture_context():
+    """The current trace context, to be resumed by a later stage."""
+    if not settings.OTEL_ENABLED or not _get_tracer():
+        return None
+    from opentelemetry import context
+
+    return context.get_current()
+
+
+@contextmanager
+def attach_context(ctx):
+    """Resume a trace context captured in another task (e.g. across the queue)."""
+    if ctx is None:
+        yield
+        return
+    from opentelemetry import context
+
+    token = context.attach(ctx)
+    try:
+        yield
+    finally:
+        context.detach(token)
@@ -0,0 +1,120 @@
+# whakit/services/outbox.py
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Hashable, Optional, Set
+
+from whakit.config.settings import settings
+from whakit.services.dispatcher import KeyedDispatcher
+from whakit.services.journal import OutboxJournal
+
+logger = logging.getLogger(__name__)
+
+
+class Outbox:
+    """Bounded buffer of outbound sends.
+
+    Sends to the same recipient are delivered one at a time in submission
+    order (including while one of them is being retried); different
+    recipients drain in parallel. Sends without a recipient, such as read
+    receipts, are not ordered. When the buffer is full, submit waits.
+
+    With a journal, sends to a recipient are recorded on disk before they
+    are attempted and replayed by `recover` after a crash. Read receipts are
+    not journaled.
+    """
+
+    def __init__(
+        self,
+        deliver: Callable[[dict], Awaitable[bool]],
+        max_pending: Optional[int] = None,
+        journal: Optional[OutboxJournal] = None,
+    ):
+        self._deliver = deliver
+        self.journal = journal
+        self.capacity = max_pending or settings.OUTBOX_MAX_PENDING
+        self._slots = asyncio.Semaphore(self.capacity)
+        self.dispatcher = KeyedDispatcher(self._process)
+        self._tasks: Set[asyncio.Task] = set()
+        self.pending = 0
+
+    async def enqueue(self, key: Optional[Hashable], data: dict) -> asyncio.Future:
+        """Queue a send, waiting only for buffer space.
+
+        The returned future resolves to True once the send is delivered, or
+        False if delivery failed.
+        """
+        await self._slots.acquire()
+        row_id = None
+        if self.journal is not None and key is not None:
+            try:
+                row_id = await self.journal.append(key, data)
+            except asyncio.CancelledError:
+                self._slots.release()
+                raise
+            except Exception:
+                # Still attempt the send, just without the crash guarantee
+                row_id = None
+        return self._start(key, data, row_id)
+
+    def _start(self, key: Optional[Hashable], data: dict, row_id: Optional[int]) -> asyncio.Future:
+        self.pending += 1
+        future = asyncio.get_running_loop().create_future()
+        item = (data, future, row_id)
+        if key is None:
+            task = asyncio.create_task(self._process(item))
+        else:
+            task = asyncio.create_task(self.dispatcher.dispatch(key, item))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return future
+
+    async def submit(self, key: Optional[Hashable], data: dict) -> bool:
+        """Queue a send and wait until it is delivered."""
+        return await (await self.enqueue(key, data))
+
+    async def recover(self) -> int:
+        """Replay the sends a previous run journaled but never finished."""
+        if self.journal is None:
+            return 0
+        pending = await self.journal.open()
+        for row_id, key, data in pending:
+            await self._slots.acquire()
+            self._start(key, data, row_id)
+        if pending:
+            logger.warning("Replaying %d unfinished outbound messages", len(pending))
+        return len(pending)
+
+    async def _process(self, item: tuple):
+        data, future, row_id = item
+        try:
+            delivered = await self._deliver(data)
+        except Exception as e:
+            logger.error("Unexpected error delivering message: %s", e)
+            delivered = False
+        finally:
+            self.pending -= 1
+            self._slots.release()
+        if row_id is not None:
+            self.journal.ack(row_id, delivered)
+        if not future.done():
+            future.set_result(delivered)
+
+    async def join(self):
+        """Wait until every submitted send has been attempted."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def close(self):
+        if self.journal is not None:
+            await self.journal.close()
+
+    def stats(self) -> dict:
+        stats = {
+            "pending": self.pending,
+            "capacity": self.capacity,
+            "active_recipients": self.dispatcher.active_keys,
+        }
+        if self.journal is not None:
+            stats["journal"] = self.journal.stats()
+        return stats
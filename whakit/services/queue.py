@@ -0,0 +1,165 @@
+# whakit/services/queue.py
+
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+from whakit.config.settings import settings
+from whakit.models.message import Message
+from whakit.services.dispatcher import KeyedDispatcher
+from whakit.services.metrics import (
+    MESSAGE_ERRORS,
+    MESSAGE_SECONDS,
+    MESSAGE_WAIT_SECONDS,
+    MESSAGES,
+    MESSAGES_IN_FLIGHT,
+    attach_context,
+    capture_context,
+    span,
+)
+from whakit.services.message_handler import BaseMessageHandler
+
+logger = logging.getLogger(__name__)
+
+
+class MessageQueue:
+    """Bounded queue drained by a pool of async workers.
+
+    The webhook only enqueues; the workers run the handler, so Meta gets its
+    200 without waiting for the AI call or any outbound send. Workers hand
+    messages to a dispatcher keyed on the sender's number, so each
+    conversation is processed in arrival order while different conversations
+    run in parallel.
+    """
+
+    def __init__(
+        self,
+        handler: BaseMessageHandler,
+        workers: Optional[int] = None,
+        maxsize: Optional[int] = None,
+    ):
+        self.handler = handler
+        self.num_workers = workers or settings.WORKER_COUNT
+        self.capacity = maxsize or settings.WORKER_QUEUE_SIZE
+        self._queue: asyncio.Queue = asyncio.Queue()
+        # A slot is held from enqueue until the handler finishes, so messages
+        # parked behind a busy sender still count against the capacity.
+        self._slots = asyncio.Semaphore(self.capacity)
+        self.dispatcher = KeyedDispatcher(self._process)
+        self._workers: List[asyncio.Task] = []
+        self._closing = False
+
+        # Counters exposed through stats()
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self):
+        if self._workers:
+            return
+        self._closing = False
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"whakit-worker-{i}")
+            for i in range(self.num_workers)
+        ]
+        logger.info("Started %d message workers.", self.num_workers)
+
+    async def stop(self, timeout: Optional[float] = None):
+        """Stop accepting work, drain what is queued and cancel the workers."""
+        self._closing = True
+        timeout = settings.WORKER_SHUTDOWN_TIMEOUT if timeout is None else timeout
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Shutting down with %d messages still queued.", self._queue.qsize())
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def enqueue(self, message: Message, sender_info: dict, wait: bool = False) -> bool:
+        """Queue a message for processing. Returns False when the queue stays full.
+
+        With `wait`, blocks until there is room instead of giving up.
+        """
+        return await self._put("message", message.from_number, message, sender_info, wait)
+
+    async def enqueue_status(self, status: dict, wait: bool = False) -> bool:
+        """Queue a delivery/read status callback for processing."""
+        return await self._put("status", status.get("recipient_id"), status, {}, wait)
+
+    async def _put(self, kind: str, key: str, payload: dict, sender_info: dict, wait: bool = False) -> bool:
+        if self._closing:
+            self.rejected += 1
+            return False
+        if not self._workers:
+            self.start()
+        try:
+            # Backpressure: wait briefly for a free slot, then give up so the
+            # webhook can answer with a retryable status instead of hanging.
+            timeout = None if wait else settings.WORKER_ENQUEUE_TIMEOUT
+            await asyncio.wait_for(self._slots.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            logger.warning("Message queue is full; rejecting webhook delivery.")
+            return False
+        # The trace context travels with the item so the worker's spans join the webhook's trace
+        self._queue.put_nowait((time.monotonic(), kind, key, payload, sender_info, capture_context()))
+        self.enqueued += 1
+        return True
+
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            await self.dispatcher.dispatch(item[2], item)
+
+    async def _process(self, item: tuple):
+        enqueued_at, kind, _, payload, sender_info, trace_context = item
+        wait = time.monotonic() - enqueued_at
+        self.total_wait += wait
+        if wait > self.max_wait:
+            self.max_wait = wait
+        MESSAGE_WAIT_SECONDS.observe(wait)
+        message_type = kind if kind == "status" else payload.message_type
+        try:
+            with attach_context(trace_context):
+                if kind == "status":
+                    with span("handle_status"):
+                        await self.handler.handle_status(payload)
+                else:
+                    with span("handle_incoming_message", message_type=message_type), \
+                            MESSAGES_IN_FLIGHT.track(), MESSAGE_SECONDS.labels(message_type).time():
+                        await self.handler.handle_incoming_message(payload, sender_info)
+            MESSAGES.labels(message_type).inc()
+            self.processed += 1
+        except Exception:
+            self.failed += 1
+            MESSAGE_ERRORS.labels(message_type).inc()
+            logger.exception("Error processing queued message.")
+        finally:
+            self._slots.release()
+            self._queue.task_done()
+
+    def stats(self) -> dict:
+        dequeued = self.processed + self.failed
+        return {
+            "workers": len(self._workers),
+            "depth": self._queue.qsize(),
+            "sender_backlog": self.dispatcher.backlog,
+            "active_senders": self.dispatcher.active_keys,
+            "capacity": self.capacity,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_seconds": self.total_wait / dequeued if dequeued else 0.0,
+            "max_wait_seconds": self.max_wait,
+        }
@@ -0,0 +1,117 @@
+# whakit/services/ratelimit.py
+
+import asyncio
+import random
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Hashable, Optional
+
+
+class TokenBucket:
+    """Token bucket in GCRA form: `rate` tokens per second, bursts up to `burst`.
+
+    Tokens are reserved rather than polled, so a caller learns immediately
+    when it may proceed and waiters are served in reservation order.
+    """
+
+    __slots__ = ("interval", "tolerance", "_tat")
+
+    def __init__(self, rate: float, burst: int):
+        self.interval = 1.0 / rate
+        self.tolerance = self.interval * (max(burst, 1) - 1)
+        self._tat = 0.0  # theoretical arrival time of the next token
+
+    def reserve(self, now: float) -> float:
+        """Take one token and return the time at which it may be used."""
+        tat = max(self._tat, now)
+        self._tat = tat + self.interval
+        return max(now, tat - self.tolerance)
+
+    def idle(self, now: float) -> bool:
+        """Whether the bucket has refilled completely."""
+        return self._tat <= now
+
+
+class RateLimiter:
+    """Global token bucket plus one bucket per key (e.g. per recipient).
+
+    Per-key buckets are kept in LRU order and dropped once they have
+    refilled, so only recently active keys cost memory.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        key_rate: Optional[float] = None,
+        key_burst: int = 1,
+        max_keys: int = 100_000,
+    ):
+        self.global_bucket = TokenBucket(rate, burst)
+        self.key_rate = key_rate
+        self.key_burst = key_burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def _key_bucket(self, key: Hashable, now: float) -> TokenBucket:
+        buckets = self._buckets
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(self.key_rate, self.key_burst)
+        else:
+            buckets.move_to_end(key)
+        # Evict refilled buckets from the cold end, and anything beyond the cap
+        while buckets:
+            oldest = next(iter(buckets.values()))
+            if oldest is bucket or (not oldest.idle(now) and len(buckets) <= self.max_keys):
+                break
+            buckets.popitem(last=False)
+        return bucket
+
+    def reserve_key(self, key: Hashable) -> float:
+        """Reserve a slot in `key`'s own bucket and return how many seconds to wait for it."""
+        if not self.key_rate:
+            return 0.0
+        now = time.monotonic()
+        return self._key_bucket(key, now).reserve(now) - now
+
+    def reserve(self) -> float:
+        """Reserve a global slot and return how many seconds to wait before using it."""
+        now = time.monotonic()
+        return self.global_bucket.reserve(now) - now
+
+    async def acquire(self, key: Optional[Hashable] = None):
+        # The global token is only taken once the key's own slot has come, so
+        # a recipient over its limit does not push back everyone else's sends
+        delay = self.reserve_key(key) if key is not None else 0.0
+        if delay > 0:
+            await asyncio.sleep(delay)
+        global_delay = self.reserve()
+        if global_delay > 0:
+            await asyncio.sleep(global_delay)
+        delay += max(global_delay, 0.0)
+        if delay > 0:
+            self.waits += 1
+            self.wait_seconds += delay
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
@@ -1,33 +1,314 @@
-# # whakit/services/storage_service.py
-
-# import asyncio
-# import logging
-
-# from google.oauth2.service_account import Credentials
-# from googleapiclient.discovery import build
-
-# logger = logging.getLogger(__name__)
-
-
-# class StorageService:
-#     def __init__(self):
-#         credentials = Credentials.from_service_account_file(
-#             "whakit/credentials/credentials.json",
-#             scopes=["https://www.googleapis.com/auth/spreadsheets"],
-#         )
-#         self.service = build("sheets", "v4", credentials=credentials)
-
-#     async def append_to_sheet(self, spreadsheet_id: str, data: list):
-#         sheet = self.service.spreadsheets()
-#         request = sheet.values().append(
-#             spreadsheetId=spreadsheet_id,
-#             range="Sheet1",
-#             valueInputOption="RAW",
-#             insertDataOption="INSERT_ROWS",
-#             body={"values": [data]},
-#         )
-#         try:
-#             await asyncio.get_event_loop().run_in_executor(None, request.execute)
-#             logger.info("Data appended to Google Sheets successfully.")
-#         except Exception as e:
-#             logger.error(f"Error appending to Google Sheets: {e}")
+# whakit/services/storage.py
+
+import asyncio
+import csv
+import logging
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+from whakit.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Order of the values in each appointment row
+APPOINTMENT_COLUMNS = ("phone", "name", "pet_name", "pet_type", "reason", "created_at")
+
+
+class AppointmentSink(ABC):
+    """Destination for appointment rows.
+
+    `write_rows` receives a whole batch and runs on the storage service's
+    writer thread, so implementations may block. Raising leaves the batch
+    buffered for the next flush.
+    """
+
+    def __init__(self, columns: Sequence[str] = APPOINTMENT_COLUMNS):
+        self.columns = tuple(columns)
+
+    @abstractmethod
+    def write_rows(self, rows: List[list]):
+        pass
+
+    def close(self):
+        pass
+
+
+def _ensure_parent(path: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+class SQLiteSink(AppointmentSink):
+    """Rows in a table of a SQLite file in WAL mode, one transaction per batch."""
+
+    def __init__(self, path: str, table: str = "appointments", columns: Sequence[str] = APPOINTMENT_COLUMNS):
+        super().__init__(columns)
+        self.path = path
+        self.table = table
+        self._conn: Optional[sqlite3.Connection] = None
+        self._insert = (
+            f"INSERT INTO {table} ({', '.join(self.columns)}) VALUES ({', '.join('?' * len(self.columns))})"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            _ensure_parent(self.path)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # Worker processes may share the file; wait for each other's commits
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                " id INTEGER PRIMARY KEY,"
+                f" {', '.join(f'{column} TEXT' for column in self.columns)})"
+            )
+            self._conn = conn
+        return self._conn
+
+    def write_rows(self, rows: List[list]):
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(self._insert, rows)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class CSVSink(AppointmentSink):
+    """Rows appended to a CSV file, with a header row when the file is new."""
+
+    def __init__(self, path: str, columns: Sequence[str] = APPOINTMENT_COLUMNS):
+        super().__init__(columns)
+        self.path = path
+
+    def write_rows(self, rows: List[list]):
+        _ensure_parent(self.path)
+        with open(self.path, "a", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            if file.tell() == 0:
+                writer.writerow(self.columns)
+            writer.writerows(rows)
+
+
+class ParquetSink(AppointmentSink):
+    """Each batch written as a new Parquet file in a directory.
+
+    Parquet files cannot be appended to, so the directory is the dataset;
+    readers such as pyarrow, pandas and DuckDB load it as one table. Needs
+    pyarrow.
+    """
+
+    def __init__(self, directory: str, columns: Sequence[str] = APPOINTMENT_COLUMNS):
+        super().__init__(columns)
+        self.directory = directory
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError("The parquet appointment backend needs pyarrow; pip install pyarrow") from e
+
+    def write_rows(self, rows: List[list]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        os.makedirs(self.directory, exist_ok=True)
+        table = pa.table({
+            column: [None if row[i] is None else str(row[i]) for row in rows]
+            for i, column in enumerate(self.columns)
+        })
+        # Unique across batches and worker processes
+        name = f"part-{time.time_ns()}-{os.getpid()}.parquet"
+        partial = os.path.join(self.directory, f".{name}.tmp")
+        pq.write_table(table, partial)
+        os.replace(partial, os.path.join(self.directory, name))
+
+
+class SheetsSink(AppointmentSink):
+    """Rows appended to a Google Sheets range, one API call per batch.
+
+    Needs google-api-python-client and google-auth, and a service account
+    key with access to the spreadsheet.
+    """
+
+    def __init__(
+        self,
+        spreadsheet_id: str,
+        credentials_path: str,
+        sheet_range: str = "Sheet1",
+        columns: Sequence[str] = APPOINTMENT_COLUMNS,
+    ):
+        super().__init__(columns)
+        if not spreadsheet_id:
+            raise ValueError("The sheets appointment backend needs SHEETS_SPREADSHEET_ID")
+        self.spreadsheet_id = spreadsheet_id
+        self.credentials_path = credentials_path
+        self.sheet_range = sheet_range
+        self._service = None
+
+    def _connect(self):
+        if self._service is None:
+            from google.oauth2.service_account import Credentials
+            from googleapiclient.discovery import build
+
+            credentials = Credentials.from_service_account_file(
+                self.credentials_path,
+                scopes=["https://www.googleapis.com/auth/spreadsheets"],
+            )
+            self._service = build("sheets", "v4", credentials=credentials, cache_discovery=False)
+        return self._service
+
+    def write_rows(self, rows: List[list]):
+        request = self._connect().spreadsheets().values().append(
+            spreadsheetId=self.spreadsheet_id,
+            range=self.sheet_range,
+            valueInputOption="RAW",
+            insertDataOption="INSERT_ROWS",
+            body={"values": rows},
+        )
+        request.execute()
+
+
+def create_appointment_sink(backend: Optional[str] = None) -> Optional[AppointmentSink]:
+    """The configured sink, or None when appointments are not stored."""
+    backend = backend or settings.APPOINTMENTS_BACKEND
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        return SQLiteSink(settings.APPOINTMENTS_PATH or "whakit/data/appointments.db")
+    if backend == "csv":
+        return CSVSink(settings.APPOINTMENTS_PATH or "whakit/data/appointments.csv")
+    if backend == "parquet":
+        return ParquetSink(settings.APPOINTMENTS_PATH or "whakit/data/appointments")
+    if backend == "sheets":
+        return SheetsSink(settings.SHEETS_SPREADSHEET_ID, settings.SHEETS_CREDENTIALS_PATH, settings.SHEETS_RANGE)
+    raise ValueError(f"Unsupported appointments backend: {backend}")
+
+
+class StorageService:
+    """Buffers appointment rows and writes them to a sink in batches.
+
+    `add` only appends to an in-memory buffer, so completing an appointment
+    never waits on storage. A batch is flushed once `batch_size` rows are
+    buffered, or `flush_interval` seconds after the first buffered row,
+    whichever comes first. Writes run one at a time on a dedicated thread.
+    A failed batch stays buffered and is retried after `flush_interval`;
+    past `max_buffered` rows the oldest are dropped. `close` flushes what
+    is left.
+    """
+
+    def __init__(
+        self,
+        sink: Optional[AppointmentSink] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_buffered: Optional[int] = None,
+    ):
+        self.sink = sink
+        self.batch_size = batch_size or settings.APPOINTMENTS_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else settings.APPOINTMENTS_FLUSH_INTERVAL
+        self.max_buffered = max_buffered or settings.APPOINTMENTS_MAX_BUFFERED
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whakit-storage")
+        self._buffer: List[list] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Set after a failed write; retries then wait for the timer
+        self._failing = False
+
+        # Counters exposed through stats()
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self.dropped = 0
+
+    def add(self, row: list):
+        """Buffer a row for the next batch; returns immediately."""
+        if self.sink is None:
+            return
+        self._buffer.append(row)
+        if len(self._buffer) > self.max_buffered:
+            # The sink has been failing for a while; keep the newest rows
+            excess = len(self._buffer) - self.max_buffered
+            del self._buffer[:excess]
+            self.dropped += excess
+            logger.error("Appointment buffer full, dropped %d rows", excess)
+        if len(self._buffer) >= self.batch_size and not self._failing:
+            self._schedule()
+        elif self._timer is None and self._flush_task is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self._schedule)
+
+    def _schedule(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flush_task is None and self._buffer:
+            self._flush_task = asyncio.create_task(self._flush())
+
+    async def _write(self, rows: List[list]) -> bool:
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self.sink.write_rows, rows)
+        except Exception as e:
+            self.errors += 1
+            logger.error("Error writing %d appointment rows: %s", len(rows), e)
+            return False
+        self.written += len(rows)
+        self.batches += 1
+        return True
+
+    async def _flush(self):
+        try:
+            while self._buffer:
+                rows = self._buffer[:self.batch_size]
+                del self._buffer[:len(rows)]
+                if not await self._write(rows):
+                    # Keep the batch ahead of newer rows and retry after flush_interval
+                    self._buffer[:0] = rows
+                    self._failing = True
+                    break
+                self._failing = False
+                if len(self._buffer) < self.batch_size:
+                    # Let a partial batch fill up until its interval is due
+                    break
+        finally:
+            self._flush_task = None
+        if self._buffer and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self._schedule)
+
+    async def close(self):
+        """Write every buffered row and close the sink."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flush_task is not None:
+            await self._flush_task
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._buffer:
+            rows = self._buffer[:self.batch_size]
+            del self._buffer[:len(rows)]
+            if not await self._write(rows):
+                self.dropped += len(rows) + len(self._buffer)
+                logger.error("Lost %d appointment rows on shutdown", len(rows) + len(self._buffer))
+                self._buffer.clear()
+        if self.sink is not None:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self.sink.close)
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "batches": self.batches,
+            "rows_per_batch": self.written / self.batches if self.batches else 0.0,
+            "errors": self.errors,
+            "dropped": self.dropped,
+        }
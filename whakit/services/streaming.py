@@ -0,0 +1,56 @@
+# whakit/services/streaming.py
+
+import re
+from typing import AsyncIterable, AsyncIterator, Optional
+
+from whakit.config.settings import settings
+
+# WhatsApp rejects text bodies longer than this
+WHATSAPP_MAX_TEXT_LENGTH = 4096
+
+_SENTENCE_END = re.compile(r"[.!?…][)\"'»]*\s")
+
+
+def _find_cut(buffer: str, min_chars: int, max_chars: int) -> Optional[int]:
+    """Return where to split the buffer, or None to keep buffering."""
+    if len(buffer) < min_chars:
+        return None
+    window = buffer[:max_chars]
+    # Prefer paragraph breaks, then sentence ends, past the minimum size
+    paragraph = window.rfind("\n\n")
+    if paragraph >= min_chars:
+        return paragraph + 2
+    sentence_end = None
+    for match in _SENTENCE_END.finditer(window, min_chars - 1):
+        sentence_end = match.end()
+    if sentence_end is not None:
+        return sentence_end
+    if len(buffer) < max_chars:
+        return None
+    # No natural boundary within the limit: split on whitespace, or hard cut
+    space = window.rfind(" ")
+    return space + 1 if space > 0 else max_chars
+
+
+async def chunk_stream(
+    tokens: AsyncIterable[str],
+    min_chars: Optional[int] = None,
+    max_chars: int = WHATSAPP_MAX_TEXT_LENGTH,
+) -> AsyncIterator[str]:
+    """Group streamed tokens into message-sized parts at paragraph or sentence boundaries."""
+    min_chars = min_chars or settings.AI_STREAM_MIN_CHARS
+    buffer = ""
+    async for token in tokens:
+        buffer += token
+        cut = _find_cut(buffer, min_chars, max_chars)
+        while cut is not None:
+            part, buffer = buffer[:cut].strip(), buffer[cut:]
+            if part:
+                yield part
+            cut = _find_cut(buffer, min_chars, max_chars)
+    buffer = buffer.strip()
+    while buffer:
+        cut = _find_cut(buffer, 1, max_chars) if len(buffer) > max_chars else len(buffer)
+        part, buffer = buffer[:cut].strip(), buffer[cut:].strip()
+        if part:
+            yield part
@@ -1,28 +1,67 @@
 # whakit/services/whatsapp_service.py
 
+import asyncio
 import logging
+import time
+from typing import Dict, List, Optional, Union
 
 import httpx
 
 from whakit.config.settings import settings
+from whakit.services.http import get_http_client
+from whakit.services.journal import OutboxJournal
+from whakit.services.media import MediaService
+from whakit.services.metrics import (
+    GRAPH_ERRORS,
+    GRAPH_REQUEST_SECONDS,
+    SEND_SECONDS,
+    SENDS_IN_FLIGHT,
+    span,
+)
+from whakit.services.outbox import Outbox
+from whakit.services.ratelimit import RateLimiter, backoff_delay, parse_retry_after
 
 logger = logging.getLogger(__name__)
 
 
 class WhatsAppService:
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        self._client = client
         self.base_url = f"{settings.BASE_URL}/{settings.API_VERSION}/{settings.BUSINESS_PHONE}/messages"
         self.headers = {
             "Authorization": f"Bearer {settings.API_TOKEN}",
             "Content-Type": "application/json",
         }
+        # Paces sends under the Cloud API throughput and per-recipient pair limits
+        self.rate_limiter = RateLimiter(
+            settings.OUTBOUND_RATE,
+            settings.OUTBOUND_BURST,
+            key_rate=settings.OUTBOUND_RECIPIENT_RATE,
+            key_burst=settings.OUTBOUND_RECIPIENT_BURST,
+        )
+        # Optionally journal sends to disk so replies survive a crash
+        journal = OutboxJournal(settings.OUTBOX_JOURNAL_PATH) if settings.OUTBOX_DURABLE else None
+        self.outbox = Outbox(self._deliver, journal=journal)
+        # Inbound media downloads and outbound uploads share the client
+        self.media = MediaService(client)
+        # Latest unread message id and pending flush task per sender
+        self._pending_reads: Dict[str, str] = {}
+        self._read_tasks: Dict[str, asyncio.Task] = {}
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
 
-    async def send_message(self, to: str, body: str):
-        data = {"messaging_product": "whatsapp", "to": to, "text": {"body": body}}
-        await self._send_request(data)
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_http_client()
 
-    async def send_interactive_message(self, to: str, body_text: str, buttons: list):
-        data = {
+    # Payload builders. Each send_* method below sends one of these; they can
+    # also be combined with send_many / batch() to pipeline several replies.
+    def text_message(self, to: str, body: str) -> dict:
+        return {"messaging_product": "whatsapp", "to": to, "text": {"body": body}}
+
+    def interactive_message(self, to: str, body_text: str, buttons: list) -> dict:
+        return {
             "messaging_product": "whatsapp",
             "to": to,
             "type": "interactive",
@@ -32,53 +71,55 @@ class WhatsAppService:
                 "action": {"buttons": buttons},
             },
         }
-        await self._send_request(data)
 
-    async def send_media_message(
+    def media_message(
         self,
         to: str,
         media_type: str,
-        media_url: str,
+        media_url: str = None,
         caption: str = None,
         filename: str = None,
-    ):
+        media_id: str = None,
+    ) -> dict:
+        # An uploaded media id saves Meta fetching the file from our link
+        reference = {"id": media_id} if media_id else {"link": media_url}
         media_object = {}
         if media_type == "image":
-            media_object["image"] = {"link": media_url, "caption": caption}
+            media_object["image"] = {**reference, "caption": caption}
         elif media_type == "audio":
-            media_object["audio"] = {"link": media_url}
+            media_object["audio"] = reference
         elif media_type == "video":
-            media_object["video"] = {"link": media_url, "caption": caption}
+            media_object["video"] = {**reference, "caption": caption}
         elif media_type == "document":
             media_object["document"] = {
-                "link": media_url,
+                **reference,
                 "caption": caption,
                 "filename": filename,
             }
+        elif media_type == "sticker":
+            media_object["sticker"] = reference
         else:
             raise ValueError("Unsupported media type")
 
-        data = {
+        return {
             "messaging_product": "whatsapp",
             "to": to,
             "type": media_type,
             **media_object,
         }
-        await self._send_request(data)
 
-    async def send_contact_message(self, to: str, contact: dict):
-        data = {
+    def contact_message(self, to: str, contact: dict) -> dict:
+        return {
             "messaging_product": "whatsapp",
             "to": to,
             "type": "contacts",
             "contacts": [contact],
         }
-        await self._send_request(data)
 
-    async def send_location_message(
+    def location_message(
         self, to: str, latitude: float, longitude: float, name: str, address: str
-    ):
-        data = {
+    ) -> dict:
+        return {
             "messaging_product": "whatsapp",
             "to": to,
             "type": "location",
@@ -89,28 +130,239 @@ class WhatsAppService:
                 "address": address,
             },
         }
-        await self._send_request(data)
 
-    async def mark_as_read(self, message_id: str):
-        data = {
+    def template_message(
+        self, to: str, name: str, language: str = "en_US", parameters: Optional[List[str]] = None
+    ) -> dict:
+        # Approved templates are required to start a conversation outside the 24-hour window
+        template = {"name": name, "language": {"code": language}}
+        if parameters:
+            template["components"] = [
+                {"type": "body", "parameters": [{"type": "text", "text": text} for text in parameters]}
+            ]
+        return {
+            "messaging_product": "whatsapp",
+            "to": to,
+            "type": "template",
+            "template": template,
+        }
+
+    def read_receipt(self, message_id: str) -> dict:
+        return {
             "messaging_product": "whatsapp",
             "status": "read",
             "message_id": message_id,
         }
-        await self._send_request(data)
 
-    async def _send_request(self, data: dict):
+    async def send_message(self, to: str, body: str) -> bool:
+        return await self._send_request(self.text_message(to, body))
+
+    async def send_interactive_message(self, to: str, body_text: str, buttons: list) -> bool:
+        return await self._send_request(self.interactive_message(to, body_text, buttons))
+
+    async def send_media_message(
+        self,
+        to: str,
+        media_type: str,
+        media_url: str,
+        caption: str = None,
+        filename: str = None,
+    ) -> bool:
+        return await self._send_request(self.media_message(to, media_type, media_url, caption, filename))
+
+    async def send_media_file(
+        self,
+        to: str,
+        media_type: str,
+        source: Union[str, bytes],
+        mime_type: str,
+        caption: str = None,
+        filename: str = None,
+    ) -> bool:
+        """Send a local file or bytes, uploading it only the first time it is sent."""
+        media_id = await self.media.upload(source, mime_type, filename)
+        if media_id is None:
+            self.failed += 1
+            return False
+        return await self._send_request(
+            self.media_message(to, media_type, caption=caption, filename=filename, media_id=media_id)
+        )
+
+    async def send_template_message(
+        self, to: str, name: str, language: str = "en_US", parameters: Optional[List[str]] = None
+    ) -> bool:
+        return await self._send_request(self.template_message(to, name, language, parameters))
+
+    async def send_contact_message(self, to: str, contact: dict) -> bool:
+        return await self._send_request(self.contact_message(to, contact))
+
+    async def send_location_message(
+        self, to: str, latitude: float, longitude: float, name: str, address: str
+    ) -> bool:
+        return await self._send_request(self.location_message(to, latitude, longitude, name, address))
+
+    async def mark_as_read(self, message_id: str) -> bool:
+        return await self._send_request(self.read_receipt(message_id))
+
+    def schedule_read_receipt(self, sender: str, message_id: str):
+        """Mark a message as read in the background, off the reply path.
+
+        Receipts for the same sender arriving within READ_RECEIPT_DELAY are
+        collapsed into one for the newest message, which marks the earlier
+        ones as read too.
+        """
+        self._pending_reads[sender] = message_id
+        if sender not in self._read_tasks:
+            task = asyncio.create_task(self._flush_read_receipt(sender))
+            self._read_tasks[sender] = task
+
+    async def _flush_read_receipt(self, sender: str):
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.base_url, json=data, headers=self.headers
+            await asyncio.sleep(settings.READ_RECEIPT_DELAY)
+        except asyncio.CancelledError:
+            # Cancelled by close(): skip the wait but still send the receipt
+            pass
+        self._read_tasks.pop(sender, None)
+        message_id = self._pending_reads.pop(sender, None)
+        if message_id is not None:
+            await self.mark_as_read(message_id)
+
+    async def enqueue(self, data: dict) -> asyncio.Future:
+        """Queue a send without waiting for delivery.
+
+        Only waits for outbox space. The returned future resolves to whether
+        the send was delivered; sends to one recipient keep their order.
+        """
+        started = time.perf_counter()
+        in_flight = SENDS_IN_FLIGHT.labels()
+        in_flight.inc()
+        future = await self.outbox.enqueue(data.get("to"), data)
+
+        def observe(done: asyncio.Future):
+            in_flight.dec()
+            outcome = "delivered" if not done.cancelled() and done.result() else "failed"
+            SEND_SECONDS.labels(outcome).observe(time.perf_counter() - started)
+
+        future.add_done_callback(observe)
+        return future
+
+    async def send_many(self, messages: List[dict]) -> bool:
+        """Send several messages with one await, keeping their order per recipient.
+
+        All sends are queued up front and pipelined through the outbox.
+        Returns True only if every send was delivered.
+        """
+        futures = [await self.enqueue(data) for data in messages]
+        return all(await asyncio.gather(*futures))
+
+    def batch(self, to: str) -> "MessageBatch":
+        return MessageBatch(self, to)
+
+    async def _send_request(self, data: dict) -> bool:
+        # Read receipts carry no recipient and are not ordered or pair-limited
+        with span("whatsapp.send_request"):
+            return await (await self.enqueue(data))
+
+    async def _deliver(self, data: dict) -> bool:
+        to = data.get("to")
+        max_retries = settings.OUTBOUND_MAX_RETRIES
+        for attempt in range(max_retries + 1):
+            await self.rate_limiter.acquire(to)
+            retry_after = None
+            started = time.perf_counter()
+            try:
+                with span("whatsapp.graph_request", attempt=attempt):
+                    response = await self.client.post(
+                        self.base_url, json=data, headers=self.headers
+                    )
+                GRAPH_REQUEST_SECONDS.observe(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    GRAPH_ERRORS.labels(str(response.status_code)).inc()
+                if response.status_code == 429 or response.status_code >= 500:
+                    # Throttled or server-side failure: worth retrying
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    error = f"{response.status_code} - {response.text}"
+                else:
+                    response.raise_for_status()
+                    self.sent += 1
+                    logger.debug("Message sent successfully to %s", to)
+                    return True
+            except httpx.HTTPStatusError as exc:
+                self.failed += 1
+                logger.error(
+                    "Error sending message: %s - %s", exc.response.status_code, exc.response.text
+                )
+                return False
+            except httpx.TransportError as e:
+                GRAPH_ERRORS.labels("transport").inc()
+                error = str(e) or type(e).__name__
+            except Exception as e:
+                self.failed += 1
+                logger.error("Unexpected error: %s", e)
+                return False
+
+            if attempt == max_retries:
+                break
+            if retry_after is None:
+                retry_after = backoff_delay(
+                    attempt, settings.OUTBOUND_BACKOFF_BASE, settings.OUTBOUND_BACKOFF_MAX
                 )
-                response.raise_for_status()
-                logger.info(f"Message sent successfully: {data}")
-        except httpx.HTTPStatusError as exc:
-            print(f"Error sending message: {exc.response.status_code} - {exc.response.text}")
-            logger.error(
-                f"Error sending message: {exc.response.status_code} - {exc.response.text}"
-            )
-        except Exception as e:
-            logger.error(f"Unexpected error: {e}")
+            self.retries += 1
+            logger.warning("Error sending message (%s); retrying in %.2fs", error, retry_after)
+            await asyncio.sleep(retry_after)
+
+        self.failed += 1
+        logger.error("Giving up sending message after %d attempts: %s", max_retries + 1, error)
+        return False
+
+    async def startup(self):
+        """Resend anything journaled but not delivered before the last stop."""
+        await self.outbox.recover()
+
+    async def close(self):
+        """Send pending read receipts now and wait for queued sends to finish."""
+        tasks = list(self._read_tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.outbox.join()
+        await self.outbox.close()
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "rate_limited": self.rate_limiter.waits,
+            "rate_limited_seconds": self.rate_limiter.wait_seconds,
+            "outbox": self.outbox.stats(),
+            "media": self.media.stats(),
+        }
+
+
+class MessageBatch:
+    """Ordered replies to one recipient, sent together with a single await."""
+
+    def __init__(self, service: WhatsAppService, to: str):
+        self.service = service
+        self.to = to
+        self.messages: List[dict] = []
+
+    def text(self, body: str) -> "MessageBatch":
+        self.messages.append(self.service.text_message(self.to, body))
+        return self
+
+    def interactive(self, body_text: str, buttons: list) -> "MessageBatch":
+        self.messages.append(self.service.interactive_message(self.to, body_text, buttons))
+        return self
+
+    def location(self, latitude: float, longitude: float, name: str, address: str) -> "MessageBatch":
+        self.messages.append(self.service.location_message(self.to, latitude, longitude, name, address))
+        return self
+
+    def add(self, data: dict) -> "MessageBatch":
+        self.messages.append(data)
+        return self
+
+    async def send(self) -> bool:
+        return await self.service.send_many(self.messages)
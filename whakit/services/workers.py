@@ -0,0 +1,304 @@
+# whakit/services/workers.py
+
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from whakit.config.log import forward_logging, receive_logging
+from whakit.config.settings import settings
+from whakit.models.message import Message
+
+logger = logging.getLogger(__name__)
+
+# Seconds between stats reports from each worker process
+REPORT_INTERVAL = 1.0
+
+# Spawned children start from a clean interpreter, not a copy of the
+# parent's threads and open sockets
+_context = multiprocessing.get_context("spawn")
+
+
+def shard_for(key: Optional[str], shards: int) -> int:
+    """The worker that owns `key`, stable across processes and restarts."""
+    if not key:
+        return 0
+    return zlib.crc32(key.encode()) % shards
+
+
+class WorkerPool:
+    """Routes incoming messages to handler processes by sender.
+
+    Every message from one number goes to the same process, so each
+    conversation keeps its arrival order and its in-memory state while
+    different conversations use every core. This process only verifies,
+    decodes and routes webhooks. It has the same enqueue interface as
+    `MessageQueue`, which runs inside each worker.
+
+    Messages are sent to a worker in batches, one per event loop
+    iteration. A worker holds a permit from its semaphore for each message
+    until its local queue has taken it. When a worker falls behind, its
+    permits run out and webhooks for its senders get a 503.
+    """
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        handler_factory: Optional[str] = None,
+        capacity: Optional[int] = None,
+    ):
+        self.processes = processes or settings.WORKER_PROCESSES
+        # "module:callable" returning a handler; defaults to the webhook controller's
+        self.handler_factory = handler_factory
+        self.capacity = capacity or settings.WORKER_QUEUE_SIZE
+        self._inboxes: List[multiprocessing.Queue] = []
+        self._permits: list = []
+        self._workers: list = []
+        self._spawned_at: List[float] = [0.0] * self.processes
+        self._buffers: List[list] = [[] for _ in range(self.processes)]
+        self._flush_scheduled = False
+        self._reports = _context.Queue()
+        self._log_records = _context.Queue()
+        self._collector: Optional[asyncio.Task] = None
+        self._closing = False
+        self.reports: Dict[int, dict] = {}
+        # Latest metrics snapshot from each worker, merged into /metrics
+        self.metrics: Dict[int, dict] = {}
+        self._ready = asyncio.Event()
+
+        # Counters exposed through stats()
+        self.routed = [0] * self.processes
+        self.rejected = 0
+        self.restarts = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self):
+        if self._workers:
+            return
+        self._closing = False
+        receive_logging(self._log_records)
+        self._inboxes = [None] * self.processes
+        self._permits = [None] * self.processes
+        self._workers = [None] * self.processes
+        for index in range(self.processes):
+            self._spawn(index)
+        self._collector = asyncio.create_task(self._collect(), name="whakit-worker-reports")
+        logger.info("Started %d worker processes.", self.processes)
+
+    def _spawn(self, index: int):
+        inbox = _context.Queue()
+        permits = _context.BoundedSemaphore(self.capacity)
+        process = _context.Process(
+            target=_worker_main,
+            args=(index, self.processes, self.handler_factory, inbox, permits, self._reports, self._log_records),
+            name=f"whakit-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        self._inboxes[index] = inbox
+        self._permits[index] = permits
+        self._workers[index] = process
+        self._spawned_at[index] = time.monotonic()
+
+    async def ready(self, timeout: Optional[float] = None):
+        """Wait until every worker has started its handler."""
+        await asyncio.wait_for(self._ready.wait(), timeout)
+
+    async def enqueue(self, message: Message, sender_info: dict) -> bool:
+        """Route a message to its sender's worker. Returns False when that worker is full."""
+        return self._put(message.from_number, ("message", message, sender_info))
+
+    async def enqueue_status(self, status: dict) -> bool:
+        """Route a status callback to the worker of the number it was sent to."""
+        return self._put(status.get("recipient_id"), ("status", status, {}))
+
+    def _put(self, key: Optional[str], item: tuple) -> bool:
+        if self._closing:
+            self.rejected += 1
+            return False
+        if not self._workers:
+            self.start()
+        index = shard_for(key, self.processes)
+        if not self._permits[index].acquire(False):
+            self.rejected += 1
+            logger.warning("Worker %d is full; rejecting webhook delivery.", index)
+            return False
+        self._buffers[index].append(item)
+        self.routed[index] += 1
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+        return True
+
+    def _flush(self):
+        self._flush_scheduled = False
+        for index, buffer in enumerate(self._buffers):
+            if buffer:
+                # Unbounded queue: put hands the batch to a feeder thread and returns
+                self._inboxes[index].put(buffer)
+                self._buffers[index] = []
+
+    def _drain_reports(self):
+        while True:
+            try:
+                index, report = self._reports.get_nowait()
+            except queue.Empty:
+                return
+            self.metrics[index] = report.pop("metrics")
+            self.reports[index] = report
+
+    async def _collect(self):
+        while True:
+            await asyncio.sleep(0.1)
+            self._drain_reports()
+            if len(self.reports) == self.processes:
+                self._ready.set()
+            for index, process in enumerate(self._workers):
+                if process.is_alive() or self._closing:
+                    continue
+                # At most one restart per second, in case it dies on startup
+                if time.monotonic() - self._spawned_at[index] >= 1.0:
+                    # Messages queued for it are lost; its senders are routed to the replacement
+                    logger.error("Worker %d exited with code %s; restarting it.", index, process.exitcode)
+                    self.restarts += 1
+                    self._spawn(index)
+
+    async def stop(self, timeout: Optional[float] = None):
+        """Let every worker drain its queue and exit."""
+        if not self._workers:
+            return
+        self._closing = True
+        self._flush()
+        timeout = settings.WORKER_SHUTDOWN_TIMEOUT if timeout is None else timeout
+        for inbox in self._inboxes:
+            inbox.put(None)
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=self.processes) as executor:
+            # Workers drain for up to WORKER_SHUTDOWN_TIMEOUT themselves, then close their handler
+            await asyncio.gather(*(
+                loop.run_in_executor(executor, process.join, timeout + 5.0) for process in self._workers
+            ))
+        for index, process in enumerate(self._workers):
+            if process.is_alive():
+                logger.warning("Worker %d did not stop in time; terminating it.", index)
+                process.terminate()
+        self._drain_reports()
+        if self._collector is not None:
+            self._collector.cancel()
+            await asyncio.gather(self._collector, return_exceptions=True)
+            self._collector = None
+        self._workers = []
+        logger.info("Stopped worker processes.")
+
+    def metric_snapshots(self) -> List[dict]:
+        """Each worker's metrics as of its last report, at most REPORT_INTERVAL old."""
+        return list(self.metrics.values())
+
+    def stats(self) -> dict:
+        return {
+            "processes": self.processes,
+            "alive": sum(1 for process in self._workers if process.is_alive()),
+            "routed": list(self.routed),
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+            # Latest report from each worker, at most REPORT_INTERVAL old
+            "workers": {index: self.reports.get(index) for index in range(self.processes)},
+        }
+
+
+def _worker_main(index, processes, handler_factory, inbox, permits, reports, log_records):
+    # Ctrl+C reaches the whole process group; the parent stops workers in order
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # This process handles messages itself instead of routing them
+    settings.WORKER_PROCESSES = 1
+    # The Graph API limit applies to the phone number, so the processes share it
+    settings.OUTBOUND_RATE = settings.OUTBOUND_RATE / processes
+    settings.OUTBOUND_BURST = max(1, settings.OUTBOUND_BURST // processes)
+    # Each process replays only its own unfinished sends
+    root, ext = os.path.splitext(settings.OUTBOX_JOURNAL_PATH)
+    settings.OUTBOX_JOURNAL_PATH = f"{root}.{index}{ext}"
+    if settings.APPOINTMENTS_BACKEND == "csv":
+        # Rows from several processes would interleave in one CSV file
+        root, ext = os.path.splitext(settings.APPOINTMENTS_PATH or "whakit/data/appointments.csv")
+        settings.APPOINTMENTS_PATH = f"{root}.{index}{ext}"
+    forward_logging(log_records)
+    asyncio.run(_run_worker(index, handler_factory, inbox, permits, reports))
+
+
+def _next_batch(inbox, parent: int) -> Optional[list]:
+    """Block until the next batch; None once told to stop or orphaned."""
+    while True:
+        try:
+            return inbox.get(timeout=1.0)
+        except queue.Empty:
+            if os.getppid() != parent:
+                logger.error("Parent process exited; stopping worker.")
+                return None
+
+
+def _load_handler(handler_factory: Optional[str]):
+    if handler_factory is None:
+        from whakit.controllers.webhook import message_handler
+
+        return message_handler
+    module, _, name = handler_factory.partition(":")
+    return getattr(importlib.import_module(module), name)()
+
+
+async def _run_worker(index, handler_factory, inbox, permits, reports):
+    from whakit.services.http import close_http_client, get_http_client
+    from whakit.services.metrics import REGISTRY
+    from whakit.services.queue import MessageQueue
+
+    handler = _load_handler(handler_factory)
+    message_queue = MessageQueue(handler)
+    get_http_client()
+    await handler.startup()
+    message_queue.start()
+
+    def report():
+        reports.put((index, {
+            "pid": os.getpid(),
+            "queue": message_queue.stats(),
+            "handler": handler.stats(),
+            "metrics": REGISTRY.snapshot(),
+        }))
+
+    async def report_periodically():
+        while True:
+            report()
+            await asyncio.sleep(REPORT_INTERVAL)
+
+    reporter = asyncio.create_task(report_periodically())
+    loop = asyncio.get_running_loop()
+    parent = os.getppid()
+    # A dedicated thread blocks on the inbox so the event loop never does
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="whakit-inbox") as reader:
+        while True:
+            batch = await loop.run_in_executor(reader, _next_batch, inbox, parent)
+            if batch is None:
+                break
+            for kind, payload, sender_info in batch:
+                # The webhook was already acknowledged, so wait for room rather than drop it
+                if kind == "message":
+                    await message_queue.enqueue(payload, sender_info, wait=True)
+                else:
+                    await message_queue.enqueue_status(payload, wait=True)
+                permits.release()
+
+    await message_queue.stop()
+    await handler.shutdown()
+    await close_http_client()
+    reporter.cancel()
+    report()
+    logger.info("Worker %d stopped.", index)
@@ -0,0 +1,154 @@
+# whakit/state/history.py
+
+import uuid
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Iterable, List, Optional, Union
+
+from whakit.config.settings import settings
+
+Summarizer = Callable[[str, List[str]], str]
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text; good enough for budgeting
+    return len(text) // 4 + 1
+
+
+def truncating_summarizer(summary: str, turns: List[str]) -> str:
+    """Fold evicted turns into the summary without calling a model.
+
+    Each turn is clipped to HISTORY_SUMMARY_TURN_CHARS and the oldest parts of
+    the summary are dropped once it exceeds HISTORY_SUMMARY_MAX_TOKENS.
+    """
+    limit = settings.HISTORY_SUMMARY_TURN_CHARS
+    clipped = [turn if len(turn) <= limit else turn[:limit].rstrip() + "..." for turn in turns]
+    summary = " | ".join([summary, *clipped]) if summary else " | ".join(clipped)
+    max_chars = settings.HISTORY_SUMMARY_MAX_TOKENS * 4
+    if len(summary) > max_chars:
+        summary = "..." + summary[-max_chars:]
+    return summary
+
+
+class ChatHistory:
+    """Chat turns capped by message count and estimated tokens.
+
+    Turns pushed out of the window are compacted into a running summary. The
+    prompt text is built when first rendered and then extended on append,
+    so it is only rebuilt when the window slides. It is not saved; each turn
+    is stored once. Keep the object alive between turns with
+    ChatHistoryCache so the text is not rebuilt after every load.
+    """
+
+    def __init__(
+        self,
+        turns: Iterable[str] = (),
+        summary: str = "",
+        max_messages: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        summarizer: Optional[Summarizer] = None,
+    ):
+        self.max_messages = max_messages or settings.HISTORY_MAX_MESSAGES
+        self.max_tokens = max_tokens or settings.HISTORY_MAX_TOKENS
+        self.summarizer = summarizer or truncating_summarizer
+        self.summary = summary
+        self._turns: Deque[str] = deque(turns)
+        self._tokens = sum(estimate_tokens(turn) for turn in self._turns)
+        self._text: Optional[str] = None
+        # Revision of the saved document this object matches; None once changed
+        self.rev: Optional[str] = None
+        self._compact()
+
+    @classmethod
+    def from_dict(cls, data: Union[dict, List[str], None], **kwargs) -> "ChatHistory":
+        if not data:
+            return cls(**kwargs)
+        if isinstance(data, list):
+            # Histories saved before the window existed were plain lists
+            return cls(turns=data, **kwargs)
+        # A "text" key from older documents is ignored and rebuilt on render
+        history = cls(turns=data.get("turns", ()), summary=data.get("summary", ""), **kwargs)
+        history.rev = data.get("rev")
+        return history
+
+    def to_dict(self) -> dict:
+        """The document to save; marks this object as matching it."""
+        self.rev = uuid.uuid4().hex
+        return {"turns": list(self._turns), "summary": self.summary, "rev": self.rev}
+
+    @property
+    def tokens(self) -> int:
+        return self._tokens + (estimate_tokens(self.summary) if self.summary else 0)
+
+    def append(self, turn: str):
+        self.rev = None
+        self._turns.append(turn)
+        self._tokens += estimate_tokens(turn)
+        if self._text is not None:
+            self._text = f"{self._text}\n{turn}" if self._text else turn
+        self._compact()
+
+    def _compact(self):
+        evicted = []
+        while len(self._turns) > self.max_messages or (
+            self._tokens > self.max_tokens and len(self._turns) > 1
+        ):
+            turn = self._turns.popleft()
+            self._tokens -= estimate_tokens(turn)
+            evicted.append(turn)
+        if evicted:
+            self.summary = self.summarizer(self.summary, evicted)
+            self._text = None
+
+    def render(self) -> str:
+        if self._text is None:
+            parts = [f"Summary of earlier conversation: {self.summary}"] if self.summary else []
+            parts.extend(self._turns)
+            self._text = "\n".join(parts)
+        return self._text
+
+    def clear(self):
+        self.rev = None
+        self._turns.clear()
+        self._tokens = 0
+        self.summary = ""
+        self._text = ""
+
+    def __iter__(self):
+        return iter(self._turns)
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+
+class ChatHistoryCache:
+    """Live ChatHistory objects by user, most recently used last.
+
+    A cached object is reused only while the saved document still carries
+    the revision it wrote, so its rendered text is extended turn by turn
+    instead of re-joined after every load. Anything else, such as a history
+    changed by another process or cleared when its flow ended, is rebuilt
+    from the document.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.HISTORY_CACHE_SIZE
+        self._entries: "OrderedDict[str, ChatHistory]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, key: str, data: Union[dict, List[str], None]) -> ChatHistory:
+        history = self._entries.get(key)
+        rev = data.get("rev") if isinstance(data, dict) else None
+        if history is not None and rev is not None and history.rev == rev:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return history
+        self.misses += 1
+        history = self._entries[key] = ChatHistory.from_dict(data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return history
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
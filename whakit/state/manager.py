@@ -1,32 +1,70 @@
 # whakit/state/state_manager.py
 
-from typing import Dict, List
+from typing import Dict, Iterable, Optional
+
+from whakit.config.settings import settings
+from whakit.services.metrics import STATE_LOAD_SECONDS, span
+from whakit.state.history import ChatHistory
+from whakit.state.store import StateStore, create_state_store
 
 
 class StateManager:
-    def __init__(self):
-        # In-memory state storage
-        self.states: Dict[str, Dict] = {}
-
-    def get_state(self, user_id: str) -> Dict:
-        return self.states.get(user_id, {})
-
-    def set_state(self, user_id: str, state: Dict):
-        self.states[user_id] = state
-
-    def clear_state(self, user_id: str):
-        if user_id in self.states:
-            del self.states[user_id]
-
-    # New methods for chat history
-    def get_chat_history(self, user_id: str) -> List[str]:
-        return self.states.get(user_id, {}).get('chat_history', [])
-
-    def append_chat_history(self, user_id: str, message: str):
-        if user_id not in self.states:
-            self.states[user_id] = {}
-        self.states[user_id].setdefault('chat_history', []).append(message)
-    
-    def clear_chat_history(self, user_id: str):
-        if user_id in self.states and 'chat_history' in self.states[user_id]:
-            del self.states[user_id]['chat_history']
\ No newline at end of file
+    """Per-user conversation state kept as one document in a StateStore.
+
+    Handlers load the document once per message, mutate it and save it once,
+    so a message costs a single read and a single write whatever the backend.
+    """
+
+    def __init__(self, store: Optional[StateStore] = None, ttl: Optional[float] = None):
+        self.store = store if store is not None else create_state_store()
+        self.ttl = ttl or settings.STATE_TTL_SECONDS
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"state:{user_id}"
+
+    async def get_state(self, user_id: str) -> Dict:
+        with span("state.get"), STATE_LOAD_SECONDS.time():
+            return await self.store.get(self._key(user_id)) or {}
+
+    async def set_state(self, user_id: str, state: Dict):
+        if state:
+            await self.store.set(self._key(user_id), state, self.ttl)
+        else:
+            await self.store.delete(self._key(user_id))
+
+    async def clear_state(self, user_id: str):
+        await self.store.delete(self._key(user_id))
+
+    async def get_states(self, user_ids: Iterable[str]) -> Dict[str, Dict]:
+        user_ids = list(user_ids)
+        found = await self.store.get_many(self._key(user_id) for user_id in user_ids)
+        return {user_id: found.get(self._key(user_id), {}) for user_id in user_ids}
+
+    async def set_states(self, states: Dict[str, Dict]):
+        await self.store.set_many(
+            {self._key(user_id): state for user_id, state in states.items() if state}, self.ttl
+        )
+        for user_id, state in states.items():
+            if not state:
+                await self.store.delete(self._key(user_id))
+
+    # Chat history helpers
+    async def get_chat_history(self, user_id: str) -> ChatHistory:
+        return ChatHistory.from_dict((await self.get_state(user_id)).get('chat_history'))
+
+    async def append_chat_history(self, user_id: str, message: str):
+        state = await self.get_state(user_id)
+        history = ChatHistory.from_dict(state.get('chat_history'))
+        history.append(message)
+        state['chat_history'] = history.to_dict()
+        await self.set_state(user_id, state)
+
+    async def clear_chat_history(self, user_id: str):
+        state = await self.get_state(user_id)
+        if 'chat_history' in state:
+            del state['chat_history']
+            await self.set_state(user_id, state)
+
+    async def close(self):
+        await self.store.close()
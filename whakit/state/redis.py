@@ -0,0 +1,175 @@
+# whakit/state/redis.py
+
+import asyncio
+import contextlib
+import json
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from whakit.state.store import StateStore
+
+
+class RedisError(Exception):
+    pass
+
+
+def encode_command(*args) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Redis connection closed")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        return RedisError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(rest)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise RedisError(f"Unexpected reply: {line!r}")
+
+
+class RedisConnection:
+    """Minimal RESP2 client over a single pipelined connection.
+
+    Commands from concurrent callers are written as they arrive and a reader
+    task resolves replies in FIFO order, so no lock is held across a round trip.
+    """
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connecting: Optional[asyncio.Lock] = None
+
+    async def _connect(self):
+        if self._connecting is None:
+            self._connecting = asyncio.Lock()
+        async with self._connecting:
+            if self._writer is not None:
+                return
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+            self._reader, self._writer = reader, writer
+            self._reader_task = asyncio.create_task(self._read_loop())
+            if self.password:
+                await self._send([("AUTH", self.password)])
+            if self.db:
+                await self._send([("SELECT", self.db)])
+
+    async def _read_loop(self):
+        reader, writer = self._reader, self._writer
+        try:
+            while True:
+                reply = await read_reply(reader)
+                waiter = self._waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result(reply)
+        except Exception as exc:
+            if self._writer is writer:
+                self._writer = None
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if not waiter.done():
+                    waiter.set_exception(ConnectionError(f"Redis connection lost: {exc}"))
+            # Release the dead connection's socket before the next command reconnects
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    async def _send(self, commands: List[tuple]) -> List[Any]:
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in commands]
+        self._waiters.extend(futures)
+        self._writer.write(b"".join(encode_command(*command) for command in commands))
+        await self._writer.drain()
+        replies = await asyncio.gather(*futures)
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    async def execute(self, *command) -> Any:
+        return (await self.pipeline([command]))[0]
+
+    async def pipeline(self, commands: List[tuple]) -> List[Any]:
+        if self._writer is None:
+            await self._connect()
+        return await self._send(commands)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+
+
+class RedisStateStore(StateStore):
+    """Store backed by any server speaking the Redis protocol."""
+
+    def __init__(self, url: str, prefix: str = "whakit:"):
+        self.connection = RedisConnection(url)
+        self.prefix = prefix
+
+    @staticmethod
+    def _set_command(key: str, value: Any, ttl: Optional[float]) -> tuple:
+        command = ("SET", key, json.dumps(value))
+        if ttl:
+            command += ("PX", int(ttl * 1000))
+        return command
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self.connection.execute("GET", self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = await self.connection.execute("MGET", *(self.prefix + key for key in keys))
+        return {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        await self.connection.execute(*self._set_command(self.prefix + key, value, ttl))
+
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None):
+        if items:
+            await self.connection.pipeline(
+                [self._set_command(self.prefix + key, value, ttl) for key, value in items.items()]
+            )
+
+    async def delete(self, key: str):
+        await self.connection.execute("DEL", self.prefix + key)
+
+    async def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        command = self._set_command(self.prefix + key, value, ttl) + ("NX",)
+        return await self.connection.execute(*command) is not None
+
+    async def close(self):
+        await self.connection.close()
@@ -0,0 +1,130 @@
+# whakit/state/sqlite.py
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from whakit.state.store import StateStore
+
+# Expired rows are purged on write once every this many write operations
+PURGE_INTERVAL = 1000
+
+
+class SQLiteStateStore(StateStore):
+    """Durable store on a single SQLite file in WAL mode.
+
+    All queries run on one dedicated thread that owns the connection, so the
+    event loop never blocks on disk I/O and writes are naturally serialized.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whakit-sqlite")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _maybe_purge(self, conn: sqlite3.Connection, now: float):
+        self._writes += 1
+        if self._writes % PURGE_INTERVAL == 0:
+            conn.execute("DELETE FROM state WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+
+    def _get_many(self, keys: List[str]) -> Dict[str, Any]:
+        conn = self._connect()
+        now = time.time()
+        result = {}
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT key, value FROM state WHERE key IN ({placeholders})"
+                " AND (expires_at IS NULL OR expires_at > ?)",
+                (*chunk, now),
+            )
+            for key, value in rows:
+                result[key] = json.loads(value)
+        return result
+
+    def _set_many(self, items: Dict[str, Any], ttl: Optional[float]):
+        conn = self._connect()
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)",
+                [(key, json.dumps(value), expires_at) for key, value in items.items()],
+            )
+            self._maybe_purge(conn, now)
+
+    def _delete(self, key: str):
+        self._connect().execute("DELETE FROM state WHERE key = ?", (key,))
+
+    def _add(self, key: str, value: Any, ttl: Optional[float]) -> bool:
+        conn = self._connect()
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with conn:
+            conn.execute("BEGIN")
+            # Only overwrite an existing row if it has already expired
+            cursor = conn.execute(
+                "INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at"
+                " WHERE state.expires_at IS NOT NULL AND state.expires_at <= ?",
+                (key, json.dumps(value), expires_at, now),
+            )
+            self._maybe_purge(conn, now)
+            return cursor.rowcount > 0
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def get(self, key: str) -> Optional[Any]:
+        return (await self._run(self._get_many, [key])).get(key)
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        return await self._run(self._get_many, list(keys))
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        await self._run(self._set_many, {key: value}, ttl)
+
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None):
+        if items:
+            await self._run(self._set_many, items, ttl)
+
+    async def delete(self, key: str):
+        await self._run(self._delete, key)
+
+    async def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        return await self._run(self._add, key, value, ttl)
+
+    async def close(self):
+        await self._run(self._close)
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,140 @@
+# whakit/state/store.py
+
+import heapq
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from whakit.config.settings import settings
+
+
+class StateStore(ABC):
+    """Async key/value store for per-conversation state.
+
+    Values must be JSON-serializable. A ttl of None keeps the key until it is
+    deleted; otherwise the key expires ttl seconds after its last write.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        pass
+
+    @abstractmethod
+    async def delete(self, key: str):
+        pass
+
+    @abstractmethod
+    async def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set the key only if it is absent or expired. Returns True if it was set."""
+        pass
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        result = {}
+        for key in keys:
+            value = await self.get(key)
+            if value is not None:
+                result[key] = value
+        return result
+
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None):
+        for key, value in items.items():
+            await self.set(key, value, ttl)
+
+    async def close(self):
+        pass
+
+
+class MemoryStateStore(StateStore):
+    """Process-local store. Expired keys are swept from a heap of deadlines on write."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._deadlines: List[Tuple[float, str]] = []
+
+    def _live(self, key: str, now: float) -> Optional[Tuple[Any, Optional[float]]]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= now:
+            del self._data[key]
+            return None
+        return item
+
+    def _sweep(self, now: float):
+        deadlines = self._deadlines
+        while deadlines and deadlines[0][0] <= now:
+            expires_at, key = heapq.heappop(deadlines)
+            item = self._data.get(key)
+            # Skip stale heap entries left behind by a later write to the same key
+            if item is not None and item[1] == expires_at:
+                del self._data[key]
+
+    def _put(self, key: str, value: Any, ttl: Optional[float], now: float):
+        expires_at = now + ttl if ttl else None
+        self._data[key] = (value, expires_at)
+        if expires_at is not None:
+            heapq.heappush(self._deadlines, (expires_at, key))
+            # Rewrites leave stale entries until their deadline; drop them once
+            # they outnumber live keys, so the heap tracks keys rather than writes
+            if len(self._deadlines) > 2 * len(self._data) + 64:
+                self._deadlines = [
+                    (deadline, k) for k, (_, deadline) in self._data.items() if deadline is not None
+                ]
+                heapq.heapify(self._deadlines)
+
+    async def get(self, key: str) -> Optional[Any]:
+        item = self._live(key, time.monotonic())
+        return item[0] if item is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        now = time.monotonic()
+        self._sweep(now)
+        self._put(key, value, ttl, now)
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    async def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        now = time.monotonic()
+        self._sweep(now)
+        if self._live(key, now) is not None:
+            return False
+        self._put(key, value, ttl, now)
+        return True
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        now = time.monotonic()
+        result = {}
+        for key in keys:
+            item = self._live(key, now)
+            if item is not None:
+                result[key] = item[0]
+        return result
+
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None):
+        now = time.monotonic()
+        self._sweep(now)
+        for key, value in items.items():
+            self._put(key, value, ttl, now)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def create_state_store(backend: Optional[str] = None) -> StateStore:
+    backend = backend or settings.STATE_BACKEND
+    if backend == "memory":
+        return MemoryStateStore()
+    if backend == "sqlite":
+        from whakit.state.sqlite import SQLiteStateStore
+
+        return SQLiteStateStore(settings.STATE_SQLITE_PATH)
+    if backend == "redis":
+        from whakit.state.redis import RedisStateStore
+
+        return RedisStateStore(settings.STATE_REDIS_URL)
+    raise ValueError(f"Unsupported state backend: {backend}")
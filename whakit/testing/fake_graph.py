@@ -0,0 +1,214 @@
+# whakit/testing/fake_graph.py
+#
+# Local stand-in for the Graph API `/messages` endpoint with configurable
+# latency, throttling (429 with Retry-After) and server errors. It also
+# serves media lookups and downloads (every media id returns the same
+# `media_size` random bytes) and accepts media uploads. Use it in-process
+# as an httpx transport:
+#
+#   graph = FakeGraphAPI(latency=0.05, throttle_rate=0.01)
+#   service = WhatsAppService(client=graph.client())
+#
+# or standalone over HTTP (set BASE_URL to its address):
+#
+#   python -m whakit.testing.fake_graph --port 8089 --latency 0.05
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+
+class FakeGraphAPI(httpx.AsyncBaseTransport):
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        throttle_rate: float = 0.0,
+        error_rate: float = 0.0,
+        retry_after: float = 0.0,
+        seed: Optional[int] = 0,
+        media_size: int = 64 * 1024,
+        record: bool = True,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self.media = random.Random(seed).randbytes(media_size)
+        self.media_sha256 = hashlib.sha256(self.media).hexdigest()
+        # Download URLs handed out by media lookups point here
+        self.media_base = "http://fake-graph"
+        # Accepted messages per recipient, with their arrival time; with
+        # record=False only counted, for runs too long to keep them all
+        self.record = record
+        self.received: Dict[str, List[tuple]] = defaultdict(list)
+        self.delivered = 0
+        self.read_receipts = 0
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.media_downloads = 0
+        self.media_uploads = 0
+        self._waiters: Dict[str, List[tuple]] = defaultdict(list)
+        self._next_id = 0
+
+    def client(self, **kwargs) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=self, **kwargs)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        status, body, headers = await self.handle(request.method, request.url.path, request.content)
+        if isinstance(body, bytes):
+            return httpx.Response(status, content=body, headers=headers, request=request)
+        return httpx.Response(status, json=body, headers=headers, request=request)
+
+    async def handle(self, method: str, path: str, content: bytes):
+        self.requests += 1
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+        if method == "GET":
+            return self._get_media(path)
+        if method == "POST" and path.endswith("/media"):
+            self.media_uploads += 1
+            return 200, {"id": f"media.upload.{self.media_uploads}"}, {}
+        if method != "POST" or not path.endswith("/messages"):
+            return 404, {"error": {"message": "Unknown path", "code": 100}}, {}
+
+        roll = self._random.random()
+        if roll < self.throttle_rate:
+            self.throttled += 1
+            headers = {"Retry-After": str(self.retry_after)} if self.retry_after else {}
+            return 429, {"error": {"message": "Rate limit hit", "code": 130429}}, headers
+        if roll < self.throttle_rate + self.error_rate:
+            self.errors += 1
+            return 500, {"error": {"message": "Service temporarily unavailable", "code": 2}}, {}
+
+        data = json.loads(content or b"{}")
+        if data.get("status") == "read":
+            self.read_receipts += 1
+            return 200, {"success": True}, {}
+        to = data.get("to")
+        if not to:
+            return 400, {"error": {"message": "Missing recipient", "code": 100}}, {}
+        self._next_id += 1
+        message_id = f"wamid.fake.{self._next_id}"
+        self.delivered += 1
+        if self.record:
+            inbox = self.received[to]
+            inbox.append((time.perf_counter(), data))
+            self._wake(to, len(inbox))
+        return 200, {
+            "messaging_product": "whatsapp",
+            "contacts": [{"input": to, "wa_id": to}],
+            "messages": [{"id": message_id}],
+        }, {}
+
+    def _get_media(self, path: str):
+        media_id = path.rstrip("/").rsplit("/", 1)[-1]
+        if path.startswith("/media/"):
+            self.media_downloads += 1
+            return 200, self.media, {"Content-Type": "image/jpeg"}
+        return 200, {
+            "messaging_product": "whatsapp",
+            "id": media_id,
+            "url": f"{self.media_base}/media/{media_id}",
+            "mime_type": "image/jpeg",
+            "sha256": self.media_sha256,
+            "file_size": len(self.media),
+        }, {}
+
+    def _wake(self, to: str, count: int):
+        waiters = self._waiters.get(to)
+        if not waiters:
+            return
+        remaining = []
+        for needed, future in waiters:
+            if count >= needed:
+                if not future.done():
+                    future.set_result(None)
+            else:
+                remaining.append((needed, future))
+        if remaining:
+            self._waiters[to] = remaining
+        else:
+            del self._waiters[to]
+
+    async def wait_for(self, to: str, count: int, timeout: Optional[float] = None):
+        """Wait until `to` has received at least `count` messages in total."""
+        if len(self.received.get(to, ())) >= count:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[to].append((count, future))
+        await asyncio.wait_for(future, timeout)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "delivered": self.delivered,
+            "read_receipts": self.read_receipts,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "media_downloads": self.media_downloads,
+            "media_uploads": self.media_uploads,
+        }
+
+
+async def _serve(graph: FakeGraphAPI, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    # Minimal HTTP/1.1 keep-alive server, enough for httpx clients
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, path, _ = request_line.decode().split(" ", 2)
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode().partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value)
+            content = await reader.readexactly(length) if length else b""
+            status, body, headers = await graph.handle(method, path, content)
+            payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+            headers = {"Content-Type": "application/json", **headers}
+            head = [f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}", f"Content-Length: {len(payload)}"]
+            head.extend(f"{name}: {value}" for name, value in headers.items())
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + payload)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _main(args):
+    graph = FakeGraphAPI(args.latency, args.jitter, args.throttle_rate, args.error_rate, args.retry_after)
+    graph.media_base = f"http://{args.host}:{args.port}"
+    server = await asyncio.start_server(lambda r, w: _serve(graph, r, w), args.host, args.port)
+    print(f"Fake Graph API listening on http://{args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Graph API /messages stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.0)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,99 @@
+# whakit/testing/fake_llm.py
+#
+# Deterministic chat model for exercising AIService offline. It answers from a
+# keyword table, simulates first-token and per-token latency, and speaks the
+# ReAct "Final Answer:" format when it is driven by the agent prompt.
+
+import asyncio
+import re
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+_TOKEN = re.compile(r"\S+\s*|\s+")
+
+DEFAULT_ANSWER = (
+    "Thanks for your question. Our clinic is open Monday to Saturday from 8am to 6pm. "
+    "You can book a visit from the main menu at any time.\n\n"
+    "If this is an emergency, please call us directly so we can help right away."
+)
+
+
+class FakeChatModel(BaseChatModel):
+    responses: Dict[str, str] = {}
+    default_response: str = DEFAULT_ANSWER
+    latency: float = 0.0
+    token_delay: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "whakit-fake"
+
+    def _question(self, messages: List[BaseMessage]) -> str:
+        text = str(messages[-1].content)
+        # The ReAct prompt embeds the user's message after "New input:"
+        match = re.search(r"New input:\s*(.*?)\n", text, re.S)
+        return (match.group(1) if match else text).strip()
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        question = self._question(messages).lower()
+        answer = next(
+            (reply for keyword, reply in self.responses.items() if keyword in question),
+            self.default_response,
+        )
+        if "Final Answer:" in str(messages[-1].content):
+            return f"Thought: Do I need to use a tool? No\nFinal Answer: {answer}"
+        return answer
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        if self.latency:
+            time.sleep(self.latency)
+        for token in _TOKEN.findall(self._reply(messages)):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for token in _TOKEN.findall(self._reply(messages)):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
@@ -0,0 +1,109 @@
+# whakit/testing/fake_redis.py
+#
+# In-process stand-in for a Redis server, speaking enough RESP2 for
+# RedisStateStore. Run standalone with:
+#
+#   python -m whakit.testing.fake_redis --port 6380
+
+import argparse
+import asyncio
+import time
+from typing import Dict, Optional, Tuple
+
+
+def _bulk(value: Optional[bytes]) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class FakeRedisServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: set = set()
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}/0"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._clients):
+                writer.close()
+            await self._server.wait_closed()
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        item = self.data.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return item[0]
+
+    def _command(self, args: list) -> bytes:
+        name = args[0].upper()
+        if name in (b"PING", b"AUTH", b"SELECT"):
+            return b"+OK\r\n" if name != b"PING" else b"+PONG\r\n"
+        if name == b"GET":
+            return _bulk(self._get(args[1]))
+        if name == b"MGET":
+            return b"*%d\r\n" % (len(args) - 1) + b"".join(_bulk(self._get(key)) for key in args[1:])
+        if name == b"DEL":
+            removed = sum(1 for key in args[1:] if self.data.pop(key, None) is not None)
+            return b":%d\r\n" % removed
+        if name == b"SET":
+            key, value, options = args[1], args[2], [arg.upper() for arg in args[3:]]
+            expires_at = None
+            if b"PX" in options:
+                expires_at = time.monotonic() + int(args[3 + options.index(b"PX") + 1]) / 1000
+            elif b"EX" in options:
+                expires_at = time.monotonic() + int(args[3 + options.index(b"EX") + 1])
+            if b"NX" in options and self._get(key) is not None:
+                return b"$-1\r\n"
+            self.data[key] = (value, expires_at)
+            return b"+OK\r\n"
+        return b"-ERR unknown command '%s'\r\n" % name
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._clients.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                count = int(line[1:-2])
+                args = []
+                for _ in range(count):
+                    length = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                writer.write(self._command(args))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+
+async def _main(host: str, port: int):
+    server = FakeRedisServer(host, port)
+    await server.start()
+    print(f"Fake Redis listening on {server.url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Redis-protocol stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6380)
+    args = parser.parse_args()
+    asyncio.run(_main(args.host, args.port))
@@ -1,17 +1,77 @@
 # whakit/utils/helpers.py
 
+import hashlib
+import hmac
+import json
+from typing import Iterator, Optional, Tuple, Union
+
+from whakit.models.message import Message
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library decoder is used instead
+    orjson = None
+
+
+SIGNATURE_PREFIX = "sha256="
+
+
+class SignatureVerifier:
+    """Checks the X-Hub-Signature-256 header Meta sends with every webhook.
+
+    The HMAC is keyed once up front and copied per request, so each check
+    only hashes the raw body bytes.
+    """
+
+    def __init__(self, secret: str):
+        self._keyed = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+
+    def verify(self, body: bytes, header: Optional[str]) -> bool:
+        if not header or not header.startswith(SIGNATURE_PREFIX):
+            return False
+        mac = self._keyed.copy()
+        mac.update(body)
+        # Compared as bytes: compare_digest rejects str with non-ASCII characters
+        signature = header[len(SIGNATURE_PREFIX):].encode("utf-8", errors="replace")
+        return hmac.compare_digest(mac.hexdigest().encode(), signature)
+
+
+def decode_webhook(raw: Union[bytes, str]) -> dict:
+    """Decode a webhook body, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def iter_webhook_events(body: dict) -> Iterator[Tuple[str, Union[Message, dict], dict]]:
+    """Yield every ("message", Message, contact) and ("status", status, {}) in a payload.
+
+    Meta batches several entries, changes, messages and statuses into a
+    single delivery, so every level is walked instead of indexing [0].
+    Messages are converted to typed `Message` objects in the same pass.
+    """
+    from_payload = Message.from_payload
+    for entry in body.get("entry") or ():
+        for change in entry.get("changes") or ():
+            value = change.get("value") or {}
+            messages = value.get("messages")
+            if messages:
+                contacts = value.get("contacts") or ()
+                if len(contacts) > 1:
+                    # Several senders in one change: pair each message with its contact
+                    by_wa_id = {contact.get("wa_id"): contact for contact in contacts}
+                    for message in messages:
+                        yield "message", from_payload(message), by_wa_id.get(message.get("from"), {})
+                else:
+                    contact = contacts[0] if contacts else {}
+                    for message in messages:
+                        yield "message", from_payload(message), contact
+            for status in value.get("statuses") or ():
+                yield "status", status, {}
+
 
 def extract_message_and_sender_info(body: dict):
-    message = (
-        body.get("entry", [{}])[0]
-        .get("changes", [{}])[0]
-        .get("value", {})
-        .get("messages", [{}])[0]
-    )
-    sender_info = (
-        body.get("entry", [{}])[0]
-        .get("changes", [{}])[0]
-        .get("value", {})
-        .get("contacts", [{}])[0]
-    )
-    return message, sender_info
+    for kind, message, sender_info in iter_webhook_events(body):
+        if kind == "message":
+            return message, sender_info
+    return None, {}